@@ -9,8 +9,11 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecom_project.settings')
+# Drops WhiteNoise from MIDDLEWARE and enables the async views by default
+os.environ.setdefault('SERVE_ASGI', 'True')
 
-application = get_asgi_application()
+application = ASGIStaticFilesHandler(get_asgi_application())
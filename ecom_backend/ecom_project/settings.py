@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os
 from datetime import timedelta
 
@@ -47,7 +47,13 @@ INSTALLED_APPS = [
     'store',
 ]
 
+# asgi.py sets SERVE_ASGI. Static files are then served in front of Django by
+# ASGIStaticFilesHandler, as WhiteNoise's middleware would force every async
+# request through a worker thread
+SERVE_ASGI = config('SERVE_ASGI', default=False, cast=bool)
+
 MIDDLEWARE = [
+    'store.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -57,7 +63,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'store.routers.ReplicaMiddleware',
+    'store.querybudget.QueryBudgetMiddleware',
 ]
+if SERVE_ASGI:
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
 
 ROOT_URLCONF = 'ecom_project.urls'
 
@@ -85,11 +95,42 @@ WSGI_APPLICATION = 'ecom_project.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 plus the pragmas and write queueing below
+        'ENGINE': 'store.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Applied to every SQLite connection (store/backends/sqlite3). WAL keeps
+# readers and the writer from blocking each other; busy_timeout (ms) makes
+# writers wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='wal'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='normal'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    # Negative values are KiB
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-64000, cast=int),
+}
+# Queue a process's write transactions on an in-process lock before SQLite's
+SQLITE_WRITE_LOCK = config('SQLITE_WRITE_LOCK', default=True, cast=bool)
+
+# Read replicas (store/routers.py). DATABASE_REPLICAS lists SQLite files
+# kept in sync with the primary by `manage.py sync_replicas`; other backends
+# can add replica aliases to DATABASES and list them in REPLICA_DATABASES.
+DATABASE_REPLICAS = config('DATABASE_REPLICAS', default='', cast=Csv())
+REPLICA_DATABASES = []
+for index, replica_path in enumerate(DATABASE_REPLICAS, 1):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'NAME': f'file:{replica_path}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica_{index}')
+DATABASE_ROUTERS = ['store.routers.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+
 # Optional PostgreSQL configuration (commented out for SQLite deployment)
 # if not DEBUG:
 #     DATABASES = {
@@ -104,6 +145,22 @@ DATABASES = {
 #     }
 
 
+# Caches
+# The catalog response cache uses STORE_CACHE_ALIAS; point CACHE_BACKEND at
+# a shared backend (e.g. django.core.cache.backends.redis.RedisCache) when
+# running more than one process.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='store'),
+    }
+}
+
+STORE_CACHE_ALIAS = 'default'
+STORE_CACHE_ENABLED = config('STORE_CACHE_ENABLED', default=True, cast=bool)
+STORE_CACHE_TIMEOUT = config('STORE_CACHE_TIMEOUT', default=300, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -149,7 +206,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'store.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -163,6 +220,60 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# ?count=approx on cursor-paginated listings counts exactly up to this many rows
+PAGINATION_COUNT_THRESHOLD = config('PAGINATION_COUNT_THRESHOLD', default=10000, cast=int)
+
+# Serve item, order and cart reads through store/fastserializers.py
+FAST_SERIALIZERS = config('FAST_SERIALIZERS', default=True, cast=bool)
+
+# Route names served by the async views in store/async_views.py ('*' for all
+# of them). Async views only pay off under ASGI, so that is the default there
+ASYNC_VIEWS = config('ASYNC_VIEWS', default='*' if SERVE_ASGI else '', cast=Csv())
+
+# Category items_count: 'aggregate' counts per request with one grouped
+# query, 'materialized' reads Category.active_items_count (large catalogs)
+CATEGORY_ITEMS_COUNT = config('CATEGORY_ITEMS_COUNT', default='aggregate')
+
+# Cart stock holds (store/reservations.py): adding to a cart holds the
+# stock for STOCK_HOLD_SECONDS; `manage.py sweep_stock_holds` releases expired
+# holds. The held totals are spread over STOCK_HOLD_SHARDS rows per item
+STOCK_HOLD_SECONDS = config('STOCK_HOLD_SECONDS', default=15 * 60, cast=int)
+STOCK_HOLD_SHARDS = config('STOCK_HOLD_SHARDS', default=8, cast=int)
+
+# Payment queue (store/payments.py): the payment endpoint queues a job that
+# `manage.py process_payments` workers charge through PAYMENT_GATEWAY,
+# retrying gateway errors up to PAYMENT_MAX_ATTEMPTS times after
+# PAYMENT_RETRY_DELAY seconds, doubling up to PAYMENT_RETRY_MAX_DELAY. A
+# worker holds a job for PAYMENT_JOB_LEASE seconds before others may retry it
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='store.gateway.StubGateway')
+PAYMENT_WORKER_CONCURRENCY = config('PAYMENT_WORKER_CONCURRENCY', default=4, cast=int)
+PAYMENT_MAX_ATTEMPTS = config('PAYMENT_MAX_ATTEMPTS', default=5, cast=int)
+PAYMENT_RETRY_DELAY = config('PAYMENT_RETRY_DELAY', default=2, cast=float)
+PAYMENT_RETRY_MAX_DELAY = config('PAYMENT_RETRY_MAX_DELAY', default=300, cast=float)
+PAYMENT_JOB_LEASE = config('PAYMENT_JOB_LEASE', default=120, cast=int)
+# Seconds of finished jobs the queue latency metrics cover
+PAYMENT_METRICS_WINDOW = config('PAYMENT_METRICS_WINDOW', default=300, cast=int)
+# StubGateway: seconds per charge, and the share of charges that fail
+# (retried) or are declined
+PAYMENT_STUB_LATENCY = config('PAYMENT_STUB_LATENCY', default=0.2, cast=float)
+PAYMENT_STUB_ERROR_RATE = config('PAYMENT_STUB_ERROR_RATE', default=0.0, cast=float)
+PAYMENT_STUB_DECLINE_RATE = config('PAYMENT_STUB_DECLINE_RATE', default=0.0, cast=float)
+
+# Seconds the JWT authentication keeps a user in the store cache
+# (store/usercache.py); 0 reads it from the database on every request
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+
+# Query budgets: views over their declared query count are logged, or raise
+# when strict (used by the test suite)
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+QUERY_COUNT_HEADER = config('QUERY_COUNT_HEADER', default=False, cast=bool)
+
+# Request timings (store/metrics.py): Server-Timing headers and the
+# histograms at /api/_metrics, readable by staff or with METRICS_TOKEN
+REQUEST_METRICS = config('REQUEST_METRICS', default=True, cast=bool)
+SERVER_TIMING_HEADER = config('SERVER_TIMING_HEADER', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # JWT Configuration
 
 SIMPLE_JWT = {
@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from store.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/_metrics', metrics_view, name='metrics'),
     path('api/', include('store.urls')),
 ]
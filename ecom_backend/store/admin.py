@@ -1,38 +1,93 @@
 from django.contrib import admin
-from .models import Category, Item, Cart, CartItem, Wishlist, UserProfile, Order, OrderItem
+from django.contrib.auth.models import User
+from django.db.models import Q
+from .models import Category, Item, Cart, CartItem, Wishlist, UserProfile, Order, OrderItem, PaymentJob
+from .pagination import EstimatedCountPaginator
+from .search import get_search_backend, search_words
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow to millions of rows.
+
+    Pages are counted with ``estimate_count()`` and the unfiltered total
+    isn't counted at all. Foreign keys are edited by id, so change forms
+    don't render a ``<select>`` of every row in the related table.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        lookups = self.search_lookups(search_term.strip()) if search_term.strip() else None
+        if lookups is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(lookups), False
+
+    def search_lookups(self, term):
+        """A ``Q`` whose alternatives can each be served by an index, or None to use ``search_fields``.
+
+        ``search_fields`` ORs its lookups across joins, which makes SQLite
+        scan the whole table.
+        """
+        return None
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description', 'created_at', 'updated_at')
+    list_display = ('name', 'description', 'active_items_count', 'created_at', 'updated_at')
     search_fields = ('name', 'description')
     list_filter = ('created_at',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('active_items_count', 'created_at', 'updated_at')
 
 @admin.register(Item)
-class ItemAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'stock_quantity', 'is_featured', 'is_active', 'created_at')
-    list_filter = ('category', 'is_featured', 'is_active', 'created_at')
-    search_fields = ('name', 'description')
+class ItemAdmin(LargeTableAdmin):
+    list_display = ('name', 'sku', 'category', 'price', 'stock_quantity', 'is_featured', 'is_active', 'created_at')
+    # No created_at filter: only the partial is_active indexes lead with it
+    list_filter = ('category', 'is_featured', 'is_active')
+    search_fields = ('=sku', 'name', 'description')
     readonly_fields = ('created_at', 'updated_at')
     list_editable = ('price', 'stock_quantity', 'is_featured', 'is_active')
+    list_select_related = ('category',)
+
+    def search_lookups(self, term):
+        # Names and descriptions through the full-text index, by word prefix
+        if not search_words(term):
+            return Q(sku=term)
+        matches = get_search_backend().search(Item.objects.all(), term).values('pk')
+        return Q(sku=term) | Q(pk__in=matches)
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin):
     list_display = ('user', 'total_items', 'total_price', 'created_at', 'updated_at')
     readonly_fields = ('created_at', 'updated_at', 'total_items', 'total_price')
-    list_filter = ('created_at',)
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('=user__username',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
+    @admin.display(description='Total items', ordering='items_total_quantity')
+    def total_items(self, obj):
+        return obj.total_items
+
+    @admin.display(description='Total price', ordering='items_total_price')
+    def total_price(self, obj):
+        return obj.total_price
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     list_display = ('cart', 'item', 'quantity', 'total_price', 'created_at')
-    list_filter = ('created_at',)
     readonly_fields = ('created_at', 'updated_at', 'total_price')
+    # str(cart) reads cart.user; total_price reads item.price
+    list_select_related = ('cart__user', 'item')
+    raw_id_fields = ('cart', 'item')
+    search_fields = ('=cart__user__username',)
 
 @admin.register(Wishlist)
-class WishlistAdmin(admin.ModelAdmin):
+class WishlistAdmin(LargeTableAdmin):
     list_display = ('user', 'created_at', 'updated_at')
     readonly_fields = ('created_at', 'updated_at')
-    filter_horizontal = ('items',)
+    list_select_related = ('user',)
+    raw_id_fields = ('user', 'items')
+    search_fields = ('=user__username',)
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -40,18 +95,48 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ('city', 'state', 'created_at')
     search_fields = ('user__username', 'user__email', 'phone', 'city')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ('order_number', 'user', 'total_amount', 'order_status', 'payment_status', 'created_at')
+    # Each is served by an index ending in created_at (see Order.Meta)
     list_filter = ('order_status', 'payment_status', 'created_at')
-    search_fields = ('order_number', 'user__username', 'user__email')
+    search_fields = ('=order_number', '=user__username', '=user__email')
     readonly_fields = ('order_number', 'created_at', 'updated_at')
     list_editable = ('order_status', 'payment_status')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+    def search_lookups(self, term):
+        users = User.objects.filter(Q(username=term) | Q(email=term)).values('pk')
+        return Q(order_number=term) | Q(user__in=users)
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdmin):
     list_display = ('order', 'item', 'quantity', 'price', 'total_price', 'created_at')
-    list_filter = ('order__created_at',)
-    search_fields = ('order__order_number', 'item__name')
+    # str(order) reads order.user
+    list_select_related = ('order__user', 'item')
+    # No order__created_at filter: it joined every line to its order
+    search_fields = ('=order__order_number', 'item__name')
     readonly_fields = ('created_at', 'total_price')
+    raw_id_fields = ('order', 'item')
+
+    def search_lookups(self, term):
+        orders = Order.objects.filter(order_number=term).values('pk')
+        items = Item.objects.filter(name__icontains=term).values('pk')
+        return Q(order__in=orders) | Q(item__in=items)
+
+@admin.register(PaymentJob)
+class PaymentJobAdmin(LargeTableAdmin):
+    list_display = ('id', 'order', 'amount', 'status', 'attempts', 'run_after', 'created_at', 'finished_at')
+    # Served by payment_job_due
+    list_filter = ('status',)
+    search_fields = ('=order__order_number',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'gateway_reference', 'locked_by')
+    list_select_related = ('order__user',)
+    raw_id_fields = ('order',)
+
+    def search_lookups(self, term):
+        return Q(order__in=Order.objects.filter(order_number=term).values('pk'))
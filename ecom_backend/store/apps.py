@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .metrics import registry
+        from .payments import queue_metric_lines
+        from .routers import check_replica_cache
+
+        registry.add_collector(queue_metric_lines)
+        checks.register(check_replica_cache, checks.Tags.caches)
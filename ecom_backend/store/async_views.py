@@ -0,0 +1,274 @@
+"""Async read paths for the catalog, cart and order endpoints.
+
+Each async view answers ``GET`` with Django's async ORM and hands every other
+method, and any query it doesn't handle itself (search, custom ordering,
+cursor pagination, ...), to the regular DRF view. Responses have the same
+shape as the DRF views'. ``ASYNC_VIEWS`` chooses which routes are served
+async; see ``select_async_views``.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import URLPattern
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import CachedJWTAuthentication
+from .cache import cacheable, get_cache, response_cache_key, stats, volatile_rows
+from .metrics import timed
+from .models import Category, Item, Order
+from .querybudget import get_view_budget
+from .reservations import AVAILABILITY_FIELDS, refresh_availability
+from .routers import pin_cache_fill
+from .serializers import CartSerializer, CategorySerializer, ItemSerializer, OrderSerializer
+from .usercache import cache_user, cached_user
+from .views import cart_queryset, item_queryset, order_queryset
+
+NOT_FOUND = {'detail': 'Not found.'}
+NOT_AUTHENTICATED = {'detail': 'Authentication credentials were not provided.'}
+# Refreshed on cache hits, like the sync item views' ``volatile``
+AVAILABILITY = (AVAILABILITY_FIELDS, refresh_availability)
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """``CachedJWTAuthentication`` with cache misses read on the async ORM."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token)
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        user, generation = await sync_to_async(cached_user)(user_id)
+        if user is not None:
+            return self.check_cached_user(user, validated_token)
+        try:
+            user = await self.user_model.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if getattr(jwt_settings, 'CHECK_REVOKE_TOKEN', False):
+            # Rare setting; reuse simplejwt's own check
+            await sync_to_async(self.get_user)(validated_token)
+        await sync_to_async(cache_user)(user_id, user, generation)
+        return user
+
+
+authentication = AsyncJWTAuthentication()
+
+
+def unauthorized(detail):
+    response = json_response(detail, status=401)
+    response['WWW-Authenticate'] = authentication.authenticate_header(None)
+    return response
+
+
+async def cached(request, build, anonymous_only=False, user=None, volatile=None):
+    """Async counterpart of ``CachedResponseMixin``; shares its cache entries."""
+    if not getattr(settings, 'STORE_CACHE_ENABLED', True) or (anonymous_only and user is not None):
+        return await build()
+
+    cache = get_cache()
+    key = response_cache_key(request)
+    data = await cache.aget(key)
+    stats.record(hit=data is not None)
+    if data is not None:
+        if volatile is not None:
+            fields, refresh = volatile
+            await sync_to_async(refresh)(volatile_rows(data, fields))
+        response = json_response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    pin_cache_fill()
+    response = await build()
+    if response is not None and response.status_code == 200 and cacheable(response.data, volatile):
+        await cache.aset(key, response.data, getattr(settings, 'STORE_CACHE_TIMEOUT', 300))
+    if response is not None:
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+async def paginate(request, queryset, serializer_class):
+    """Page-number pagination matching DRF's ``PageNumberPagination`` output.
+
+    Returns ``None`` for pages DRF would reject, so the sync view can answer.
+    """
+    page = request.GET.get('page', '1')
+    if not page.isdigit() or int(page) < 1:
+        return None
+    page, page_size = int(page), api_settings.PAGE_SIZE
+    count = await queryset.acount()
+    last_page = max(1, -(-count // page_size))
+    if page > last_page:
+        return None
+
+    offset = (page - 1) * page_size
+    rows = [row async for row in queryset[offset:offset + page_size]]
+    url = request.build_absolute_uri()
+    previous = None
+    if page > 1:
+        previous = remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+    data = {
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if page < last_page else None,
+        'previous': previous,
+        'results': serializer_class(rows, many=True, context={'request': request}).data,
+    }
+    return with_data(data)
+
+
+def with_data(data, status=200):
+    response = json_response(data, status=status)
+    response.data = data
+    return response
+
+
+def only_params(request, *names):
+    return set(request.GET) <= set(names)
+
+
+# Catalog
+async def category_list(request, user):
+    if not only_params(request, 'page'):
+        return None
+    queryset = Category.objects.with_items_count().order_by('name')
+    return await cached(request, lambda: paginate(request, queryset, CategorySerializer))
+
+
+async def item_list(request, user):
+    if not only_params(request, 'page', 'category', 'is_featured'):
+        return None
+    queryset = item_queryset()
+    category = request.GET.get('category')
+    if category is not None:
+        if not category.isdigit():
+            return None
+        queryset = queryset.filter(category_id=int(category))
+    featured = request.GET.get('is_featured')
+    if featured is not None:
+        if featured not in ('true', 'false'):
+            return None
+        queryset = queryset.filter(is_featured=featured == 'true')
+
+    return await cached(request, lambda: paginate(request, queryset, ItemSerializer),
+                        anonymous_only=True, user=user, volatile=AVAILABILITY)
+
+
+async def item_detail(request, user, pk):
+    async def build():
+        try:
+            item = await item_queryset().aget(pk=pk)
+        except Item.DoesNotExist:
+            return with_data(NOT_FOUND, status=404)
+        return with_data(ItemSerializer(item).data)
+    return await cached(request, build, volatile=AVAILABILITY)
+
+
+async def featured_items(request, user):
+    if not only_params(request, 'page'):
+        return None
+    queryset = item_queryset().filter(is_featured=True).order_by('-created_at')
+    return await cached(request, lambda: paginate(request, queryset, ItemSerializer), volatile=AVAILABILITY)
+
+
+# Cart and orders
+async def cart(request, user):
+    if user is None:
+        return unauthorized(NOT_AUTHENTICATED)
+    cart, created = await cart_queryset().aget_or_create(user=user)
+    if created:
+        # A fresh instance lacks the totals annotation and prefetched items
+        cart = await cart_queryset().aget(pk=cart.pk)
+    return with_data(CartSerializer(cart).data)
+
+
+async def order_list(request, user):
+    if not only_params(request, 'page'):
+        return None
+    if user is None:
+        return unauthorized(NOT_AUTHENTICATED)
+    return await paginate(request, order_queryset().filter(user=user), OrderSerializer)
+
+
+async def order_detail(request, user, pk):
+    if user is None:
+        return unauthorized(NOT_AUTHENTICATED)
+    try:
+        order = await order_queryset().filter(user=user).aget(pk=pk)
+    except Order.DoesNotExist:
+        return with_data(NOT_FOUND, status=404)
+    return with_data(OrderSerializer(order).data)
+
+
+ASYNC_VIEWS = {
+    'category_list': category_list,
+    'item_list': item_list,
+    'item_detail': item_detail,
+    'featured_items': featured_items,
+    'cart': cart,
+    'order_list': order_list,
+    'order_detail': order_detail,
+}
+
+
+def async_read_view(async_get, sync_view):
+    """Serve ``GET`` from ``async_get``; everything else from ``sync_view``."""
+    sync_handler = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            try:
+                # Like DRF, a bad token is rejected even where anonymous access is allowed
+                with timed('auth'):
+                    user = await authentication.aauthenticate(request)
+            except AuthenticationFailed as error:
+                return unauthorized(error.detail)
+            if user is not None:
+                # As DRF does; the replica router reads it
+                request.user = user
+            response = await async_get(request, user, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_handler(request, *args, **kwargs)
+
+    # csrf_exempt() only wraps sync views in this Django version
+    view.csrf_exempt = True
+    view.query_budget = get_view_budget(sync_view)
+    view.sync_view = sync_view
+    return view
+
+
+def select_async_views(urlpatterns, names=None):
+    """Swap in async views for the route names listed in ``ASYNC_VIEWS``.
+
+    ``'*'`` selects every route that has an async implementation.
+    """
+    if names is None:
+        names = getattr(settings, 'ASYNC_VIEWS', [])
+    selected = set(ASYNC_VIEWS) if '*' in names else set(names) & set(ASYNC_VIEWS)
+    patterns = []
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLPattern) and pattern.name in selected:
+            view = async_read_view(ASYNC_VIEWS[pattern.name], pattern.callback)
+            pattern = URLPattern(pattern.pattern, view, pattern.default_args, pattern.name)
+        patterns.append(pattern)
+    return patterns
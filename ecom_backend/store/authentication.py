@@ -0,0 +1,43 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .metrics import timed
+from .usercache import cache_user, cached_user
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """simplejwt's ``JWTAuthentication``, timed for the request metrics."""
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that reads the user from the store cache (see ``usercache``).
+
+    Only active users are cached; the password-change check of
+    ``CHECK_REVOKE_TOKEN`` still runs against the cached copy.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        user, generation = cached_user(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache_user(user_id, user, generation)
+            return user
+        return self.check_cached_user(user, validated_token)
+
+    def check_cached_user(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN and (
+                validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
@@ -0,0 +1,85 @@
+"""SQLite backend tuned for several concurrent workers.
+
+Every new connection applies ``SQLITE_PRAGMAS``: WAL lets readers carry on
+while a writer commits, ``busy_timeout`` makes a blocked writer wait instead
+of failing, and ``synchronous``, ``mmap_size`` and ``cache_size`` trade a
+little durability on power loss for much cheaper commits and reads.
+
+Transactions start with ``BEGIN IMMEDIATE``. A deferred ``BEGIN`` takes the
+write lock only at its first write, and when two such transactions both
+read first, one of them fails with "database is locked" straight away
+whatever the busy timeout. Taking the lock up front makes writers queue
+instead. With ``SQLITE_WRITE_LOCK`` the threads of one process also queue
+on a lock of their own before asking SQLite, so they don't poll the file
+lock against each other.
+"""
+import threading
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+}
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def write_lock(name):
+    with _write_locks_guard:
+        return _write_locks.setdefault(str(name), threading.Lock())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _holds_write_lock = False
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS).items():
+            try:
+                conn.execute(f'PRAGMA {pragma} = {value}')
+            except base.Database.OperationalError:
+                # journal_mode can't change on a read-only replica connection
+                if pragma != 'journal_mode':
+                    raise
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if getattr(settings, 'SQLITE_WRITE_LOCK', True) and not self.is_in_memory_db():
+            lock = write_lock(self.settings_dict['NAME'])
+            # Past the busy timeout, fall through to SQLite's own waiting
+            timeout = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS).get('busy_timeout', 5000) / 1000
+            self._holds_write_lock = lock.acquire(timeout=timeout)
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.release_write_lock()
+            raise
+
+    def release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            write_lock(self.settings_dict['NAME']).release()
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_write_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_write_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.release_write_lock()
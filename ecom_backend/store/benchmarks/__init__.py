@@ -0,0 +1,5 @@
+"""Load-testing benchmark suite for the store API.
+
+Run it with ``python manage.py benchmark``; scenario definitions live in
+``scenarios.py`` and the virtual-user driver in ``runner.py``.
+"""
@@ -0,0 +1,33 @@
+"""Benchmark dataset seeding and lookup."""
+from django.contrib.auth.models import User
+from django.db.models import F
+
+from ..datagen import DataGenerator
+from ..models import Category, Item, Order
+from .runner import BENCHMARK_PASSWORD, BENCHMARK_USER_PREFIX
+
+
+def seed(items=2000, users=50, categories=20, seed_value=0):
+    # Every virtual user gets a cart, a wishlist and at least one of ~5 past orders each
+    DataGenerator(seed=seed_value).generate(
+        categories=categories, items=items, users=users, orders=users * 5, cart_ratio=1.0, wishlist_ratio=1.0,
+        user_prefix=BENCHMARK_USER_PREFIX, password=BENCHMARK_PASSWORD,
+    )
+    # Plenty of stock, so long checkout runs don't drain it
+    Item.objects.update(stock_quantity=F('stock_quantity') + 100000)
+
+
+def load_catalog():
+    usernames = list(
+        User.objects.filter(username__startswith=BENCHMARK_USER_PREFIX).values_list('username', flat=True)
+    )
+    order_ids = {}
+    for username, order_id in Order.objects.filter(user__username__in=usernames) \
+            .values_list('user__username', 'id'):
+        order_ids.setdefault(username, []).append(order_id)
+    return {
+        'usernames': usernames,
+        'item_ids': list(Item.objects.filter(is_active=True).values_list('id', flat=True)[:5000]),
+        'category_ids': list(Category.objects.values_list('id', flat=True)),
+        'order_ids': order_ids,
+    }
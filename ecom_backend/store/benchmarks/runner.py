@@ -0,0 +1,190 @@
+"""Virtual users, result collection and reporting for the benchmark suite."""
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+BENCHMARK_PASSWORD = 'benchmark-pass-123'
+BENCHMARK_USER_PREFIX = 'bench_user_'
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def record(self, name, duration, status, queries):
+        with self._lock:
+            self.samples[name].append((duration, status, queries))
+
+    def summarize(self, samples, elapsed):
+        # Failed requests (status 0) never got a response to time
+        latencies = sorted(duration * 1000 for duration, status, queries in samples if status)
+        queries = [queries for duration, status, queries in samples if queries is not None]
+        errors = sum(1 for duration, status, queries in samples if status >= 500 or status == 0)
+        return {
+            'requests': len(samples),
+            'errors': errors,
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p95': round(percentile(latencies, 0.95), 3),
+                'p99': round(percentile(latencies, 0.99), 3),
+                'max': round(latencies[-1], 3) if latencies else 0.0,
+            },
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+            'status_codes': dict(sorted(
+                (str(code), sum(1 for sample in samples if sample[1] == code))
+                for code in {sample[1] for sample in samples}
+            )),
+        }
+
+    def report(self, elapsed):
+        everything = [sample for samples in self.samples.values() for sample in samples]
+        return {
+            'total': self.summarize(everything, elapsed),
+            'scenarios': {name: self.summarize(samples, elapsed) for name, samples in sorted(self.samples.items())},
+        }
+
+
+class VirtualUser:
+    def __init__(self, base_url, username, catalog, recorder):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.username = username
+        self.password = BENCHMARK_PASSWORD
+        self.item_ids = catalog['item_ids']
+        self.category_ids = catalog['category_ids']
+        self.order_ids = list(catalog['order_ids'].get(username, []))
+        self.recorder = recorder
+        self.connection = None
+        self.access = self.refresh = None
+        self.cart_item = None
+        self.registrations = 0
+
+    # Helpers used by scenario builders
+    def pick_cart_item(self):
+        self.cart_item = random.choice(self.item_ids)
+        return self.cart_item
+
+    def pop_order(self):
+        # Most recent checkout; 0 (a 404) if this user has no orders yet
+        return self.order_ids[-1] if self.order_ids else 0
+
+    def registration(self):
+        self.registrations += 1
+        username = f'{self.username}_r{self.registrations}_{random.randrange(10 ** 9)}'
+        return {'username': username, 'email': f'{username}@example.com', 'first_name': 'Bench',
+                'last_name': 'User', 'password': BENCHMARK_PASSWORD, 'password_confirm': BENCHMARK_PASSWORD}
+
+    def send(self, request):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if request.auth and self.access:
+            headers['Authorization'] = f'Bearer {self.access}'
+        body = json.dumps(request.body) if request.body is not None else None
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(request.method, request.path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                payload = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.connection.close()
+                    self.connection = None
+                return response, payload
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+    def login(self):
+        response, payload = self.send(_login_request(self.username))
+        tokens = json.loads(payload)
+        self.access, self.refresh = tokens['access'], tokens['refresh']
+
+    def run(self, scenarios, deadline, max_requests=None):
+        weights = [scenario.weight for scenario in scenarios]
+        sent = 0
+        while time.perf_counter() < deadline and (max_requests is None or sent < max_requests):
+            scenario = random.choices(scenarios, weights)[0]
+            try:
+                if self.access is None:
+                    self.login()
+                if scenario.setup:
+                    self.send(scenario.setup(self))
+                request = scenario.build(self)
+                start = time.perf_counter()
+                response, payload = self.send(request)
+                duration = time.perf_counter() - start
+            except (http.client.HTTPException, OSError, LookupError, ValueError):
+                # Connection failures, a failed login, or a scenario this
+                # user's state can't build a request for
+                self.recorder.record(scenario.name, 0.0, 0, None)
+                continue
+            queries = response.getheader('X-Query-Count')
+            self.recorder.record(scenario.name, duration, response.status,
+                                 int(queries) if queries is not None else None)
+            if scenario.after and response.status < 400:
+                scenario.after(self, json.loads(payload or b'null'))
+            sent += 1
+        if self.connection is not None:
+            self.connection.close()
+
+
+def _login_request(username):
+    from .scenarios import Request
+
+    return Request('POST', '/api/auth/login/', {'username': username, 'password': BENCHMARK_PASSWORD}, auth=False)
+
+
+def run_load(base_url, catalog, scenarios, virtual_users, duration, max_requests=None):
+    recorder = Recorder()
+    users = [
+        VirtualUser(base_url, catalog['usernames'][index % len(catalog['usernames'])], catalog, recorder)
+        for index in range(virtual_users)
+    ]
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(target=user.run, args=(scenarios, deadline, max_requests), daemon=True)
+        for user in users
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.perf_counter() - start)
+
+
+def compare_reports(baseline, current, threshold):
+    """Yield ``(scenario, metric, before, after, change, regressed)`` rows."""
+    for name, stats in sorted(current['scenarios'].items()):
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        metrics = [
+            ('p50', before['latency_ms']['p50'], stats['latency_ms']['p50'], True),
+            ('p95', before['latency_ms']['p95'], stats['latency_ms']['p95'], True),
+            ('p99', before['latency_ms']['p99'], stats['latency_ms']['p99'], True),
+            ('rps', before['throughput_rps'], stats['throughput_rps'], False),
+            ('queries', before['queries_per_request'], stats['queries_per_request'], True),
+        ]
+        for metric, old, new, lower_is_better in metrics:
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            regressed = change > threshold if lower_is_better else change < -threshold
+            yield name, metric, old, new, change, regressed
@@ -0,0 +1,143 @@
+"""Benchmark scenarios, one or more per route in ``store/urls.py``.
+
+Staff-only routes (catalog import and export, the order export) have none:
+virtual users aren't staff, so they would only measure the 403.
+
+A scenario turns a virtual user's state into a request. ``setup`` requests
+(for instance filling a cart before checkout) are sent but not measured.
+"""
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    body: Optional[dict] = None
+    auth: bool = True
+
+
+@dataclass
+class Scenario:
+    name: str
+    # URL name from store/urls.py
+    route: str
+    weight: int
+    build: Callable
+    setup: Callable = None
+    # Remembers state (order ids, ...) from the response body
+    after: Callable = None
+    tags: tuple = field(default_factory=tuple)
+
+
+SEARCH_WORDS = ['pro', 'classic', 'mini', 'smart', 'cotton', 'steel', 'wireless', 'eco']
+
+
+def pick(sequence):
+    # 0 (a 404) when there is nothing to pick, like VirtualUser.pop_order()
+    return random.choice(sequence) if sequence else 0
+
+
+def remember_order(user, data):
+    if isinstance(data, dict) and 'id' in data:
+        user.order_ids.append(data['id'])
+
+
+def wishlist_batch(item_ids):
+    return Request('POST', '/api/wishlist/batch/', {'add': item_ids[:4], 'remove': item_ids[4:]})
+
+
+SCENARIOS = [
+    # Browse
+    Scenario('category_list', 'category_list', 6,
+             lambda u: Request('GET', '/api/categories/', auth=False), tags=('browse',)),
+    Scenario('category_detail', 'category_detail', 2,
+             lambda u: Request('GET', f'/api/categories/{pick(u.category_ids)}/', auth=False), tags=('browse',)),
+    Scenario('item_list', 'item_list', 12,
+             lambda u: Request('GET', f'/api/items/?page={random.randint(1, 5)}', auth=False), tags=('browse',)),
+    Scenario('item_list_by_category', 'item_list', 6,
+             lambda u: Request('GET', f'/api/items/?category={pick(u.category_ids)}&ordering=price', auth=False),
+             tags=('browse',)),
+    Scenario('item_list_cursor', 'item_list', 3,
+             lambda u: Request('GET', '/api/items/?pagination=cursor', auth=False), tags=('browse',)),
+    Scenario('item_detail', 'item_detail', 12,
+             lambda u: Request('GET', f'/api/items/{pick(u.item_ids)}/', auth=False), tags=('browse',)),
+    Scenario('featured_items', 'featured_items', 6,
+             lambda u: Request('GET', '/api/items/featured/', auth=False), tags=('browse',)),
+    Scenario('item_search', 'item_list', 8,
+             lambda u: Request('GET', f'/api/items/?search={pick(SEARCH_WORDS)}', auth=False),
+             tags=('browse', 'search')),
+
+    # Account
+    Scenario('auth_login', 'token_obtain_pair', 1,
+             lambda u: Request('POST', '/api/auth/login/', {'username': u.username, 'password': u.password},
+                               auth=False),
+             tags=('auth',)),
+    Scenario('auth_refresh', 'token_refresh', 1,
+             lambda u: Request('POST', '/api/auth/refresh/', {'refresh': u.refresh}, auth=False), tags=('auth',)),
+    Scenario('auth_register', 'user_register', 1,
+             lambda u: Request('POST', '/api/auth/register/', u.registration(), auth=False), tags=('auth',)),
+    Scenario('auth_profile', 'user_profile', 2, lambda u: Request('GET', '/api/auth/profile/'), tags=('auth',)),
+    Scenario('profile_detail', 'user_profile_detail', 2, lambda u: Request('GET', '/api/profile/'), tags=('auth',)),
+
+    # Cart
+    Scenario('cart_view', 'cart', 8, lambda u: Request('GET', '/api/cart/'), tags=('cart',)),
+    Scenario('cart_add', 'add_to_cart', 5,
+             lambda u: Request('POST', '/api/cart/add/', {'item_id': pick(u.item_ids), 'quantity': 1}),
+             tags=('cart',)),
+    Scenario('cart_update', 'update_cart_item', 3,
+             lambda u: Request('PUT', f'/api/cart/update/{u.cart_item}/', {'quantity': 2}),
+             setup=lambda u: Request('POST', '/api/cart/add/', {'item_id': u.pick_cart_item(), 'quantity': 1}),
+             tags=('cart',)),
+    Scenario('cart_remove', 'remove_from_cart', 2,
+             lambda u: Request('DELETE', f'/api/cart/remove/{u.cart_item}/'),
+             setup=lambda u: Request('POST', '/api/cart/add/', {'item_id': u.pick_cart_item(), 'quantity': 1}),
+             tags=('cart',)),
+    Scenario('cart_batch', 'batch_update_cart', 3,
+             lambda u: Request('POST', '/api/cart/batch/', {'operations': [
+                 {'op': 'add', 'item_id': pick(u.item_ids), 'quantity': 1},
+                 {'op': 'add', 'item_id': pick(u.item_ids), 'quantity': 1},
+                 {'op': 'remove', 'item_id': pick(u.item_ids)},
+             ]}),
+             tags=('cart',)),
+    Scenario('cart_clear', 'clear_cart', 1, lambda u: Request('DELETE', '/api/cart/clear/'), tags=('cart',)),
+
+    # Wishlist
+    Scenario('wishlist_view', 'wishlist', 4, lambda u: Request('GET', '/api/wishlist/'), tags=('wishlist',)),
+    Scenario('wishlist_add', 'add_to_wishlist', 2,
+             lambda u: Request('POST', '/api/wishlist/add/', {'item_id': pick(u.item_ids)}), tags=('wishlist',)),
+    Scenario('wishlist_remove', 'remove_from_wishlist', 1,
+             lambda u: Request('DELETE', f'/api/wishlist/remove/{pick(u.item_ids)}/'), tags=('wishlist',)),
+    Scenario('wishlist_ids', 'wishlist_ids', 6, lambda u: Request('GET', '/api/wishlist/ids/'), tags=('wishlist',)),
+    Scenario('wishlist_items', 'wishlist_items', 2,
+             lambda u: Request('GET', '/api/wishlist/items/?fields=card'), tags=('wishlist',)),
+    Scenario('wishlist_batch', 'batch_update_wishlist', 1,
+             lambda u: wishlist_batch(random.sample(u.item_ids, min(6, len(u.item_ids)))), tags=('wishlist',)),
+
+    # Orders
+    Scenario('checkout', 'create_order', 2,
+             lambda u: Request('POST', '/api/orders/create/', {'shipping_address': '1 Benchmark Road'}),
+             setup=lambda u: Request('POST', '/api/cart/batch/', {'operations': [
+                 {'op': 'set', 'item_id': pick(u.item_ids), 'quantity': 1} for _ in range(3)
+             ]}),
+             after=remember_order, tags=('orders',)),
+    Scenario('payment', 'simulate_payment', 1,
+             lambda u: Request('POST', f'/api/orders/{u.pop_order()}/payment/'), tags=('orders',)),
+    Scenario('payment_status', 'payment_status', 3,
+             lambda u: Request('GET', f'/api/orders/{pick(u.order_ids)}/payment/status/'), tags=('orders',)),
+    Scenario('order_list', 'order_list', 4, lambda u: Request('GET', '/api/orders/'), tags=('orders',)),
+    Scenario('order_detail', 'order_detail', 2,
+             lambda u: Request('GET', f'/api/orders/{pick(u.order_ids)}/'), tags=('orders',)),
+    Scenario('order_summary', 'order_summary', 2, lambda u: Request('GET', '/api/orders/summary/'), tags=('orders',)),
+]
+
+
+def select_scenarios(names=None, tags=None):
+    scenarios = SCENARIOS
+    if names:
+        scenarios = [scenario for scenario in scenarios if scenario.name in names]
+    if tags:
+        scenarios = [scenario for scenario in scenarios if set(scenario.tags) & set(tags)]
+    return scenarios
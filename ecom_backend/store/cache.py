@@ -0,0 +1,129 @@
+"""Read-through response cache for the catalog endpoints.
+
+Cached responses are keyed by host, path, query string and the catalog
+version. Any ``Item`` or ``Category`` write bumps the version (see
+``signals.py``), which orphans every cached page at once without scanning
+keys; orphaned entries simply expire. The cache alias is configurable, so
+the local-memory default can be swapped for a shared backend in production.
+"""
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+VERSION_KEY = 'store:catalog_version'
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[getattr(settings, 'STORE_CACHE_ALIAS', 'default')]
+
+
+def catalog_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses old versions
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    # routers imports this module for its cache
+    from .routers import note_catalog_write
+
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+    note_catalog_write()
+
+
+def volatile_rows(data, fields):
+    """The rows of a response (a page's ``results`` or the object itself) that carry any of ``fields``."""
+    rows = data.get('results', [data]) if isinstance(data, dict) else data
+    return [row for row in rows if isinstance(row, dict) and any(field in row for field in fields)]
+
+
+def cacheable(data, volatile):
+    """Whether ``data`` can be cached: its volatile rows must have an ``id`` to refresh them by."""
+    return volatile is None or all('id' in row for row in volatile_rows(data, volatile[0]))
+
+
+def response_cache_key(request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.get_host()}{request.path}?{query}'.encode()).hexdigest()
+    return f'store:response:{catalog_version()}:{digest}'
+
+
+class CachedResponseMixin:
+    """Serve GET responses from the catalog cache.
+
+    Set ``cache_anonymous_only`` on views whose output should only be
+    cached for anonymous requests, and ``volatile`` to ``(fields, refresh)``
+    for values that change too often to serve from the cache: rows of a
+    cached response that carry any of ``fields`` go through
+    ``refresh(rows)`` first.
+    """
+    cache_anonymous_only = False
+    volatile = None
+
+    def should_cache_response(self, request):
+        if not getattr(settings, 'STORE_CACHE_ENABLED', True):
+            return False
+        return not (self.cache_anonymous_only and request.user.is_authenticated)
+
+    def get(self, request, *args, **kwargs):
+        if not self.should_cache_response(request):
+            return super().get(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_cache_key(request)
+        data = cache.get(key)
+        stats.record(hit=data is not None)
+        if data is not None:
+            if self.volatile is not None:
+                fields, refresh = self.volatile
+                refresh(volatile_rows(data, fields))
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        from .routers import pin_cache_fill
+
+        pin_cache_fill()
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200 and cacheable(response.data, self.volatile):
+            cache.set(key, response.data, getattr(settings, 'STORE_CACHE_TIMEOUT', 300))
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,121 @@
+"""Batch cart mutations.
+
+``apply_cart_operations`` folds a list of add/set/remove operations into at
+most one statement per kind: a ``DELETE`` for removals and two upserts
+(``INSERT ... ON CONFLICT DO UPDATE``) for absolute and relative quantity
+changes. Increments are computed by the database, so concurrent requests
+never lose each other's updates.
+"""
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CartItem, Item
+from .reservations import available_quantities, hold
+
+ADD, SET, REMOVE = 'add', 'set', 'remove'
+
+
+class CartOperationError(Exception):
+    def __init__(self, errors):
+        super().__init__('Invalid cart operations')
+        self.errors = errors
+
+
+def fold_operations(operations):
+    """Collapse operations into ``{item_id: (mode, quantity)}``.
+
+    ``mode`` is ``'add'`` while an item has only seen relative changes and
+    ``'set'`` once it has been set or removed; removal is a set to 0.
+    """
+    changes = {}
+    for operation in operations:
+        item_id, op = operation['item_id'], operation['op']
+        quantity = 0 if op == REMOVE else operation.get('quantity', 1)
+        mode, current = changes.get(item_id, (ADD, 0))
+        if op == ADD:
+            changes[item_id] = (mode, current + quantity)
+        else:
+            changes[item_id] = (SET, quantity)
+    return changes
+
+
+def validate_changes(cart, changes, operations):
+    items = Item.objects.filter(pk__in=changes, is_active=True).in_bulk()
+    available = available_quantities(cart.pk, items)
+    existing = dict(
+        CartItem.objects.filter(cart=cart, item_id__in=changes).values_list('item_id', 'quantity')
+    )
+    errors = []
+    for index, operation in enumerate(operations):
+        item_id = operation['item_id']
+        item = items.get(item_id)
+        mode, quantity = changes[item_id]
+        final = existing.get(item_id, 0) + quantity if mode == ADD else quantity
+        if item is None and final > 0:
+            errors.append({'index': index, 'item_id': item_id, 'error': 'Item not found'})
+        elif item is not None and final > available[item_id]:
+            errors.append({'index': index, 'item_id': item_id, 'error': 'Not enough stock'})
+    if errors:
+        raise CartOperationError(errors)
+
+
+def upsert_quantities(cart, quantities, increment):
+    """Insert or update cart lines in one statement.
+
+    With ``increment`` the quantities are added to existing lines,
+    otherwise they replace them. Returns the lines' new
+    ``{item_id: quantity}``.
+    """
+    if not quantities:
+        return {}
+    using = router.db_for_write(CartItem)
+    connection = connections[using]
+    now = timezone.now()
+    db_now = connection.ops.adapt_datetimefield_value(now)
+
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        for item_id, quantity in quantities.items():
+            value = F('quantity') + quantity if increment else quantity
+            updated = CartItem.objects.filter(cart=cart, item_id=item_id).update(quantity=value, updated_at=now)
+            if not updated:
+                CartItem.objects.create(cart=cart, item_id=item_id, quantity=quantity)
+        return dict(CartItem.objects.filter(cart=cart, item_id__in=quantities).values_list('item_id', 'quantity'))
+
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    new_quantity = f'{table}.quantity + excluded.quantity' if increment else 'excluded.quantity'
+    rows = ', '.join(['(%s, %s, %s, %s, %s)'] * len(quantities))
+    params = []
+    for item_id, quantity in quantities.items():
+        params.extend([cart.pk, item_id, quantity, db_now, db_now])
+    returning = connection.features.can_return_rows_from_bulk_insert
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (cart_id, item_id, quantity, created_at, updated_at) '
+            f'VALUES {rows} '
+            f'ON CONFLICT (cart_id, item_id) DO UPDATE '
+            f'SET quantity = {new_quantity}, updated_at = excluded.updated_at'
+            + (' RETURNING item_id, quantity' if returning else ''),
+            params,
+        )
+        if returning:
+            return dict(cursor.fetchall())
+    return dict(CartItem.objects.filter(cart=cart, item_id__in=quantities).values_list('item_id', 'quantity'))
+
+
+def apply_cart_operations(cart, operations):
+    changes = fold_operations(operations)
+    with transaction.atomic(using=router.db_for_write(CartItem)):
+        validate_changes(cart, changes, operations)
+        removals = [item_id for item_id, (mode, quantity) in changes.items() if mode == SET and quantity == 0]
+        if removals:
+            CartItem.objects.filter(cart=cart, item_id__in=removals).delete()
+        # Hold what the lines hold now, increments from concurrent requests included
+        quantities = dict.fromkeys(removals, 0)
+        quantities.update(upsert_quantities(cart, {
+            item_id: quantity for item_id, (mode, quantity) in changes.items() if mode == SET and quantity > 0
+        }, increment=False))
+        quantities.update(upsert_quantities(cart, {
+            item_id: quantity for item_id, (mode, quantity) in changes.items() if mode == ADD and quantity > 0
+        }, increment=True))
+        hold(cart.pk, quantities)
@@ -0,0 +1,224 @@
+"""Bulk catalog import and export as CSV or JSON Lines feeds.
+
+Feed rows are keyed by ``Item.sku`` and name their category. ``FeedImporter``
+reads a feed as a stream and checks each row against the model fields. It
+writes valid rows ``chunk_size`` at a time, updating existing skus with one
+``UPDATE ... FROM (VALUES ...)`` per column set (``update_by_sku()``) and
+inserting new ones with one ``bulk_create()``, and reports invalid rows
+without stopping. Only the columns a row has are written, so a
+``sku,price,stock_quantity`` feed reprices and restocks without touching
+anything else; a blank ``is_featured`` or ``is_active`` cell leaves the flag
+as it is. New items need at least ``name``, ``price`` and
+``category``. ``export_feed()`` streams the catalog back in the same shape.
+"""
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Category, Item
+from .renderers import stream_csv, stream_json_lines
+from .search import get_search_backend
+
+FEED_FIELDS = ('sku', 'name', 'description', 'price', 'category', 'image', 'stock_quantity', 'is_featured',
+               'is_active')
+FEED_FORMATS = ('csv', 'jsonl')
+# Feed column: cleaned value key
+REQUIRED_FOR_NEW = {'name': 'name', 'price': 'price', 'category': 'category_id'}
+BOOLEAN_FIELDS = ('is_featured', 'is_active')
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+
+class FeedError(Exception):
+    """The feed as a whole can't be read (bad format or header)."""
+
+
+def feed_format_for(filename, default=None):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(extension, default)
+
+
+def read_feed(stream, feed_format):
+    """Yield ``(line number, row dict or None, error)`` from a text stream."""
+    if feed_format == 'csv':
+        reader = csv.DictReader(stream)
+        columns = reader.fieldnames or []
+        unknown = set(columns) - set(FEED_FIELDS)
+        if 'sku' not in columns or unknown:
+            raise FeedError(f'CSV header needs a sku column and only {", ".join(FEED_FIELDS)}')
+        for row in reader:
+            yield reader.line_num, row, None
+    elif feed_format == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, None, f'Invalid JSON: {error}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Expected a JSON object'
+                continue
+            yield line_number, row, None
+    else:
+        raise FeedError(f'Unknown feed format {feed_format!r}; use one of {", ".join(FEED_FORMATS)}')
+
+
+class FeedImporter:
+    def __init__(self, chunk_size=1000, create_categories=False, max_errors=100):
+        self.chunk_size = chunk_size
+        self.create_categories = create_categories
+        self.max_errors = max_errors
+        # Category names resolve in memory; feeds name the same few over and over
+        self.categories = dict(Category.objects.values_list('name', 'pk'))
+        self.created = self.updated = self.error_count = 0
+        self.errors = []
+
+    def run(self, rows):
+        """Import ``(line, row, error)`` tuples from ``read_feed()``; return the report."""
+        chunk = {}
+        for line, row, error in rows:
+            if error is None:
+                sku, values, errors = self.clean(row)
+            else:
+                sku, values, errors = None, None, {'row': [error]}
+            if errors:
+                self.add_error(line, sku, errors)
+                continue
+            # A later row for the same sku wins
+            chunk.pop(sku, None)
+            chunk[sku] = (line, values)
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = {}
+        if chunk:
+            self.flush(chunk)
+        if self.created or self.updated:
+            # bulk_create skips the signals that keep these current
+            Category.objects.reconcile_items_count()
+            bump_catalog_version()
+        return self.report()
+
+    def report(self):
+        return {'created': self.created, 'updated': self.updated, 'error_count': self.error_count,
+                'errors': self.errors}
+
+    def add_error(self, line, sku, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'sku': sku, 'errors': errors})
+
+    def clean(self, row):
+        """``(sku, {field: value}, {field: [messages]})`` for one feed row."""
+        values, errors = {}, {}
+        for name, value in row.items():
+            if name not in FEED_FIELDS:
+                errors[name] = ['Unknown field.']
+            elif name == 'category':
+                category_id = self.category_id(value)
+                if category_id is None:
+                    errors[name] = [f'Unknown category "{value}".']
+                values['category_id'] = category_id
+            elif name in BOOLEAN_FIELDS:
+                flag = str(value if value is not None else '').strip().lower()
+                if not flag:
+                    # Blank: keep the current value (the default for new items)
+                    continue
+                if flag in TRUE_VALUES:
+                    values[name] = True
+                elif flag in FALSE_VALUES:
+                    values[name] = False
+                else:
+                    errors[name] = ['Must be true or false.']
+            else:
+                try:
+                    values[name] = Item._meta.get_field(name).clean(
+                        value.strip() if isinstance(value, str) else value, None)
+                except ValidationError as error:
+                    errors[name] = error.messages
+        sku = values.pop('sku', None)
+        if not sku and 'sku' not in errors:
+            errors['sku'] = ['This field is required.']
+        return sku, values, errors
+
+    def category_id(self, name):
+        name = str(name).strip()
+        if name not in self.categories and self.create_categories and name:
+            self.categories[name] = Category.objects.get_or_create(name=name)[0].pk
+        return self.categories.get(name)
+
+    def flush(self, chunk):
+        now = timezone.now()
+        reindex = []
+        with transaction.atomic():
+            existing = dict(Item.objects.filter(sku__in=list(chunk)).values_list('sku', 'pk'))
+            new, updates = [], {}
+            for sku, (line, values) in chunk.items():
+                if sku in existing:
+                    # Each UPDATE writes one column list
+                    item = Item(pk=existing[sku], sku=sku, updated_at=now, **values)
+                    updates.setdefault(frozenset(values), []).append(item)
+                    continue
+                missing = [name for name, key in REQUIRED_FOR_NEW.items() if key not in values]
+                if missing:
+                    self.add_error(line, sku, {name: ['Required for new items.'] for name in missing})
+                    continue
+                new.append(Item(sku=sku, **values))
+            for columns, items in updates.items():
+                update_by_sku(items, sorted(columns) + ['updated_at'])
+                if columns & {'name', 'description'}:
+                    reindex.extend(item.pk for item in items)
+            Item.objects.bulk_create(new)
+            reindex.extend(item.pk for item in new)
+            if reindex:
+                get_search_backend().index_items(Item.objects.filter(pk__in=reindex))
+        self.updated += sum(len(items) for items in updates.values())
+        self.created += len(new)
+
+def update_by_sku(items, fields):
+    """Write ``fields`` of ``items`` to the rows with their skus, a batch per statement.
+
+    ``bulk_update()`` builds a ``CASE`` per field per row, which costs more
+    than the write itself at feed sizes; ``UPDATE ... FROM (VALUES ...)`` takes
+    a plain row per item.
+    """
+    using = router.db_for_write(Item)
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        Item.objects.bulk_update(items, fields)
+        return
+    columns = [Item._meta.get_field(name) for name in ['sku'] + fields]
+    quote = connection.ops.quote_name
+    table = quote(Item._meta.db_table)
+    # VALUES names its columns column1, column2, ... on both backends
+    assignments = ', '.join(f'{quote(field.column)} = v.column{index}'
+                            for index, field in enumerate(columns[1:], 2))
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    batch_size = connection.ops.bulk_batch_size(columns, items)
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            params = [field.get_db_prep_save(getattr(item, field.attname), connection)
+                      for item in batch for field in columns]
+            cursor.execute(
+                f'UPDATE {table} SET {assignments} FROM (VALUES {", ".join([placeholders] * len(batch))}) AS v '
+                f'WHERE {table}.sku = v.column1',
+                params,
+            )
+
+
+def export_feed(feed_format, queryset=None):
+    """Stream ``queryset`` (default: every item) as feed text in primary key order."""
+    queryset = Item.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list(
+        'sku', 'name', 'description', 'price', 'category__name', 'image', 'stock_quantity', 'is_featured',
+        'is_active',
+    ).iterator(chunk_size=2000)
+    if feed_format == 'csv':
+        return stream_csv(FEED_FIELDS, rows)
+    return stream_json_lines(dict(zip(FEED_FIELDS, row)) for row in rows)
@@ -0,0 +1,126 @@
+"""Checkout: turn a user's cart into an order in one transaction.
+
+Stock rows are locked (``SELECT ... FOR UPDATE`` where supported) and
+decremented by a single conditional ``UPDATE``, order lines are inserted
+with one ``bulk_create`` and the cart is emptied, all atomically. Stock held
+by other carts is off limits, and the cart's own holds are released with
+it. When any line is short nothing is written and every shortage is
+reported.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from .models import Cart, CartItem, Item, Order, OrderItem, StockHold
+from .reservations import lock_holds, release_holds, reserved_quantities
+from .usercache import check_owned_id, with_owned_id
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status_code=400, shortages=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.shortages = shortages or []
+
+    def as_data(self):
+        data = {'error': self.message}
+        if self.shortages:
+            data['shortages'] = self.shortages
+        return data
+
+
+def find_shortages(quantities, items, reserved=None):
+    reserved = reserved or {}
+    shortages = []
+    for item_id, quantity in quantities.items():
+        item = items.get(item_id)
+        available = 0
+        if item is not None and item.is_active:
+            available = max(item.stock_quantity - reserved.get(item_id, 0), 0)
+        if quantity > available:
+            shortages.append({
+                'item_id': item_id,
+                'item_name': item.name if item is not None else None,
+                'requested': quantity,
+                'available': available,
+            })
+    return shortages
+
+
+def decrement_stock(quantities, reserved=None):
+    """Take ``quantities`` ({item_id: quantity}) off stock in one statement.
+
+    Each row only matches while it still holds enough stock beyond what
+    others have ``reserved``, so a short row is detected from the update
+    count even without row locks.
+    """
+    reserved = reserved or {}
+    enough_stock = reduce(or_, (
+        Q(pk=item_id, stock_quantity__gte=quantity + reserved.get(item_id, 0))
+        for item_id, quantity in quantities.items()
+    ))
+    updated = Item.objects.filter(enough_stock).update(
+        stock_quantity=Case(
+            *(When(pk=item_id, then=F('stock_quantity') - quantity)
+              for item_id, quantity in quantities.items()),
+            default=F('stock_quantity'),
+            output_field=Item._meta.get_field('stock_quantity'),
+        ),
+        updated_at=timezone.now(),
+    )
+    return updated == len(quantities)
+
+
+def checkout(user, shipping_address, payment_method='online', notes=''):
+    # A cart id cached before the cart was replaced reads as empty; retried
+    return with_owned_id(user, Cart, lambda cart_id: place_order(
+        user, cart_id, shipping_address, payment_method, notes), create=False)
+
+
+def place_order(user, cart_id, shipping_address, payment_method, notes):
+    with transaction.atomic():
+        if cart_id is None:
+            raise CheckoutError('Cart not found', status_code=404)
+
+        quantities = dict(
+            CartItem.objects.filter(cart_id=cart_id).values_list('item_id', 'quantity')
+        )
+        if not quantities:
+            check_owned_id(Cart, cart_id)
+            raise CheckoutError('Cart is empty')
+
+        # Lock in primary key order so concurrent checkouts can't deadlock
+        items = {
+            item.pk: item
+            for item in Item.objects.select_for_update().filter(pk__in=quantities).order_by('pk')
+        }
+        # Held by other carts; this cart's holds turn into the decrement
+        holds = lock_holds(StockHold.objects.filter(cart_id=cart_id))
+        reserved = reserved_quantities(list(quantities), exclude_cart=cart_id)
+        shortages = find_shortages(quantities, items, reserved)
+        if shortages:
+            raise CheckoutError('Not enough stock', shortages=shortages)
+        if not decrement_stock(quantities, reserved):
+            # Stock moved after the read (no row locks on this backend). The
+            # rows already decremented would read as short, so don't report
+            # shortages; raising rolls the partial decrement back.
+            raise CheckoutError('Stock changed during checkout; please try again', status_code=409)
+
+        order = Order.objects.create(
+            user=user,
+            total_amount=sum(items[item_id].price * quantity for item_id, quantity in quantities.items()),
+            shipping_address=shipping_address,
+            payment_method=payment_method,
+            notes=notes,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, item=items[item_id], quantity=quantity, price=items[item_id].price)
+            for item_id, quantity in quantities.items()
+        ])
+        CartItem.objects.filter(cart_id=cart_id).delete()
+        release_holds(holds)
+    return order
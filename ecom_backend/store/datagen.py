@@ -0,0 +1,253 @@
+"""Deterministic synthetic store data.
+
+``DataGenerator`` writes categories, items, users, carts, wishlists and
+orders with chunked ``bulk_create`` calls. Only compact ``array`` columns of
+ids and prices are kept between chunks, so memory stays flat however many
+rows are generated. Popularity is skewed the way real stores are: a few hot
+items get most cart, wishlist and order lines, category sizes follow a
+long-tailed Zipf distribution and, once every user has one order, a
+minority of users place most of the rest.
+"""
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import Cart, CartItem, Category, Item, Order, OrderItem, Wishlist
+from .rollups import rebuild_rollups
+
+ADJECTIVES = ['classic', 'smart', 'wireless', 'eco', 'ultra', 'mini', 'pro', 'travel', 'cotton', 'steel',
+              'vintage', 'compact', 'premium', 'organic', 'portable', 'digital', 'leather', 'bamboo']
+NOUNS = ['lamp', 'jacket', 'speaker', 'bottle', 'backpack', 'watch', 'mug', 'chair', 'keyboard', 'novel',
+         'sneakers', 'blender', 'tent', 'camera', 'headphones', 'notebook', 'yoga mat', 'kettle']
+DEPARTMENTS = ['Electronics', 'Clothing', 'Books', 'Home', 'Garden', 'Sports', 'Toys', 'Beauty',
+               'Kitchen', 'Office', 'Outdoors', 'Music', 'Pets', 'Automotive', 'Health', 'Grocery']
+
+# (order_status, payment_status, weight) for orders older than a week
+SETTLED_STATUSES = [('delivered', 'completed', 80), ('shipped', 'completed', 6), ('cancelled', 'refunded', 5),
+                    ('cancelled', 'failed', 4), ('processing', 'completed', 5)]
+RECENT_STATUSES = [('pending', 'pending', 40), ('processing', 'completed', 35), ('shipped', 'completed', 20),
+                   ('cancelled', 'failed', 5)]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk inserts set auto_now/auto_now_add fields explicitly."""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, rows, key, batch_size):
+    """``bulk_create()`` that leaves every row with its pk, looked up by the
+    unique ``key`` field on backends that can't return ids from bulk inserts."""
+    created = model.objects.bulk_create(rows, batch_size=batch_size)
+    if created and created[0].pk is None:
+        ids = dict(model.objects.filter(**{f'{key}__in': [getattr(row, key) for row in created]})
+                   .values_list(key, 'pk'))
+        for row in created:
+            row.pk = ids[getattr(row, key)]
+    return created
+
+
+def chunked(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+class DataGenerator:
+    def __init__(self, seed=42, chunk_size=5000, item_skew=3.0, user_skew=2.0, days=365, log=None):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.item_skew = item_skew
+        self.user_skew = user_skew
+        self.days = days
+        self.now = timezone.now()
+        self.log = log or (lambda message: None)
+        self.category_ids = array('q')
+        self.category_weights = []
+        self.item_ids = array('q')
+        self.item_prices = array('q')  # cents
+        self.user_ids = array('q')
+
+    # Sampling helpers
+    def hot_item_index(self):
+        # rng.random() ** skew piles up near 0, i.e. on the first (hot) items
+        return int(len(self.item_ids) * self.rng.random() ** self.item_skew)
+
+    def busy_user(self):
+        return self.user_ids[int(len(self.user_ids) * self.rng.random() ** self.user_skew)]
+
+    def distinct_hot_items(self, count):
+        indexes = set()
+        for _ in range(count * 3):
+            indexes.add(self.hot_item_index())
+            if len(indexes) == count:
+                break
+        return indexes
+
+    def past_timestamp(self):
+        return self.now - timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+
+    def timed(self, label, count, function, *args):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        self.log(f'{label}: {count} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f}/s)')
+
+    # Generators
+    def create_categories(self, count):
+        rows = []
+        for index in range(count):
+            department = DEPARTMENTS[index % len(DEPARTMENTS)]
+            rows.append(Category(name=f'{department} {index // len(DEPARTMENTS) + 1}',
+                                 description=f'{department} products'))
+        for category in bulk_insert(Category, rows, 'name', self.chunk_size):
+            self.category_ids.append(category.pk)
+        # Zipf-like sizes: category k gets weight 1 / (k + 1)
+        self.category_weights = list(accumulate(1.0 / (rank + 1) for rank in range(count)))
+
+    def create_items(self, count, featured_ratio=0.01, inactive_ratio=0.02):
+        rng = self.rng
+        with explicit_timestamps(Item):
+            for start, size in chunked(count, self.chunk_size):
+                rows = []
+                categories = rng.choices(self.category_ids, cum_weights=self.category_weights, k=size)
+                for offset in range(size):
+                    index = start + offset
+                    cents = int(rng.lognormvariate(7.5, 1.2)) + 99
+                    created = self.past_timestamp()
+                    name = f'{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS)} {index}'
+                    rows.append(Item(
+                        sku=f'GEN-{self.seed}-{index:07d}',
+                        name=name,
+                        description=' '.join(rng.choice(ADJECTIVES + NOUNS) for _ in range(16)),
+                        price=Decimal(cents) / 100,
+                        category_id=categories[offset],
+                        image=f'https://example.com/items/{index}.jpg',
+                        stock_quantity=rng.randint(0, 500) if rng.random() > 0.05 else 0,
+                        is_featured=rng.random() < featured_ratio,
+                        is_active=rng.random() >= inactive_ratio,
+                        created_at=created,
+                        updated_at=created,
+                    ))
+                    self.item_prices.append(cents)
+                for item in bulk_insert(Item, rows, 'sku', self.chunk_size):
+                    self.item_ids.append(item.pk)
+
+    def create_users(self, count, prefix='shopper_', password='password123'):
+        hashed = make_password(password)
+        for start, size in chunked(count, self.chunk_size):
+            rows = [
+                User(username=f'{prefix}{index}', email=f'{prefix}{index}@example.com', password=hashed,
+                     first_name=self.rng.choice(['Asha', 'Ravi', 'Meera', 'Arjun', 'Priya', 'Kiran']),
+                     last_name=self.rng.choice(['Sharma', 'Iyer', 'Khan', 'Patel', 'Das', 'Reddy']))
+                for index in range(start, start + size)
+            ]
+            self.user_ids.extend(user.pk for user in bulk_insert(User, rows, 'username', self.chunk_size))
+
+    def create_carts(self, ratio, max_lines):
+        users = [user_id for user_id in self.user_ids if self.rng.random() < ratio]
+        for start, size in chunked(len(users), self.chunk_size):
+            carts = bulk_insert(Cart, [Cart(user_id=user_id) for user_id in users[start:start + size]], 'user_id',
+                                self.chunk_size)
+            lines = []
+            for cart in carts:
+                for index in self.distinct_hot_items(self.rng.randint(1, max_lines)):
+                    lines.append(CartItem(cart_id=cart.pk, item_id=self.item_ids[index],
+                                          quantity=self.rng.randint(1, 3)))
+            CartItem.objects.bulk_create(lines, batch_size=self.chunk_size)
+
+    def create_wishlists(self, ratio, max_items):
+        through = Wishlist.items.through
+        users = [user_id for user_id in self.user_ids if self.rng.random() < ratio]
+        for start, size in chunked(len(users), self.chunk_size):
+            wishlists = bulk_insert(Wishlist, [Wishlist(user_id=user_id) for user_id in users[start:start + size]],
+                                    'user_id', self.chunk_size)
+            rows = []
+            for wishlist in wishlists:
+                for index in self.distinct_hot_items(self.rng.randint(1, max_items)):
+                    rows.append(through(wishlist_id=wishlist.pk, item_id=self.item_ids[index]))
+            through.objects.bulk_create(rows, batch_size=self.chunk_size)
+
+    def order_statuses(self, created):
+        choices = RECENT_STATUSES if self.now - created < timedelta(days=7) else SETTLED_STATUSES
+        order_status, payment_status, weight = self.rng.choices(choices, weights=[row[2] for row in choices])[0]
+        return order_status, payment_status
+
+    def create_orders(self, count, max_lines):
+        rng = self.rng
+        with explicit_timestamps(Order, OrderItem):
+            for start, size in chunked(count, self.chunk_size):
+                orders, lines_per_order = [], []
+                for index in range(start, start + size):
+                    created = self.past_timestamp()
+                    lines = [(self.item_ids[item], rng.randint(1, 3), self.item_prices[item])
+                             for item in self.distinct_hot_items(rng.randint(1, max_lines))]
+                    order_status, payment_status = self.order_statuses(created)
+                    orders.append(Order(
+                        # Every user's first order, then mostly the busy ones
+                        user_id=self.user_ids[index] if index < len(self.user_ids) else self.busy_user(),
+                        order_number=f'GEN-{self.seed}-{index:09d}',
+                        total_amount=Decimal(sum(quantity * cents for _, quantity, cents in lines)) / 100,
+                        order_status=order_status,
+                        payment_status=payment_status,
+                        payment_method=rng.choice(['online', 'online', 'card', 'cod']),
+                        shipping_address=f'{rng.randint(1, 999)} Market Road',
+                        created_at=created,
+                        updated_at=created,
+                    ))
+                    lines_per_order.append(lines)
+                bulk_insert(Order, orders, 'order_number', self.chunk_size)
+                OrderItem.objects.bulk_create([
+                    OrderItem(order_id=order.pk, item_id=item_id, quantity=quantity,
+                              price=Decimal(cents) / 100, created_at=order.created_at)
+                    for order, lines in zip(orders, lines_per_order)
+                    for item_id, quantity, cents in lines
+                ], batch_size=self.chunk_size)
+
+    def generate(self, categories, items, users, orders, cart_ratio=0.3, wishlist_ratio=0.2, max_lines=5,
+                 user_prefix='shopper_', password='password123'):
+        self.timed('categories', categories, self.create_categories, categories)
+        self.timed('items', items, self.create_items, items)
+        self.timed('users', users, self.create_users, users, user_prefix, password)
+        self.timed('carts', int(users * cart_ratio), self.create_carts, cart_ratio, max_lines)
+        self.timed('wishlists', int(users * wishlist_ratio), self.create_wishlists, wishlist_ratio, max_lines * 2)
+        self.timed('orders', orders, self.create_orders, orders, max_lines)
+        # bulk_create skips the signals that keep category counters and
+        # order rollups current
+        Category.objects.reconcile_items_count()
+        rebuild_rollups()
+
+
+def load_demo_catalog():
+    """Idempotently load the curated demo catalog from ``sample_data``."""
+    from .sample_data import DEMO_CATEGORIES, DEMO_ITEMS
+
+    existing = set(Category.objects.values_list('name', flat=True))
+    Category.objects.bulk_create([Category(**row) for row in DEMO_CATEGORIES if row['name'] not in existing])
+    categories = {category.name: category for category in Category.objects.all()}
+    existing = set(Item.objects.values_list('name', flat=True))
+    rows = [
+        Item(**{**row, 'sku': f'DEMO-{index:03d}', 'category': categories[row['category']],
+                'price': Decimal(str(row['price']))})
+        for index, row in enumerate(DEMO_ITEMS) if row['name'] not in existing
+    ]
+    Item.objects.bulk_create(rows)
+    Category.objects.reconcile_items_count()
+    return len(rows)
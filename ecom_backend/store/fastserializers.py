@@ -0,0 +1,265 @@
+"""Fast read-only serializers for list endpoints.
+
+A ``FastSerializer`` reproduces the output of a DRF serializer from
+``queryset.values()`` rows instead of model instances. The DRF field list is
+compiled once into ``(name, getter, converter)`` entries: dotted sources
+become ``__`` lookups, ``get_FOO_display`` becomes a choices lookup, and
+Decimals and datetimes are formatted exactly as the DRF fields would. Values
+that aren't columns (model properties, methods) are declared in
+``computed``, reading the columns the DRF serializer lists in
+``Meta.sparse_columns``. Nested many-to-one serializers cost one query per
+page. A ``Fieldset`` (see ``sparse``) narrows both the output and the
+``values()`` column list; each selection is compiled once, and the
+``COMPILED_CACHE_SIZE`` most recently used selections are kept.
+
+These are for reads only; writes go through the regular serializers.
+"""
+import threading
+from collections import defaultdict
+from decimal import Decimal, getcontext
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .metrics import timed
+from .serializers import (
+    CartItemSerializer, CartSerializer, ItemSerializer, OrderItemSerializer, OrderSerializer
+)
+from .sparse import Fieldset
+
+# Compiled selections kept per serializer; clients choose ?fields=, so the
+# number of distinct ones is up to them
+COMPILED_CACHE_SIZE = 128
+_compiled_lock = threading.Lock()
+
+
+def fast_serializers_enabled():
+    return getattr(settings, 'FAST_SERIALIZERS', True)
+
+
+def decimal_converter(field):
+    if field.decimal_places is None:
+        quantum = None
+    else:
+        quantum = Decimal('.1') ** field.decimal_places
+    context = getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+
+    def convert(value):
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value).strip())
+        if quantum is not None:
+            value = value.quantize(quantum, rounding=rounding, context=context)
+        return f'{value:f}' if coerce_to_string else value
+    return convert
+
+
+def datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None:
+        return None
+    if output_format.lower() != 'iso-8601':
+        return lambda value: field.to_representation(value)
+
+    def convert(value, tz):
+        if tz is not None and timezone.is_aware(value):
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    # Called with the current time zone, looked up once per page
+    convert.takes_tz = True
+    return convert
+
+
+def field_converter(field):
+    if isinstance(field, serializers.DecimalField):
+        return decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return lambda value: field.to_representation(value)
+    return None
+
+
+class FastSerializer:
+    serializer_class = None
+    # {name: function}; function(*values of Meta.sparse_columns[name]) gives the value
+    computed = {}
+    # {name: (FastSerializer subclass, foreign key on the child model)}
+    nested = {}
+
+    _compiled = None
+
+    def __init__(self, fieldset=None):
+        cls = type(self)
+        key = None if fieldset is None else fieldset.key
+        with _compiled_lock:
+            if cls.__dict__.get('_compiled') is None:
+                cls._compiled = {}
+            # Re-inserted on every use, so the dict runs least recently used first
+            compiled = cls._compiled.pop(key, None)
+        if compiled is None:
+            compiled = self.compile(fieldset)
+        with _compiled_lock:
+            cls._compiled[key] = compiled
+            while len(cls._compiled) > COMPILED_CACHE_SIZE:
+                del cls._compiled[next(iter(cls._compiled))]
+        self.convert_row, self.columns, self.children_fieldsets = compiled
+
+    @property
+    def model(self):
+        return self.serializer_class.Meta.model
+
+    def compile(self, fieldset=None):
+        """Generate ``convert_row(row, children, tz)`` for this serializer's fields.
+
+        The function builds the output dict in a single expression, with
+        each value read and converted inline.
+        """
+        columns, namespace, items, children_fieldsets = ['pk'], {}, [], {}
+        sparse_columns = getattr(self.serializer_class.Meta, 'sparse_columns', {})
+
+        def column(name):
+            if name not in columns:
+                columns.append(name)
+            return f'row[{name!r}]'
+
+        def convert(expression, converter):
+            if converter is None:
+                return expression
+            namespace[f'_c{len(namespace)}'] = converter
+            arguments = '_v, tz' if getattr(converter, 'takes_tz', False) else '_v'
+            return f'(None if (_v := {expression}) is None else _c{len(namespace) - 1}({arguments}))'
+
+        for name, field in self.serializer_class(fieldset=fieldset).fields.items():
+            if field.write_only:
+                continue
+            if name in self.nested:
+                children_fieldsets[name] = getattr(field, 'child', field).fieldset
+                value = f"children[{name!r}].get(row['pk'], [])"
+            elif name in self.computed:
+                namespace[f'_f{len(namespace)}'] = self.computed[name]
+                arguments = ', '.join(column(source) for source in sparse_columns[name])
+                value = convert(f'_f{len(namespace) - 1}({arguments})', field_converter(field))
+            else:
+                source, converter = self.resolve(name, field)
+                value = convert(column(source), converter)
+            items.append(f'{name!r}: {value}')
+
+        code = 'def convert_row(row, children, tz):\n    return {' + ', '.join(items) + '}\n'
+        exec(compile(code, f'<{type(self).__name__}>', 'exec'), namespace)
+        return namespace['convert_row'], columns, children_fieldsets
+
+    def resolve(self, name, field):
+        """Return the ``values()`` lookup and converter for a DRF field."""
+        source = field.source
+        if source.startswith('get_') and source.endswith('_display'):
+            model_field = self.model._meta.get_field(source[len('get_'):-len('_display')])
+            labels = {value: str(label) for value, label in model_field.flatchoices}
+            return model_field.name, lambda value: labels.get(value, value)
+
+        model = self.model
+        for part in source.split('.'):
+            try:
+                model = model._meta.get_field(part).related_model
+            except (AttributeError, FieldDoesNotExist):
+                raise ImproperlyConfigured(
+                    f'{type(self).__name__}: "{name}" is not a database column; declare it in computed'
+                )
+        return source.replace('.', '__'), field_converter(field)
+
+    def values(self, queryset, *extra_columns):
+        """``queryset.values()`` with every column this serializer reads."""
+        return queryset.values(*self.columns, *[column for column in extra_columns if column not in self.columns])
+
+    def serialize(self, rows):
+        rows = list(rows)
+        children = {}
+        for name, fieldset in self.children_fieldsets.items():
+            serializer_class, foreign_key = self.nested[name]
+            children[name] = serializer_class(fieldset).children(foreign_key, [row['pk'] for row in rows])
+        convert_row = self.convert_row
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        with timed('serialize'):
+            return [convert_row(row, children, tz) for row in rows]
+
+    def children(self, foreign_key, parent_ids):
+        """Serialize the rows pointing at ``parent_ids``, grouped by parent id."""
+        grouped = defaultdict(list)
+        if not parent_ids:
+            return grouped
+        # Ordered along the foreign key's index, not the primary key, so
+        # the database seeks each parent's rows instead of scanning the table
+        queryset = self.model.objects.filter(**{f'{foreign_key}__in': parent_ids}).order_by(foreign_key, 'pk')
+        rows = list(self.values(queryset, foreign_key))
+        for row, data in zip(rows, self.serialize(rows)):
+            grouped[row[foreign_key]].append(data)
+        return grouped
+
+
+class FastItemSerializer(FastSerializer):
+    """Reads items annotated by ``ItemQuerySet.with_available_stock()``."""
+    serializer_class = ItemSerializer
+    computed = {
+        'available_quantity': lambda stock, reserved: max(stock - reserved, 0),
+        'is_in_stock': lambda stock, reserved: stock > reserved,
+    }
+
+
+class FastCartItemSerializer(FastSerializer):
+    serializer_class = CartItemSerializer
+    computed = {'total_price': lambda quantity, price: quantity * price}
+
+
+class FastCartSerializer(FastSerializer):
+    """Reads carts annotated by ``CartQuerySet.with_totals()``."""
+    serializer_class = CartSerializer
+    computed = {
+        'total_price': lambda total: total,
+        'total_items': lambda total: total,
+    }
+    nested = {'items': (FastCartItemSerializer, 'cart')}
+
+
+class FastOrderItemSerializer(FastSerializer):
+    serializer_class = OrderItemSerializer
+    computed = {'total_price': lambda quantity, price: quantity * price}
+
+
+class FastOrderSerializer(FastSerializer):
+    serializer_class = OrderSerializer
+    computed = {'user_name': lambda first_name, last_name: f'{first_name} {last_name}'.strip()}
+    nested = {'items': (FastOrderItemSerializer, 'order')}
+
+
+class FastListMixin:
+    """Serve list pages through ``fast_serializer_class`` when enabled.
+
+    The page is read with ``values()``, including the ordering columns, so
+    keyset pagination works the same on both paths. ``?fields=`` and
+    ``?exclude=`` narrow the columns read.
+    """
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if not fast_serializers_enabled():
+            return super().list(request, *args, **kwargs)
+
+        fast = self.fast_serializer_class(Fieldset.from_request(request))
+        # Nested rows are fetched by the fast serializer itself
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        # Meta.ordering too, which keyset pagination orders by when the view sets none
+        ordering = [name.lstrip('-') for name in queryset.query.order_by or queryset.model._meta.ordering
+                    if isinstance(name, str)]
+        rows = fast.values(queryset, *ordering, 'id')
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(rows))
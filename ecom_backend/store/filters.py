@@ -0,0 +1,25 @@
+from rest_framework.filters import SearchFilter, OrderingFilter
+
+from .search import get_search_backend
+
+
+class ItemSearchFilter(SearchFilter):
+    """``?search=`` backed by the full-text index instead of LIKE scans."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_search_backend().search(queryset, ' '.join(terms))
+
+
+class ItemOrderingFilter(OrderingFilter):
+    """Orders search results by relevance unless ``?ordering=`` is given."""
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(self.ordering_param):
+            ordering = ['-search_rank'] + list(ordering or [])
+        if ordering:
+            return queryset.order_by(*ordering)
+        return queryset
@@ -0,0 +1,50 @@
+"""Payment gateway interface and the local stub the workers use by default.
+
+``PAYMENT_GATEWAY`` names the class ``payments.PaymentWorker`` charges
+through. A gateway's ``charge()`` returns the provider's reference for the
+payment, raises ``PaymentDeclined`` when retrying can't help, or
+``GatewayError`` for failures worth retrying (timeouts, 5xx responses).
+Charges carry an idempotency key, so a retry after a lost response doesn't
+charge twice.
+"""
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class GatewayError(Exception):
+    """A transient failure; the charge may be retried."""
+
+
+class PaymentDeclined(GatewayError):
+    """The provider refused the charge; retrying won't change that."""
+
+
+class StubGateway:
+    """Stands in for a provider: waits ``PAYMENT_STUB_LATENCY`` seconds, then
+    fails with ``PAYMENT_STUB_ERROR_RATE`` or declines with
+    ``PAYMENT_STUB_DECLINE_RATE`` probability, and otherwise succeeds.
+    """
+
+    def __init__(self):
+        self.latency = getattr(settings, 'PAYMENT_STUB_LATENCY', 0.2)
+        self.error_rate = getattr(settings, 'PAYMENT_STUB_ERROR_RATE', 0.0)
+        self.decline_rate = getattr(settings, 'PAYMENT_STUB_DECLINE_RATE', 0.0)
+
+    def charge(self, amount, reference, idempotency_key):
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise GatewayError('Gateway timed out')
+        if random.random() < self.decline_rate:
+            raise PaymentDeclined('Card declined')
+        # The same key always gets the same reference, like a provider
+        # replaying the original response
+        return 'stub_' + hashlib.sha256(idempotency_key.encode()).hexdigest()[:20]
+
+
+def get_gateway():
+    return import_string(getattr(settings, 'PAYMENT_GATEWAY', 'store.gateway.StubGateway'))()
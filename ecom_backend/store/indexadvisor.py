@@ -0,0 +1,169 @@
+"""Check the store's queries against its indexes with ``EXPLAIN``.
+
+``capture_queries`` replays the read scenarios of the benchmark suite
+in-process (inside a rolled back transaction) plus a few access patterns
+they don't cover, and records the SQL they run. ``explain`` asks the database for
+each statement's plan and pulls out full table scans, temporary sorts and
+the indexes used; ``advise`` folds those into a report that also lists the
+store's indexes no plan touched.
+"""
+import random
+import re
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from .models import Category, Item, Order, StockHold
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+SQLITE_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+
+
+def extra_querysets():
+    """Access patterns the read scenarios miss: admin filters, category pages, the hold sweeper."""
+    category = Category.objects.order_by('pk').first()
+    return [
+        StockHold.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at')[:500],
+        Order.objects.filter(order_status='pending').order_by('-created_at')[:100],
+        Order.objects.filter(payment_status='failed').order_by('-created_at')[:100],
+        Item.objects.filter(is_active=True, is_featured=True).order_by('-created_at')[:100],
+        Item.objects.filter(is_active=True, category=category).order_by('-created_at', '-id')[:20],
+    ]
+
+
+def statement_is_read(sql):
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and statement_is_read(sql):
+            self.queries.append((sql, tuple(params or ())))
+        return execute(sql, params, many, context)
+
+
+def capture_queries(using='default', rounds=3, seed=0):
+    """Replay the read scenarios and ``extra_querysets()``; return ``[(sql, params)]``."""
+    from rest_framework.test import APIClient
+
+    from .benchmarks.scenarios import SCENARIOS
+
+    rng_state = random.getstate()
+    random.seed(seed)
+    connection = connections[using]
+    recorder = QueryRecorder()
+    try:
+        with override_settings(STORE_CACHE_ENABLED=False, ALLOWED_HOSTS=['*']), \
+                transaction.atomic(using=using), connection.execute_wrapper(recorder):
+            user = (User.objects.filter(orders__isnull=False).first() or User.objects.first())
+            state = SimpleNamespace(
+                username=user.username if user else '',
+                item_ids=list(Item.objects.filter(is_active=True).values_list('pk', flat=True)[:500]) or [0],
+                category_ids=list(Category.objects.values_list('pk', flat=True)[:100]) or [0],
+                order_ids=list(Order.objects.filter(user=user).values_list('pk', flat=True)[:50]) or [0],
+                # Only read by write scenarios, which aren't replayed
+                password='', refresh='', cart_item=0, registration=dict,
+                pick_cart_item=lambda: 0, pop_order=lambda: 0,
+            )
+            del recorder.queries[:]
+            client = APIClient()
+            for _ in range(rounds):
+                for scenario in SCENARIOS:
+                    request = scenario.build(state)
+                    if request.method != 'GET' or (request.auth and user is None):
+                        continue
+                    client.force_authenticate(user if request.auth else None)
+                    client.get(request.path)
+            for queryset in extra_querysets():
+                list(queryset.using(using))
+            transaction.set_rollback(True, using=using)
+    finally:
+        random.setstate(rng_state)
+
+    seen, queries = set(), []
+    for sql, params in recorder.queries:
+        if sql not in seen:
+            seen.add(sql)
+            queries.append((sql, params))
+    return queries
+
+
+@dataclass
+class Plan:
+    sql: str
+    lines: list = field(default_factory=list)
+    scans: list = field(default_factory=list)
+    indexes: set = field(default_factory=set)
+    temp_sort: bool = False
+
+
+def explain(sql, params, using='default'):
+    connection = connections[using]
+    plan = Plan(sql)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            for row in cursor.fetchall():
+                detail = row[-1]
+                plan.lines.append(detail)
+                scan = SQLITE_SCAN.match(detail)
+                if scan:
+                    plan.scans.append(scan.group(1))
+                plan.indexes.update(SQLITE_INDEX.findall(detail))
+                plan.temp_sort = plan.temp_sort or 'TEMP B-TREE' in detail
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            walk_postgres_plan(cursor.fetchone()[0][0]['Plan'], plan)
+        else:
+            raise NotImplementedError(f'EXPLAIN parsing is not implemented for {connection.vendor}')
+    return plan
+
+
+def walk_postgres_plan(node, plan, depth=0):
+    node_type = node['Node Type']
+    plan.lines.append('  ' * depth + node_type + (f" on {node['Relation Name']}" if 'Relation Name' in node else ''))
+    if node_type == 'Seq Scan':
+        plan.scans.append(node['Relation Name'])
+    if 'Index Name' in node:
+        plan.indexes.add(node['Index Name'])
+    if node_type in ('Sort', 'Incremental Sort'):
+        plan.temp_sort = True
+    for child in node.get('Plans', []):
+        walk_postgres_plan(child, plan, depth + 1)
+
+
+def store_indexes(using='default'):
+    """``{index name: table}`` for the store's non-unique secondary indexes."""
+    connection = connections[using]
+    indexes = {}
+    with connection.cursor() as cursor:
+        for model in apps.get_app_config('store').get_models(include_auto_created=True):
+            table = model._meta.db_table
+            for name, info in connection.introspection.get_constraints(cursor, table).items():
+                if info['index'] and not info['unique'] and not info['primary_key']:
+                    indexes[name] = table
+    return indexes
+
+
+def advise(queries, using='default', allowed_scans=()):
+    """Explain every query; return ``(problem plans, used indexes, unused indexes)``."""
+    problems, used = [], set()
+    # Plans also scan subqueries and CTEs; only tables matter
+    tables = set(connections[using].introspection.table_names()) - set(allowed_scans)
+    for sql, params in queries:
+        plan = explain(sql, params, using=using)
+        used |= plan.indexes
+        plan.scans = [table for table in plan.scans if table in tables]
+        if plan.scans:
+            problems.append(plan)
+    indexes = store_indexes(using)
+    unused = {name: table for name, table in indexes.items() if name not in used}
+    return problems, used & set(indexes), unused
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user order rollups behind /api/orders/summary/ from the orders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rollup rows inserted per statement')
+
+    def handle(self, *args, **options):
+        fixed = rebuild_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt order rollups; {fixed} row(s) had drifted'))
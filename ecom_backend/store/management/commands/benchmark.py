@@ -0,0 +1,203 @@
+import importlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connections
+from django.urls import clear_url_caches
+
+from store.benchmarks.dataset import load_catalog, seed
+from store.benchmarks.runner import compare_reports, run_load
+from store.benchmarks.scenarios import select_scenarios
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the store API with concurrent virtual users and report latency percentiles, '
+        'throughput and queries per request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help='Benchmark an already running server (e.g. gunicorn) at this URL; '
+                                             'its database must hold data seeded with --seed-only')
+        parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                            help='In-process server: threaded WSGI, or uvicorn ASGI with the async views')
+        parser.add_argument('--seed-only', action='store_true',
+                            help='Seed the configured database with benchmark data and exit')
+        parser.add_argument('--vus', type=int, default=10, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run')
+        parser.add_argument('--max-requests', type=int, default=None, help='Stop each user after N requests')
+        parser.add_argument('--items', type=int, default=2000, help='Items to seed')
+        parser.add_argument('--users', type=int, default=50, help='Users to seed')
+        parser.add_argument('--categories', type=int, default=20, help='Categories to seed')
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Only run this scenario')
+        parser.add_argument('--tag', action='append', dest='tags',
+                            help='Only run scenarios with this tag (browse, search, auth, cart, wishlist, orders)')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the catalog response cache')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Compare against a previous JSON report')
+        parser.add_argument('--regression-threshold', type=float, default=15.0,
+                            help='Percent change that counts as a regression in --compare')
+
+    def handle(self, *args, **options):
+        scenarios = select_scenarios(options['scenarios'], options['tags'])
+        if not scenarios:
+            raise CommandError('No scenarios selected')
+
+        if options['seed_only']:
+            self.seed(options)
+            return
+
+        if options['no_cache']:
+            settings.STORE_CACHE_ENABLED = False
+
+        if options['target']:
+            report = self.run(options['target'].rstrip('/'), scenarios, options, server='external')
+        else:
+            with self.isolated_database():
+                self.seed(options)
+                local_server = self.asgi_server if options['server'] == 'asgi' else self.wsgi_server
+                with local_server() as base_url:
+                    report = self.run(base_url, scenarios, options, server=f"in-process {options['server']}")
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+        if options['compare']:
+            self.compare(report, options)
+
+    def seed(self, options):
+        start = time.perf_counter()
+        seed(items=options['items'], users=options['users'], categories=options['categories'])
+        call_command('rebuild_search_index', stdout=self.stdout)
+        self.stdout.write(f'Seeded dataset in {time.perf_counter() - start:.1f}s')
+
+    @contextmanager
+    def isolated_database(self):
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        directory = None
+        if connection.vendor == 'sqlite':
+            # A file database, so every server thread gets a real connection
+            directory = tempfile.mkdtemp(prefix='store-benchmark-')
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    @contextmanager
+    def wsgi_server(self):
+        settings.QUERY_COUNT_HEADER = True
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=False)
+        server.set_app(get_internal_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f'http://127.0.0.1:{server.server_port}'
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @contextmanager
+    def asgi_server(self):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('--server asgi needs uvicorn (pip install uvicorn)')
+        from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+        from django.core.asgi import get_asgi_application
+
+        # Mirror ecom_project/asgi.py: every async view on, no WhiteNoise
+        settings.QUERY_COUNT_HEADER = True
+        settings.ASYNC_VIEWS = ['*']
+        settings.MIDDLEWARE = [name for name in settings.MIDDLEWARE if not name.startswith('whitenoise.')]
+        for module in ('store.urls', settings.ROOT_URLCONF):
+            importlib.reload(importlib.import_module(module))
+        clear_url_caches()
+
+        config = uvicorn.Config(ASGIStaticFilesHandler(get_asgi_application()), host='127.0.0.1', port=0,
+                                log_level='warning', lifespan='off')
+        server = uvicorn.Server(config)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            if not thread.is_alive():
+                raise CommandError('uvicorn failed to start')
+            time.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        try:
+            yield f'http://127.0.0.1:{port}'
+        finally:
+            server.should_exit = True
+            thread.join()
+
+    def run(self, base_url, scenarios, options, server):
+        catalog = load_catalog()
+        if not catalog['usernames'] or not catalog['item_ids']:
+            raise CommandError('No benchmark data found; seed it with --seed-only first')
+        self.stdout.write(
+            f"Running {len(scenarios)} scenarios with {options['vus']} virtual users "
+            f"for {options['duration']}s against {base_url}"
+        )
+        report = run_load(base_url, catalog, scenarios, options['vus'], options['duration'], options['max_requests'])
+        report['meta'] = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'server': server,
+            'database': connections['default'].vendor,
+            'python': platform.python_version(),
+            'virtual_users': options['vus'],
+            'duration': options['duration'],
+            'items': len(catalog['item_ids']),
+            'cache': not options['no_cache'],
+        }
+        return report
+
+    def print_report(self, report):
+        header = f"{'scenario':<24}{'reqs':>7}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>7}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        rows = list(report['scenarios'].items()) + [('TOTAL', report['total'])]
+        for name, stats in rows:
+            latency = stats['latency_ms']
+            queries = stats['queries_per_request']
+            self.stdout.write(
+                f"{name:<24}{stats['requests']:>7}{stats['errors']:>5}{stats['throughput_rps']:>9.1f}"
+                f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+                f"{'-' if queries is None else f'{queries:.1f}':>7}"
+            )
+
+    def compare(self, report, options):
+        with open(options['compare']) as handle:
+            baseline = json.load(handle)
+        regressions = []
+        for name, metric, old, new, change, regressed in compare_reports(
+                baseline, report, options['regression_threshold']):
+            line = f'{name:<24}{metric:<8}{old:>10.2f} -> {new:<10.2f}{change:+7.1f}%'
+            if regressed:
+                regressions.append(line)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'{len(regressions)} metrics regressed by more than '
+                               f"{options['regression_threshold']}%")
@@ -0,0 +1,95 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from store.checkout import checkout
+from store.models import Cart, CartItem, Category, Item, Order, OrderItem
+
+MODES = ('both', 'current', 'baseline')
+
+
+def baseline_checkout(user, shipping_address):
+    """The ``create_order`` view body from before the checkout engine.
+
+    A query per cart line for the total and another for each order line, one
+    ``INSERT`` per line, and no stock checks; kept to compare against.
+    """
+    cart = Cart.objects.get(user=user)
+    cart_items = cart.items.all()
+    if not cart_items:
+        raise CommandError('Cart is empty')
+    order = Order.objects.create(
+        user=user,
+        total_amount=sum(cart_item.quantity * cart_item.item.price for cart_item in cart.items.all()),
+        shipping_address=shipping_address,
+        payment_method='online',
+        notes='',
+    )
+    for cart_item in cart_items:
+        OrderItem.objects.create(order=order, item=cart_item.item, quantity=cart_item.quantity,
+                                 price=cart_item.item.price)
+    cart_items.delete()
+    return order
+
+
+class Command(BaseCommand):
+    help = (
+        'Time checkout() alone, without HTTP: sequential checkouts of full carts '
+        'against a throwaway database, reported as checkouts per second, next to the '
+        'per-row create_order path it replaced on the same carts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=300, help='Checkouts to run')
+        parser.add_argument('--lines', type=int, default=10, help='Line items per cart')
+        parser.add_argument('--items', type=int, default=200, help='Items the carts draw from')
+        parser.add_argument('--mode', choices=MODES, default='both',
+                            help='Time checkout() (current), the old per-row path (baseline) or both')
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            rates = self.run(options['checkouts'], options['lines'], options['items'], options['mode'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        for mode, rate in rates.items():
+            self.stdout.write(
+                f"{mode}: {options['checkouts']} checkouts of {options['lines']}-line carts on {connection.vendor}: "
+                f'{rate:.1f} checkouts/s'
+            )
+        if len(rates) == 2:
+            self.stdout.write(f"current/baseline: {rates['current'] / rates['baseline']:.2f}x")
+
+    def run(self, checkouts, lines, items, mode):
+        category = Category.objects.create(name='Benchmark')
+        # Enough for both runs; the baseline doesn't take stock
+        Item.objects.bulk_create(
+            Item(name=f'Benchmark item {n}', sku=f'BENCH-{n:06d}', price=10, category=category,
+                 stock_quantity=checkouts * lines)
+            for n in range(items)
+        )
+        item_ids = list(Item.objects.order_by('pk').values_list('pk', flat=True))
+        User.objects.bulk_create(User(username=f'checkout{n}') for n in range(checkouts))
+        users = list(User.objects.filter(username__startswith='checkout').order_by('pk'))
+        Cart.objects.bulk_create(Cart(user=user) for user in users)
+        cart_ids = list(Cart.objects.order_by('pk').values_list('pk', flat=True))
+
+        rates = {}
+        for name, run_checkout in (('baseline', baseline_checkout), ('current', checkout)):
+            if mode not in ('both', name):
+                continue
+            # The same carts for each path
+            CartItem.objects.bulk_create(
+                CartItem(cart_id=cart_id, item_id=item_ids[(n * lines + line) % len(item_ids)], quantity=1)
+                for n, cart_id in enumerate(cart_ids)
+                for line in range(lines)
+            )
+            start = time.perf_counter()
+            for user in users:
+                run_checkout(user, 'Benchmark address')
+            rates[name] = len(users) / (time.perf_counter() - start)
+        return rates
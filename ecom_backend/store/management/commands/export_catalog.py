@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from store.catalogfeed import FEED_FORMATS, export_feed, feed_format_for
+
+
+class Command(BaseCommand):
+    help = 'Stream every item as a CSV or JSON Lines feed that import_catalog reads back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FEED_FORMATS, default=None,
+                            help='Feed format (default: from the output extension, else csv)')
+        parser.add_argument('--output', default='-', help='Output file (default: stdout)')
+
+    def handle(self, *args, **options):
+        feed_format = options['format'] or feed_format_for(options['output'], 'csv')
+        if options['output'] == '-':
+            for chunk in export_feed(feed_format):
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in export_feed(feed_format):
+                output.write(chunk)
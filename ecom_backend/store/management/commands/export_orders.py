@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalogfeed import FEED_FORMATS, feed_format_for
+from store.orderexport import EXPORT_CHUNK_SIZE, export_orders, filter_orders, parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Stream orders with their line items as JSON Lines or CSV for fulfilment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Orders created at or after this ISO date or datetime')
+        parser.add_argument('--until', help='Orders created before this datetime, or up to the end of this date')
+        parser.add_argument('--status', action='append', default=[], help='Order status (repeatable)')
+        parser.add_argument('--payment-status', action='append', default=[], help='Payment status (repeatable)')
+        parser.add_argument('--format', choices=FEED_FORMATS, default=None,
+                            help='Output format (default: from the output extension, else jsonl)')
+        parser.add_argument('--output', default='-', help='Output file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Orders fetched per round trip, and per line item query')
+
+    def handle(self, *args, **options):
+        try:
+            orders = filter_orders(
+                since=parse_bound(options['since']) if options['since'] else None,
+                until=parse_bound(options['until'], end=True) if options['until'] else None,
+                statuses=options['status'],
+                payment_statuses=options['payment_status'],
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+        feed_format = options['format'] or feed_format_for(options['output'], 'jsonl')
+        chunks = export_orders(feed_format, orders, options['chunk_size'])
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
@@ -0,0 +1,62 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from store.cache import bump_catalog_version
+from store.datagen import DataGenerator, load_demo_catalog
+from store.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic dataset (categories, items, users, carts, wishlists, orders) '
+        'with chunked bulk inserts, or load the small demo catalog with --demo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--demo', action='store_true', help='Load the curated 13-item demo catalog and exit')
+        parser.add_argument('--categories', type=int, default=200)
+        parser.add_argument('--items', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--cart-ratio', type=float, default=0.3, help='Share of users with a cart')
+        parser.add_argument('--wishlist-ratio', type=float, default=0.2, help='Share of users with a wishlist')
+        parser.add_argument('--max-lines', type=int, default=5, help='Maximum lines per cart/order')
+        parser.add_argument('--days', type=int, default=365, help='Spread item and order dates over this many days')
+        parser.add_argument('--user-prefix', default='shopper_')
+        parser.add_argument('--password', default='password123', help='Password for every generated user')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; equal seeds give equal data')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--skip-index', action='store_true', help="Don't rebuild the search index afterwards")
+
+    def handle(self, *args, **options):
+        if options['demo']:
+            created = load_demo_catalog()
+            self.finish(options)
+            self.stdout.write(self.style.SUCCESS(f'Loaded demo catalog ({created} new items)'))
+            return
+
+        if User.objects.filter(username__startswith=options['user_prefix']).exists():
+            raise CommandError(f"Users prefixed '{options['user_prefix']}' already exist; "
+                               f"use another --user-prefix or an empty database")
+        if options['categories'] and Category.objects.filter(name='Electronics 1').exists():
+            raise CommandError('Generated categories already exist; use an empty database')
+
+        start = time.perf_counter()
+        generator = DataGenerator(seed=options['seed'], chunk_size=options['chunk_size'], days=options['days'],
+                                  log=self.stdout.write)
+        generator.generate(
+            categories=options['categories'], items=options['items'], users=options['users'],
+            orders=options['orders'], cart_ratio=options['cart_ratio'], wishlist_ratio=options['wishlist_ratio'],
+            max_lines=options['max_lines'], user_prefix=options['user_prefix'], password=options['password'],
+        )
+        self.finish(options)
+        self.stdout.write(self.style.SUCCESS(f'Generated dataset in {time.perf_counter() - start:.1f}s'))
+
+    def finish(self, options):
+        # Bulk inserts skip the Item signals, so refresh what they maintain
+        if not options['skip_index']:
+            call_command('rebuild_search_index', stdout=self.stdout)
+        bump_catalog_version()
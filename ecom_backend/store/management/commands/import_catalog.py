@@ -0,0 +1,41 @@
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalogfeed import FEED_FORMATS, FeedError, FeedImporter, feed_format_for, read_feed
+
+
+class Command(BaseCommand):
+    help = 'Upsert items by sku from a CSV or JSON Lines feed, in chunks, reporting rows that fail validation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file, or - for stdin')
+        parser.add_argument('--format', choices=FEED_FORMATS, default=None,
+                            help='Feed format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows upserted per statement')
+        parser.add_argument('--create-categories', action='store_true',
+                            help='Create categories the feed names instead of rejecting their rows')
+
+    def handle(self, *args, **options):
+        feed_format = options['format'] or feed_format_for(options['path'])
+        if feed_format is None:
+            raise CommandError('Pass --format; the file extension is neither .csv nor .jsonl')
+        importer = FeedImporter(chunk_size=options['chunk_size'], create_categories=options['create_categories'])
+        start = time.perf_counter()
+        if options['path'] == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            stream = open(options['path'], encoding='utf-8-sig', newline='')
+        try:
+            with stream:
+                report = importer.run(read_feed(stream, feed_format))
+        except FeedError as error:
+            raise CommandError(str(error))
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']} ({error['sku'] or 'no sku'}): {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']}, updated {report['updated']} item(s), "
+            f"{report['error_count']} row(s) rejected in {time.perf_counter() - start:.1f}s"
+        ))
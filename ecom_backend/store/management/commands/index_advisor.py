@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from store.indexadvisor import advise, capture_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the store API read paths (or a file of captured queries) through EXPLAIN and report '
+        'full table scans and unused indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to explain against')
+        parser.add_argument('--queries', help='Explain these captured queries instead of replaying the API: '
+                                              'a JSON lines file of {"sql": ..., "params": [...]}')
+        parser.add_argument('--save-queries', help='Write the captured queries to this JSON lines file')
+        parser.add_argument('--rounds', type=int, default=3, help='Times to replay each read scenario')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run ANALYZE first so the planner sees current table statistics')
+        parser.add_argument('--allow-scan', action='append', default=[], metavar='TABLE',
+                            help='Tables that may be scanned in full (small lookup tables)')
+        parser.add_argument('--strict', action='store_true',
+                            help='Exit non-zero if any query scans a table in full')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if connections[using].vendor not in ('sqlite', 'postgresql'):
+            raise CommandError('index_advisor supports SQLite and PostgreSQL')
+        if options['analyze']:
+            with connections[using].cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        if options['queries']:
+            with open(options['queries']) as handle:
+                queries = [(row['sql'], tuple(row.get('params', ()))) for row in map(json.loads, handle) if row]
+        else:
+            queries = capture_queries(using=using, rounds=options['rounds'])
+        if options['save_queries']:
+            with open(options['save_queries'], 'w') as handle:
+                for sql, params in queries:
+                    handle.write(json.dumps({'sql': sql, 'params': list(params)}, default=str) + '\n')
+
+        problems, used, unused = advise(queries, using=using, allowed_scans=options['allow_scan'])
+        self.stdout.write(f'Explained {len(queries)} distinct queries')
+
+        for plan in problems:
+            self.stdout.write(self.style.WARNING(f"\nFull scan of {', '.join(plan.scans)}:"))
+            self.stdout.write(f'  {plan.sql[:300]}')
+            for line in plan.lines:
+                self.stdout.write(f'    {line}')
+        if used:
+            self.stdout.write(f"\nIndexes used: {', '.join(sorted(used))}")
+        if unused:
+            self.stdout.write(self.style.WARNING('\nIndexes no query used:'))
+            for name, table in sorted(unused.items(), key=lambda item: (item[1], item[0])):
+                self.stdout.write(f'  {table}.{name}')
+
+        summary = f'{len(problems)} quer{"y" if len(problems) == 1 else "ies"} with full scans, {len(unused)} unused indexes'
+        if problems and options['strict']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary) if not problems else summary)
@@ -0,0 +1,39 @@
+import json
+import signal
+
+from django.core.management.base import BaseCommand
+
+from store.payments import PaymentWorker, queue_stats
+
+
+class Command(BaseCommand):
+    help = 'Charge queued payment jobs through the payment gateway, retrying transient failures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Payments charged at once (default: PAYMENT_WORKER_CONCURRENCY)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between checks for due jobs while idle')
+        parser.add_argument('--once', action='store_true', help='Exit once no jobs are due instead of waiting')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print queue depth and recent latency as JSON and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(queue_stats(), indent=2))
+            return
+        worker = PaymentWorker(concurrency=options['concurrency'], poll_interval=options['poll_interval'])
+        # Finish the charges in flight on shutdown; claimed jobs that never
+        # start are retried when their lease runs out
+        previous = {signum: signal.signal(signum, lambda *args: worker.stop())
+                    for signum in (signal.SIGINT, signal.SIGTERM)}
+        self.stdout.write(f'Processing payments with {worker.concurrency} thread(s) as {worker.name}')
+        try:
+            worker.run(once=options['once'])
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        outcomes = worker.outcomes
+        self.stdout.write(self.style.SUCCESS(
+            f"{outcomes['succeeded']} succeeded, {outcomes['failed']} failed, {outcomes['retried']} retried"
+        ))
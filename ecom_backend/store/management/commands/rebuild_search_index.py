@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text item search index from the store_item table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='Database alias holding the items')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        start = time.perf_counter()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {type(backend).__name__} index in {time.perf_counter() - start:.2f}s'
+        ))
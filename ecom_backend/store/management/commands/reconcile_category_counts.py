@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store.cache import bump_catalog_version
+from store.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Recompute Category.active_items_count wherever it has drifted from the items table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='Database alias holding the catalog')
+
+    def handle(self, *args, **options):
+        fixed = Category.objects.using(options['database']).reconcile_items_count()
+        if fixed:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {fixed} drifted category count(s)'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.reservations import reconcile_reserved, release_expired
+
+
+class Command(BaseCommand):
+    help = 'Release cart stock holds past their expiry so the stock becomes available again'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep sweeping every N seconds instead of once')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Holds released per transaction')
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Also rebuild the reserved stock totals from the holds')
+
+    def handle(self, *args, **options):
+        if options['reconcile']:
+            fixed = reconcile_reserved()
+            self.stdout.write(f'Reconciled reserved stock of {fixed} drifted item(s)')
+        while True:
+            released = release_expired(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Released {released} expired hold(s)'))
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
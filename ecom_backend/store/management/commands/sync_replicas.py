@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def sqlite_path(settings_dict):
+    name = str(settings_dict['NAME'])
+    if name.startswith('file:'):
+        return urlsplit(name).path
+    return name
+
+
+def copy_database(source, target):
+    """Snapshot ``source`` into ``target`` with SQLite's online backup.
+
+    The copy is written next to the target and moved over it, so readers
+    keep a consistent file while it is refreshed. The copy is switched out
+    of WAL mode so read-only replica connections never need a ``-wal`` file,
+    which would otherwise outlive the file it belonged to.
+    """
+    temporary = f'{target}.sync'
+    source_db, target_db = sqlite3.connect(source), sqlite3.connect(temporary)
+    try:
+        source_db.backup(target_db)
+        target_db.execute('PRAGMA journal_mode = delete')
+    finally:
+        source_db.close()
+        target_db.close()
+    os.replace(temporary, target)
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database to the replica files in DATABASE_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep syncing every N seconds instead of once')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replicas = getattr(settings, 'REPLICA_DATABASES', [])
+        if not replicas:
+            raise CommandError('No replicas configured; set DATABASE_REPLICAS')
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('sync_replicas copies SQLite files; use your database replication instead')
+
+        source = sqlite_path(primary)
+        while True:
+            start = time.perf_counter()
+            for alias in replicas:
+                copy_database(source, sqlite_path(connections[alias].settings_dict))
+            self.stdout.write(f'Synced {len(replicas)} replica(s) in {time.perf_counter() - start:.2f}s')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
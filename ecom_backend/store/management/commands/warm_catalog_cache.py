@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+
+from store.cache import stats
+from store.models import Item
+from store.views import CategoryListView, FeaturedItemsView, ItemDetailView, ItemListView
+
+
+class Command(BaseCommand):
+    help = 'Populate the catalog response cache with the most requested pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default=None,
+                            help='Host the cached pages are served under (default: first ALLOWED_HOSTS entry)')
+        parser.add_argument('--pages', type=int, default=5, help='Item list pages to warm')
+        parser.add_argument('--items', type=int, default=100, help='Item detail pages to warm')
+
+    def handle(self, *args, **options):
+        host = options['host'] or next(
+            (host for host in settings.ALLOWED_HOSTS if not host.startswith('.')), 'localhost')
+        factory = APIRequestFactory(HTTP_HOST=host)
+
+        requests = [
+            (CategoryListView.as_view(), '/api/categories/', {}, {}),
+            (FeaturedItemsView.as_view(), '/api/items/featured/', {}, {}),
+        ]
+        item_list = ItemListView.as_view()
+        for page in range(1, options['pages'] + 1):
+            requests.append((item_list, '/api/items/', {'page': page} if page > 1 else {}, {}))
+        item_detail = ItemDetailView.as_view()
+        item_ids = Item.objects.filter(is_active=True).order_by('-is_featured', '-created_at') \
+            .values_list('id', flat=True)[:options['items']]
+        for item_id in item_ids:
+            requests.append((item_detail, f'/api/items/{item_id}/', {}, {'pk': item_id}))
+
+        warmed = 0
+        for view, path, params, kwargs in requests:
+            response = view(factory.get(path, params), **kwargs)
+            if response.status_code == 200:
+                warmed += 1
+
+        counters = stats.as_dict()
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {warmed} of {len(requests)} pages "
+            f"(hits={counters['hits']} misses={counters['misses']})"
+        ))
@@ -0,0 +1,228 @@
+"""Request metrics: ``Server-Timing`` headers and latency histograms.
+
+``RequestMetricsMiddleware`` times each request and reads the query count
+and database time collected by ``QueryBudgetMiddleware``. Authentication
+and serialization time come from ``timed()`` blocks in the authentication
+class and the serializers. Every response gets a ``Server-Timing`` header,
+and the timings are folded into per-route histograms (labelled with the URL
+name) held in process memory. ``metrics_view`` serves them in the Prometheus
+text format; with several worker processes each reports its own.
+Collectors added with ``registry.add_collector()`` append lines read at
+scrape time, such as the payment queue gauges.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds in seconds; the last bucket is +Inf
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_timings = ContextVar('store_request_timings', default=None)
+
+
+def metrics_enabled():
+    return getattr(settings, 'REQUEST_METRICS', True)
+
+
+class RequestTimings:
+    """Seconds spent per phase during one request."""
+    __slots__ = ('phases', 'active')
+
+    def __init__(self):
+        self.phases = {}
+        self.active = set()
+
+
+@contextmanager
+def timed(phase):
+    """Add the block's duration to ``phase`` for the current request.
+
+    Nested blocks for the same phase (e.g. nested serializers) count once.
+    """
+    timings = _timings.get()
+    if timings is None or phase in timings.active:
+        yield
+        return
+    timings.active.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(phase)
+        timings.phases[phase] = timings.phases.get(phase, 0.0) + time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """Serializer mixin that records ``to_representation()`` as serialization time."""
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # {labels: [count per bucket..., +Inf count, sum]}
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.description}')
+        lines.append(f'# TYPE {self.name} histogram')
+        for labels, series in sorted(self.series.items()):
+            label_text = format_labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.collectors = []
+        self.reset()
+
+    def add_collector(self, collector):
+        """``collector()`` returns exposition lines; it runs on every scrape."""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.histograms = {
+                'total': Histogram('store_request_duration_seconds', 'Request duration.', DURATION_BUCKETS),
+                'db': Histogram('store_db_duration_seconds', 'Time spent in database queries per request.',
+                                DURATION_BUCKETS),
+                'queries': Histogram('store_db_queries', 'Database queries per request.', QUERY_BUCKETS),
+                'auth': Histogram('store_auth_duration_seconds', 'Authentication time per request.',
+                                  DURATION_BUCKETS),
+                'serialize': Histogram('store_serialize_duration_seconds', 'Serializer time per request.',
+                                       DURATION_BUCKETS),
+            }
+
+    def record(self, view, method, status, phases, queries):
+        labels = (('view', view), ('method', method))
+        request_labels = labels + (('status', str(status)),)
+        with self._lock:
+            self.requests[request_labels] = self.requests.get(request_labels, 0) + 1
+            if queries is not None:
+                self.histograms['queries'].observe(labels, queries)
+            for phase, seconds in phases.items():
+                self.histograms[phase].observe(labels, seconds)
+
+    def render(self):
+        lines = ['# HELP store_requests_total Requests served.', '# TYPE store_requests_total counter']
+        with self._lock:
+            for labels, count in sorted(self.requests.items()):
+                lines.append(f'store_requests_total{{{format_labels(labels)}}} {count}')
+            for histogram in self.histograms.values():
+                histogram.render(lines)
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def server_timing(phases, queries):
+    entries = []
+    for phase in ('db', 'auth', 'serialize', 'total'):
+        if phase not in phases:
+            continue
+        entry = f'{phase};dur={phases[phase] * 1000:.2f}'
+        if phase == 'db' and queries is not None:
+            entry += f';desc="{queries} queries"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+class RequestMetricsMiddleware:
+    """Time requests; must sit before ``QueryBudgetMiddleware`` to see its counts."""
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics_enabled():
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not metrics_enabled():
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def finish(self, request, response, timings, elapsed):
+        phases = dict(timings.phases, total=elapsed)
+        counter = getattr(request, 'query_counter', None)
+        queries = None
+        if counter is not None:
+            phases['db'] = counter.duration
+            queries = counter.count
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.url_name if resolver_match and resolver_match.url_name else 'unmatched'
+        registry.record(view, request.method, response.status_code, phases, queries)
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = server_timing(phases, queries)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the in-process metrics.
+
+    Open to staff users, or to ``Authorization: Bearer <METRICS_TOKEN>``
+    for scrapers.
+    """
+    expected = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.headers.get('Authorization', '')
+    token_ok = bool(expected) and hmac.compare_digest(header, f'Bearer {expected}')
+    if not token_ok and not request.user.is_staff:
+        return HttpResponseForbidden('Forbidden\n', content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
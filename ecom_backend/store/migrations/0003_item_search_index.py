@@ -0,0 +1,36 @@
+from django.db import migrations
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS store_item_fts USING fts5("
+    "name, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "INSERT INTO store_item_fts (rowid, name, description) "
+    "SELECT id, name, description FROM store_item",
+]
+SQLITE_DROP = ["DROP TABLE IF EXISTS store_item_fts"]
+
+POSTGRES_CREATE = [
+    "CREATE INDEX IF NOT EXISTS store_item_search_idx ON store_item "
+    "USING GIN (to_tsvector('english', name || ' ' || description))",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS store_item_search_idx"]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_order_userprofile_orderitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}),
+            run_for_vendor({'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_active_items_count(apps, schema_editor):
+    Category = apps.get_model('store', 'Category')
+    Item = apps.get_model('store', 'Item')
+    Category.objects.update(active_items_count=Coalesce(Subquery(
+        Item.objects.filter(category=OuterRef('pk'), is_active=True)
+        .order_by().values('category').annotate(count=Count('pk')).values('count')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_item_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_items_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_active_items_count, migrations.RunPython.noop),
+    ]
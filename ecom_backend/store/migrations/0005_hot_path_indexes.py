@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_category_active_items_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='item_active_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_featured', True)), fields=['-created_at', '-id'], name='item_featured_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-created_at', '-id'], name='item_active_category_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'price'], name='item_active_category_price'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='order_user_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_status', '-created_at'], name='order_status_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['payment_status', '-created_at'], name='order_payment_status_recent'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='store.cart')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='store.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='stockhold_expiry')],
+                'unique_together': {('cart', 'item')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ReservedStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reserved_shards', to='store.item')),
+            ],
+            options={
+                'unique_together': {('item', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:41
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('store', '0006_stock_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('order_status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('refunded', 'Refunded')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'month', 'order_status', 'payment_status')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_order_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_recent'),
+        ),
+    ]
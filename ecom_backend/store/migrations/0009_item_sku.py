@@ -0,0 +1,33 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def backfill_sku(apps, schema_editor):
+    # The format Item.save() generates (store.models.new_sku)
+    Item = apps.get_model('store', 'Item')
+    items = Item.objects.using(schema_editor.connection.alias)
+    pks = list(items.filter(sku__isnull=True).values_list('pk', flat=True))
+    items.bulk_update([Item(pk=pk, sku=f'SKU-{uuid.uuid4().hex[:10].upper()}') for pk in pks], ['sku'],
+                      batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_order_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='sku',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_sku, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='item',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, unique=True),
+        ),
+    ]
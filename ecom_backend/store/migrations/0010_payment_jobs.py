@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_item_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('gateway_reference', models.CharField(blank=True, max_length=100)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_jobs', to='store.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='payment_job_due'), models.Index(fields=['finished_at'], name='payment_job_finished')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='paymentjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('queued', 'processing'))), fields=('order',), name='payment_job_one_active'),
+        ),
+    ]
@@ -1,13 +1,50 @@
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+class CategoryQuerySet(models.QuerySet):
+    def with_items_count(self):
+        """Annotate ``items_count``, the number of active items.
+
+        Reads the materialized ``active_items_count`` column when
+        ``CATEGORY_ITEMS_COUNT`` is ``'materialized'``, otherwise counts with
+        one grouped aggregate.
+        """
+        if getattr(settings, 'CATEGORY_ITEMS_COUNT', 'aggregate') == 'materialized':
+            return self.annotate(items_count=F('active_items_count'))
+        return self.annotate(items_count=Count('items', filter=Q(items__is_active=True)))
+
+    def reconcile_items_count(self):
+        """Repair drifted ``active_items_count`` values; return how many were wrong."""
+        actual = Coalesce(Subquery(
+            Item.objects.filter(category=OuterRef('pk'), is_active=True)
+            .order_by().values('category').annotate(count=Count('pk')).values('count')
+        ), 0)
+        drifted = list(
+            self.annotate(actual=actual).exclude(active_items_count=F('actual')).values_list('pk', flat=True)
+        )
+        if drifted:
+            self.model.objects.using(self.db).filter(pk__in=drifted).update(active_items_count=actual)
+        return len(drifted)
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     image = models.URLField(blank=True)
+    # Maintained by signals; repair with the reconcile_category_counts command
+    active_items_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ['name']
@@ -15,7 +52,35 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+def new_sku():
+    """A generated ``Item.sku``, for items created without one (migration 0009 backfills the same)."""
+    return f"SKU-{uuid.uuid4().hex[:10].upper()}"
+
+
+class ItemQuerySet(models.QuerySet):
+    def with_available_stock(self, exclude_cart=None):
+        """Annotate ``reserved_quantity``, the stock held by unexpired holds.
+
+        Sums the item's ``ReservedStock`` shards, at most
+        ``STOCK_HOLD_SHARDS`` rows read off their unique index, less the
+        expired holds ``sweep_stock_holds`` hasn't released yet and any held
+        by ``exclude_cart``.
+        """
+        uncounted = Q(expires_at__lte=Now())
+        if exclude_cart is not None:
+            uncounted |= Q(cart_id=exclude_cart)
+        return self.annotate(reserved_quantity=Coalesce(Subquery(
+            ReservedStock.objects.filter(item=OuterRef('pk'))
+            .order_by().values('item').annotate(total=Sum('quantity')).values('total')
+        ), 0) - Coalesce(Subquery(
+            StockHold.objects.filter(uncounted, item=OuterRef('pk'))
+            .order_by().values('item').annotate(total=Sum('quantity')).values('total')
+        ), 0))
+
+
 class Item(models.Model):
+    # Natural key for catalog feeds (see catalogfeed.py)
+    sku = models.CharField(max_length=64, unique=True, blank=True)
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -27,31 +92,101 @@ class Item(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ItemQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        # Catalog reads filter active items and page newest first; id breaks
+        # created_at ties for keyset pagination. Check with index_advisor.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], condition=Q(is_active=True),
+                         name='item_active_recent'),
+            models.Index(fields=['-created_at', '-id'], condition=Q(is_active=True, is_featured=True),
+                         name='item_featured_recent'),
+            models.Index(fields=['category', '-created_at', '-id'], condition=Q(is_active=True),
+                         name='item_active_category_recent'),
+            models.Index(fields=['category', 'price'], condition=Q(is_active=True),
+                         name='item_active_category_price'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counted_state()
+        return instance
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        if not self.sku:
+            self.sku = new_sku()
+        super().save(*args, **kwargs)
+        if created:
+            # Nothing can be held on a new item yet
+            self.reserved_quantity = 0
+
+    def remember_counted_state(self):
+        # What the category counters last saw, so saves can apply the difference
+        self._counted_state = (self.__dict__.get('category_id'), self.__dict__.get('is_active'))
+
+    @property
+    def available_quantity(self):
+        """Stock not held by any cart."""
+        # Items fetched with with_available_stock() already carry the total
+        if not hasattr(self, 'reserved_quantity'):
+            self.reserved_quantity = type(self).objects.with_available_stock().filter(pk=self.pk) \
+                .values_list('reserved_quantity', flat=True).first() or 0
+        return max(self.stock_quantity - self.reserved_quantity, 0)
+
     @property
     def is_in_stock(self):
-        return self.stock_quantity > 0
+        return self.available_quantity > 0
+
+def cart_totals(prefix=''):
+    """Aggregate expressions for a cart's price and quantity totals."""
+    return {
+        'items_total_price': Coalesce(
+            Sum(F(f'{prefix}quantity') * F(f'{prefix}item__price')),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        'items_total_quantity': Coalesce(Sum(f'{prefix}quantity'), 0),
+    }
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.annotate(**cart_totals('items__'))
+
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Cart for {self.user.username}"
 
+    def load_totals(self):
+        # Carts fetched with with_totals() already carry both values
+        if not hasattr(self, 'items_total_price'):
+            totals = CartItem.objects.filter(cart=self).aggregate(**cart_totals())
+            self.items_total_price = totals['items_total_price']
+            self.items_total_quantity = totals['items_total_quantity']
+
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        self.load_totals()
+        return self.items_total_price
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        self.load_totals()
+        return self.items_total_quantity
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -70,6 +205,38 @@ class CartItem(models.Model):
     def total_price(self):
         return self.quantity * self.item.price
 
+class StockHold(models.Model):
+    """Stock held for a cart line until ``expires_at`` (see ``reservations``)."""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='holds')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='holds')
+    quantity = models.PositiveIntegerField()
+    # The ReservedStock row this hold is counted in
+    shard = models.PositiveSmallIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('cart', 'item')
+        indexes = [
+            # The sweeper's expired hold scan
+            models.Index(fields=['expires_at'], name='stockhold_expiry'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.item_id} held for cart {self.cart_id}"
+
+class ReservedStock(models.Model):
+    """One shard of an item's running total of held stock."""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='reserved_shards')
+    shard = models.PositiveSmallIntegerField()
+    # Changed by signed deltas; sweep_stock_holds --reconcile repairs drift
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('item', 'shard')
+
+    def __str__(self):
+        return f"{self.quantity} of {self.item_id} reserved (shard {self.shard})"
+
 class Wishlist(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     items = models.ManyToManyField(Item, blank=True)
@@ -123,16 +290,52 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_recent'),
+            # Admin changelist, newest first, and its date filter
+            models.Index(fields=['-created_at', '-id'], name='order_recent'),
+            # Admin status filters
+            models.Index(fields=['order_status', '-created_at'], name='order_status_recent'),
+            models.Index(fields=['payment_status', '-created_at'], name='order_payment_status_recent'),
+        ]
 
     def __str__(self):
         return f"Order #{self.order_number} by {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rollup_state()
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.order_number:
             import uuid
             self.order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
         super().save(*args, **kwargs)
 
+    def remember_rollup_state(self):
+        # What the rollups last counted, so saves can apply the difference
+        from .rollups import rollup_state
+        self._rollup_state = rollup_state(self)
+
+class OrderRollup(models.Model):
+    """Orders and their total per user, month and status (see ``rollups``)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='order_rollups')
+    month = models.DateField()  # First day of the month
+    order_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    payment_status = models.CharField(max_length=20, choices=Order.PAYMENT_STATUS_CHOICES)
+    # Changed by signed deltas; backfill_order_rollups repairs drift
+    order_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+
+    class Meta:
+        unique_together = ('user', 'month', 'order_status', 'payment_status')
+
+    def __str__(self):
+        return f"{self.order_count} {self.order_status}/{self.payment_status} orders by {self.user_id} in {self.month:%Y-%m}"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
@@ -146,3 +349,42 @@ class OrderItem(models.Model):
     @property
     def total_price(self):
         return self.quantity * self.price
+
+class PaymentJob(models.Model):
+    """One queued attempt to charge an order (see ``payments``)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'processing')
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='payment_jobs')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    # When a worker may pick the job up: the retry time while queued, the
+    # end of the claiming worker's lease while processing
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    gateway_reference = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claiming due jobs, and the queue depth gauges
+            models.Index(fields=['status', 'run_after'], name='payment_job_due'),
+            # Latency of recently finished jobs
+            models.Index(fields=['finished_at'], name='payment_job_finished'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['order'], condition=Q(status__in=('queued', 'processing')),
+                                    name='payment_job_one_active'),
+        ]
+
+    def __str__(self):
+        return f"Payment job {self.pk} for order {self.order_id} ({self.status})"
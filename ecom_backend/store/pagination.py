@@ -0,0 +1,221 @@
+"""Pagination for the catalog and order listings.
+
+``StorePagination`` behaves like DRF's ``PageNumberPagination`` unless the
+client opts into keyset pagination with ``?cursor=`` (or
+``?pagination=cursor`` for the first page). Keyset pages seek past the last
+row of the previous page using the queryset ordering plus ``id`` as a tie
+breaker, so deep pages cost the same as the first one and no ``COUNT(*)``
+runs unless ``?count=exact`` or ``?count=approx`` is requested.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_value(value):
+    # Full isoformat: DjangoJSONEncoder truncates datetimes to milliseconds
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def table_row_estimate(model, using=None):
+    """Planner statistics for the model's table, or None if unavailable."""
+    using = using or router.db_for_read(model)
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except Exception:
+        # sqlite_stat1 only exists once ANALYZE has run
+        return None
+    return None
+
+
+def estimate_count(queryset, threshold=None):
+    """Return ``(count, is_estimate)`` without counting past ``threshold`` rows.
+
+    Small results are counted exactly. Larger ones are reported as the
+    table's planner estimate when the queryset is unfiltered, otherwise as
+    the threshold itself, i.e. a lower bound.
+    """
+    if threshold is None:
+        threshold = getattr(settings, 'PAGINATION_COUNT_THRESHOLD', 10000)
+    counted = queryset.order_by()[:threshold].count()
+    if counted < threshold:
+        return counted, False
+    estimate = None
+    if not queryset.query.where:
+        estimate = table_row_estimate(queryset.model, queryset.db)
+    return max(threshold, estimate or 0), True
+
+
+class EstimatedCountPaginator(Paginator):
+    """``Paginator`` that counts with ``estimate_count()``, for admin changelists of big tables.
+
+    Pages past the estimate can't be reached; filter or search to narrow
+    the list instead.
+    """
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)[0]
+
+
+class StorePagination(PageNumberPagination):
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_keyset_ordering(queryset)
+        self.fields = [self.resolve_field(queryset, name.lstrip('-')) for name in self.ordering]
+
+        position, reverse = self.decode_cursor(request)
+        self.total = self.count_results(queryset, request)
+
+        ordering = [self.flip(name) for name in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+
+        self.first_position = self.row_position(rows[0]) if rows else None
+        self.last_position = self.row_position(rows[-1]) if rows else None
+        if not rows and position is not None:
+            # Paged off either end; link back the way we came
+            self.first_position = self.last_position = position
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            payload['count'], payload['count_is_estimate'] = self.total
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.cursor_link(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self.cursor_link(self.first_position, reverse=True)
+
+    def get_keyset_ordering(self, queryset):
+        ordering = list(queryset.query.order_by)
+        if not ordering and queryset.query.default_ordering:
+            ordering = list(queryset.model._meta.ordering)
+        names = [name.lstrip('-') for name in ordering]
+        if 'id' not in names and 'pk' not in names:
+            ordering.append('id')
+        return ordering
+
+    def resolve_field(self, queryset, name):
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        try:
+            return queryset.model._meta.get_field('id' if name == 'pk' else name)
+        except FieldDoesNotExist:
+            raise NotFound(f'Cannot paginate by cursor on "{name}"')
+
+    def count_results(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count(), False
+        if mode == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    @staticmethod
+    def flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def seek_filter(self, ordering, position):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), per-field direction
+        condition = Q()
+        for index, name in enumerate(ordering):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            term = Q(**{f'{field}__{lookup}': position[index]})
+            for previous in range(index):
+                term &= Q(**{ordering[previous].lstrip('-'): position[previous]})
+            condition |= term
+        return condition
+
+    def row_position(self, row):
+        # Rows are model instances, or dicts from values() querysets
+        if isinstance(row, dict):
+            return [row[name.lstrip('-')] for name in self.ordering]
+        return [getattr(row, name.lstrip('-')) for name in self.ordering]
+
+    def cursor_link(self, position, reverse):
+        token = {'o': self.ordering, 'p': position, 'r': reverse}
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(token, default=encode_value).encode()
+        ).decode().rstrip('=')
+        url = remove_query_param(self.base_url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            token = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            if token['o'] != self.ordering or len(token['p']) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, token['p'])]
+            return position, bool(token['r'])
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
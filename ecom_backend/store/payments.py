@@ -0,0 +1,235 @@
+"""Database-backed payment queue.
+
+The payment endpoint calls ``enqueue_payment()`` and answers 202 straight
+away; an order has at most one queued or processing ``PaymentJob``.
+``PaymentWorker`` (``manage.py process_payments``) claims due jobs with one
+``UPDATE`` and charges them through the gateway on ``concurrency`` threads,
+outside any transaction. A claim leases the job by moving ``run_after`` to
+the end of ``PAYMENT_JOB_LEASE``, so the job of a worker that died is claimed
+again when the lease runs out. Gateway errors are retried with exponential
+backoff up to ``PAYMENT_MAX_ATTEMPTS``; declines and exhausted retries fail
+the order's payment. ``queue_stats()`` reads depth and latency from the
+table, so it covers every worker process.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .gateway import GatewayError, PaymentDeclined, get_gateway
+from .models import Order, PaymentJob
+
+logger = logging.getLogger(__name__)
+
+QUEUED, PROCESSING, SUCCEEDED, FAILED = 'queued', 'processing', 'succeeded', 'failed'
+# What clients polling a payment see of its job
+PAYMENT_JOB_FIELDS = ('id', 'status', 'attempts', 'last_error')
+# Finished jobs read per latency sample
+LATENCY_SAMPLE_SIZE = 10000
+
+
+def payment_setting(name, default):
+    return getattr(settings, f'PAYMENT_{name}', default)
+
+
+def enqueue_payment(order):
+    """``(job, created)``: a new queued job for ``order``, or the one already queued or processing."""
+    try:
+        with transaction.atomic():
+            return PaymentJob.objects.create(order=order, amount=order.total_amount), True
+    except IntegrityError:
+        # payment_job_one_active: the order already has one
+        return PaymentJob.objects.get(order=order, status__in=PaymentJob.ACTIVE_STATUSES), False
+
+
+def retry_delay(attempts):
+    """Seconds to wait after failed attempt number ``attempts``, doubling each time, with jitter."""
+    delay = payment_setting('RETRY_DELAY', 2) * 2 ** (attempts - 1)
+    return min(delay, payment_setting('RETRY_MAX_DELAY', 300)) * random.uniform(0.5, 1.0)
+
+
+def claim_jobs(worker, limit):
+    """Lease up to ``limit`` due jobs to ``worker``; return them with their orders."""
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    due = PaymentJob.objects.filter(status__in=PaymentJob.ACTIVE_STATUSES, run_after__lte=now)
+    with transaction.atomic():
+        ids = list(due.order_by('run_after').values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        # Re-checks the due condition, so a job another worker claimed in
+        # between isn't taken twice
+        due.filter(pk__in=ids).update(
+            status=PROCESSING, locked_by=token, attempts=F('attempts') + 1, started_at=now,
+            run_after=now + timedelta(seconds=payment_setting('JOB_LEASE', 120)),
+        )
+    return list(PaymentJob.objects.filter(locked_by=token, status=PROCESSING).select_related('order'))
+
+
+def finish_job(job, status, payment_status=None, **fields):
+    """Record the outcome if ``job`` is still leased to us, and the order's new payment status."""
+    with transaction.atomic():
+        updated = PaymentJob.objects.filter(pk=job.pk, status=PROCESSING, locked_by=job.locked_by).update(
+            status=status, **fields)
+        if not updated:
+            # The lease ran out and another worker has the job now
+            return False
+        if payment_status is not None:
+            order = Order.objects.select_for_update().get(pk=job.order_id)
+            if order.payment_status != 'completed':
+                order.payment_status = payment_status
+                if payment_status == 'completed':
+                    order.order_status = 'processing'
+                # save() keeps the order rollups current
+                order.save()
+    return True
+
+
+class PaymentWorker:
+    def __init__(self, concurrency=None, poll_interval=1.0, gateway=None, name=None):
+        self.concurrency = concurrency or payment_setting('WORKER_CONCURRENCY', 4)
+        self.poll_interval = poll_interval
+        self.gateway = gateway or get_gateway()
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.outcomes = {SUCCEEDED: 0, FAILED: 0, 'retried': 0}
+        self._outcomes_lock = threading.Lock()
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self, once=False):
+        """Process jobs until ``stop()``, or with ``once`` until none are due."""
+        if self.concurrency == 1:
+            while not self.stopping.is_set():
+                jobs = claim_jobs(self.name, 1)
+                for job in jobs:
+                    self.work(job)
+                if not jobs:
+                    if once:
+                        return
+                    self.stopping.wait(self.poll_interval)
+            return
+
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='payment') as pool:
+            running = set()
+            while not self.stopping.is_set():
+                free = self.concurrency - len(running)
+                running |= {pool.submit(self.work, job) for job in (claim_jobs(self.name, free) if free else [])}
+                if not running:
+                    if once:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                # Wake when a thread frees up, or poll for due jobs anyway
+                done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+            wait(running)
+
+    def work(self, job):
+        # Each thread keeps its own connection, checked like a request's
+        close_old_connections()
+        try:
+            self.process(job)
+        except Exception:
+            # The lease runs out and another attempt picks the job up
+            logger.exception('Payment job %s crashed', job.pk)
+        finally:
+            close_old_connections()
+
+    def process(self, job):
+        max_attempts = payment_setting('MAX_ATTEMPTS', 5)
+        if job.attempts > max_attempts:
+            # Claimed again after leases ran out mid-charge
+            self.fail(job, f'Gave up after {max_attempts} attempts')
+            return
+        try:
+            reference = self.gateway.charge(job.amount, job.order.order_number, f'payment-job-{job.pk}')
+        except PaymentDeclined as error:
+            self.fail(job, str(error))
+        except GatewayError as error:
+            if job.attempts >= max_attempts:
+                self.fail(job, f'{error} (attempt {job.attempts} of {max_attempts})')
+            else:
+                delay = retry_delay(job.attempts)
+                if finish_job(job, QUEUED, last_error=str(error), locked_by='',
+                              run_after=timezone.now() + timedelta(seconds=delay)):
+                    self.record('retried', job, f'{error}; retrying in {delay:.1f}s')
+        else:
+            if finish_job(job, SUCCEEDED, 'completed', gateway_reference=reference, last_error='',
+                          finished_at=timezone.now()):
+                self.record(SUCCEEDED, job, reference)
+
+    def fail(self, job, error):
+        if finish_job(job, FAILED, 'failed', last_error=error, finished_at=timezone.now()):
+            self.record(FAILED, job, error)
+
+    def record(self, outcome, job, detail):
+        with self._outcomes_lock:
+            self.outcomes[outcome] += 1
+        elapsed = (timezone.now() - job.created_at).total_seconds()
+        logger.info('Payment job %s for order %s %s after %.2fs (attempt %s): %s', job.pk, job.order_id, outcome,
+                    elapsed, job.attempts, detail)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def queue_stats(window=None):
+    """Queue depth now, and outcomes and latency of the jobs finished in the last ``window`` seconds."""
+    window = window or payment_setting('METRICS_WINDOW', 300)
+    now = timezone.now()
+    depth = dict.fromkeys(PaymentJob.ACTIVE_STATUSES, 0)
+    depth.update(PaymentJob.objects.filter(status__in=PaymentJob.ACTIVE_STATUSES).order_by()
+                 .values('status').annotate(count=Count('pk')).values_list('status', 'count'))
+    due = PaymentJob.objects.filter(status=QUEUED, run_after__lte=now).aggregate(
+        count=Count('pk'), oldest=Min('run_after'))
+    finished = dict.fromkeys((SUCCEEDED, FAILED), 0)
+    latencies = []
+    recent = PaymentJob.objects.filter(finished_at__gte=now - timedelta(seconds=window)).order_by('-finished_at')
+    for status, created_at, finished_at in recent.values_list('status', 'created_at', 'finished_at')[
+            :LATENCY_SAMPLE_SIZE]:
+        finished[status] += 1
+        latencies.append((finished_at - created_at).total_seconds())
+    latencies.sort()
+    return {
+        'depth': depth,
+        'due': due['count'],
+        # How long the oldest due job has waited for a worker
+        'lag_seconds': (now - due['oldest']).total_seconds() if due['oldest'] else 0.0,
+        'window_seconds': window,
+        'finished': finished,
+        'latency_seconds': {'p50': percentile(latencies, 0.5), 'p95': percentile(latencies, 0.95),
+                            'max': latencies[-1] if latencies else 0.0},
+    }
+
+
+def queue_metric_lines():
+    """``queue_stats()`` in the Prometheus text format, for ``/api/_metrics``."""
+    stats = queue_stats()
+    lines = ['# HELP store_payment_jobs Payment jobs waiting or running.', '# TYPE store_payment_jobs gauge']
+    lines += [f'store_payment_jobs{{status="{status}"}} {count}' for status, count in stats['depth'].items()]
+    lines += ['# HELP store_payment_jobs_due Queued payment jobs ready for a worker.',
+              '# TYPE store_payment_jobs_due gauge', f'store_payment_jobs_due {stats["due"]}',
+              '# HELP store_payment_queue_lag_seconds Wait of the oldest due payment job.',
+              '# TYPE store_payment_queue_lag_seconds gauge',
+              f'store_payment_queue_lag_seconds {stats["lag_seconds"]:.3f}',
+              f'# HELP store_payment_jobs_finished Payment jobs finished in the last {stats["window_seconds"]}s.',
+              '# TYPE store_payment_jobs_finished gauge']
+    lines += [f'store_payment_jobs_finished{{status="{status}"}} {count}'
+              for status, count in stats['finished'].items()]
+    lines += [f'# HELP store_payment_latency_seconds Enqueue to finish, jobs finished in the last '
+              f'{stats["window_seconds"]}s.', '# TYPE store_payment_latency_seconds gauge']
+    quantiles = {'p50': '0.5', 'p95': '0.95', 'max': '1'}
+    lines += [f'store_payment_latency_seconds{{quantile="{quantiles[name]}"}} {seconds:.3f}'
+              for name, seconds in stats['latency_seconds'].items()]
+    return lines
@@ -0,0 +1,127 @@
+"""Per-view query budgets.
+
+Views declare the number of queries they may run with ``@query_budget(n)``
+(or a ``query_budget`` class attribute), or a dict of budgets by HTTP method
+for views whose methods differ. ``QueryBudgetMiddleware`` counts the
+queries of every request and logs a warning when a view goes over budget, or
+raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_STRICT`` is enabled.
+"""
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """``execute_wrapper`` callable that counts and times queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+@contextmanager
+def count_queries():
+    """Count queries run on any database alias inside the block."""
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        yield counter
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of queries a view may run per request.
+
+    ``max_queries`` is a number, or a dict keyed by HTTP method; methods
+    missing from the dict are unbudgeted.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_view_budget(view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        # Class-based views expose their class on the as_view() function
+        view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with count_queries() as counter:
+            request.query_counter = counter
+            response = self.get_response(request)
+        return self.check_budget(request, response, counter)
+
+    async def __acall__(self, request):
+        # Async views run their queries on the request's thread-sensitive
+        # executor thread, so the wrappers are installed there
+        stack = ExitStack()
+        counter = await sync_to_async(stack.enter_context)(count_queries())
+        request.query_counter = counter
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.check_budget(request, response, counter)
+
+    def check_budget(self, request, response, counter):
+        if getattr(settings, 'QUERY_COUNT_HEADER', False):
+            response['X-Query-Count'] = str(counter.count)
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        budget = get_view_budget(resolver_match.func) if resolver_match else None
+        if isinstance(budget, dict):
+            budget = budget.get(request.method)
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{request.method} {request.path} ran {counter.count} queries "
+                f"(budget {budget})"
+            )
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin for asserting an upper bound on queries."""
+
+    @contextmanager
+    def assertMaxQueries(self, max_queries):
+        with count_queries() as counter:
+            yield counter
+        if counter.count > max_queries:
+            self.fail(f"{counter.count} queries executed, budget was {max_queries}")
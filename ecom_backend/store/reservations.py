@@ -0,0 +1,201 @@
+"""Time-limited stock holds for cart lines.
+
+Putting an item in a cart holds that quantity for ``STOCK_HOLD_SECONDS``
+(one ``StockHold`` per cart line), and every change to a cart renews the
+holds on all of its lines. An item's available stock is its
+``stock_quantity`` minus the held quantity. The total held per item is
+kept in ``ReservedStock``, split into ``STOCK_HOLD_SHARDS`` rows picked by
+cart, so carts holding the same hot item update different rows; readers sum
+the shards (``ItemQuerySet.with_available_stock()``). Checkout turns a
+cart's holds into a stock decrement. Expired holds stay in the shards until
+``sweep_stock_holds`` releases them, but readers subtract them, so they stop
+counting against stock as soon as they expire.
+
+None of this bumps the catalog version: cached item responses get their
+``AVAILABILITY_FIELDS`` rewritten by ``refresh_availability()`` instead.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Item, ReservedStock, StockHold
+
+# Serialized item fields that follow holds and checkouts
+AVAILABILITY_FIELDS = ('stock_quantity', 'available_quantity', 'is_in_stock')
+
+
+def hold_seconds():
+    return getattr(settings, 'STOCK_HOLD_SECONDS', 15 * 60)
+
+
+def shard_for(cart_id):
+    return cart_id % max(getattr(settings, 'STOCK_HOLD_SHARDS', 8), 1)
+
+
+def reserved_quantities(item_ids, exclude_cart=None):
+    """``{item_id: quantity held by unexpired holds}``, less ``exclude_cart``'s own holds."""
+    return dict(
+        Item.objects.filter(pk__in=item_ids).with_available_stock(exclude_cart)
+        .order_by().values_list('pk', 'reserved_quantity')
+    )
+
+
+def available_quantities(cart_id, items):
+    """``{item_id: stock this cart may put in its lines}`` for ``{item_id: Item}``.
+
+    The cart's own holds don't count against it.
+    """
+    reserved = reserved_quantities(list(items), exclude_cart=cart_id)
+    return {item_id: max(item.stock_quantity - reserved.get(item_id, 0), 0) for item_id, item in items.items()}
+
+
+def refresh_availability(rows):
+    """Rewrite ``AVAILABILITY_FIELDS`` in serialized item ``rows`` with current stock, in one query."""
+    if not rows:
+        return
+    stock = {
+        pk: (quantity, reserved) for pk, quantity, reserved in
+        Item.objects.with_available_stock().filter(pk__in=[row['id'] for row in rows])
+        .values_list('pk', 'stock_quantity', 'reserved_quantity')
+    }
+    for row in rows:
+        if row['id'] not in stock:
+            continue
+        quantity, reserved = stock[row['id']]
+        current = {'stock_quantity': quantity, 'available_quantity': max(quantity - reserved, 0),
+                   'is_in_stock': quantity > reserved}
+        row.update((field, current[field]) for field in AVAILABILITY_FIELDS if field in row)
+
+
+def apply_deltas(deltas):
+    """Add ``{(item_id, shard): delta}`` to the ``ReservedStock`` shards in one statement."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    using = router.db_for_write(ReservedStock)
+    connection = connections[using]
+
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        for (item_id, shard), delta in deltas.items():
+            updated = ReservedStock.objects.filter(item_id=item_id, shard=shard).update(
+                quantity=F('quantity') + delta)
+            if not updated:
+                ReservedStock.objects.create(item_id=item_id, shard=shard, quantity=delta)
+        return
+
+    table = connection.ops.quote_name(ReservedStock._meta.db_table)
+    rows = ', '.join(['(%s, %s, %s)'] * len(deltas))
+    params = []
+    for (item_id, shard), delta in deltas.items():
+        params.extend([item_id, shard, delta])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (item_id, shard, quantity) VALUES {rows} '
+            f'ON CONFLICT (item_id, shard) DO UPDATE SET quantity = {table}.quantity + excluded.quantity',
+            params,
+        )
+
+
+def hold(cart_id, quantities):
+    """Set the cart's holds to ``{item_id: quantity}`` and renew all of them.
+
+    A quantity of 0 releases the item. Callers check availability first
+    (``available_quantities()``).
+    """
+    with transaction.atomic(using=router.db_for_write(StockHold), savepoint=False):
+        existing = {line.item_id: line for line in StockHold.objects.select_for_update().filter(cart_id=cart_id)}
+        expires_at = timezone.now() + timedelta(seconds=hold_seconds())
+        shard = shard_for(cart_id)
+        deltas, holds, released = {}, [], []
+        for item_id, line in existing.items():
+            if item_id not in quantities:
+                # Renewed in the same upsert
+                holds.append(StockHold(cart_id=cart_id, item_id=item_id, quantity=line.quantity,
+                                       shard=line.shard, expires_at=expires_at))
+        for item_id, quantity in quantities.items():
+            current = existing.get(item_id)
+            if current is not None:
+                key = (item_id, current.shard)
+                deltas[key] = deltas.get(key, 0) - current.quantity
+            if quantity > 0:
+                deltas[(item_id, shard)] = deltas.get((item_id, shard), 0) + quantity
+                holds.append(StockHold(cart_id=cart_id, item_id=item_id, quantity=quantity,
+                                       shard=shard, expires_at=expires_at))
+            elif current is not None:
+                released.append(current.pk)
+
+        if released:
+            StockHold.objects.filter(pk__in=released).delete()
+        if holds:
+            StockHold.objects.bulk_create(holds, update_conflicts=True, unique_fields=['cart', 'item'],
+                                          update_fields=['quantity', 'shard', 'expires_at'])
+        apply_deltas(deltas)
+
+
+def release(cart_id, item_ids=None):
+    """Drop the cart's holds (all of them, or on ``item_ids``); return how many."""
+    holds = StockHold.objects.filter(cart_id=cart_id)
+    if item_ids is not None:
+        holds = holds.filter(item_id__in=item_ids)
+    with transaction.atomic(using=router.db_for_write(StockHold), savepoint=False):
+        return release_holds(lock_holds(holds))
+
+
+def lock_holds(holds):
+    """Lock the holds in ``holds``; return ``[(pk, item_id, shard, quantity)]``."""
+    return list(holds.select_for_update().values_list('pk', 'item_id', 'shard', 'quantity'))
+
+
+def release_holds(rows):
+    """Delete locked holds (from ``lock_holds()``) and take them off the shards."""
+    if not rows:
+        return 0
+    deltas = {}
+    for pk, item_id, shard, quantity in rows:
+        deltas[(item_id, shard)] = deltas.get((item_id, shard), 0) - quantity
+    StockHold.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    apply_deltas(deltas)
+    return len(rows)
+
+
+def release_expired(now=None, batch_size=500):
+    """Release holds past their expiry, ``batch_size`` per transaction; return how many."""
+    now = now or timezone.now()
+    using = router.db_for_write(StockHold)
+    # Concurrent sweepers take different batches instead of queueing
+    skip_locked = connections[using].features.has_select_for_update_skip_locked
+    released = 0
+    while True:
+        with transaction.atomic(using=using):
+            count = release_holds(list(
+                StockHold.objects.select_for_update(skip_locked=skip_locked).filter(expires_at__lte=now)
+                .order_by('expires_at').values_list('pk', 'item_id', 'shard', 'quantity')[:batch_size]
+            ))
+        released += count
+        if count < batch_size:
+            return released
+
+
+def reconcile_reserved():
+    """Rebuild ``ReservedStock`` from the holds; return how many items had drifted."""
+    with transaction.atomic(using=router.db_for_write(ReservedStock)):
+        expected = {
+            (item_id, shard): total for item_id, shard, total in
+            StockHold.objects.order_by().values('item_id', 'shard').annotate(total=Sum('quantity'))
+            .values_list('item_id', 'shard', 'total')
+        }
+        actual = {
+            (item_id, shard): quantity for item_id, shard, quantity in
+            ReservedStock.objects.exclude(quantity=0).values_list('item_id', 'shard', 'quantity')
+        }
+        drifted = {key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key)}
+        if drifted:
+            ReservedStock.objects.all().delete()
+            ReservedStock.objects.bulk_create([
+                ReservedStock(item_id=item_id, shard=shard, quantity=total)
+                for (item_id, shard), total in expected.items()
+            ])
+        return len({item_id for item_id, shard in drifted})
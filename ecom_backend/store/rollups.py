@@ -0,0 +1,143 @@
+"""Per-user order rollups for the order summary.
+
+``OrderRollup`` keeps one row per user, month, order status and payment
+status with the number of orders and their total. Saving or deleting an
+order applies the difference to its rows as signed deltas (see
+``signals.py``), so ``summarize_orders()`` reads a few dozen rows however long
+the order history is. Writes that skip signals (``QuerySet.update()``,
+``bulk_create()``) leave the rollups stale until ``backfill_order_rollups``
+rebuilds them.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Order, OrderRollup
+
+PAID = 'completed'
+CENTS = Decimal('0.01')
+
+
+def order_month(created_at):
+    if settings.USE_TZ and timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return created_at.date().replace(day=1)
+
+
+def rollup_state(order):
+    """``((user_id, month, order_status, payment_status), total_amount)``, or ``None`` if not loaded."""
+    fields = ('user_id', 'created_at', 'order_status', 'payment_status', 'total_amount')
+    values = [order.__dict__.get(field) for field in fields]
+    if any(value is None for value in values):
+        return None
+    user_id, created_at, order_status, payment_status, total_amount = values
+    return (user_id, order_month(created_at), order_status, payment_status), Decimal(total_amount)
+
+
+def record_order_change(old, new):
+    """Move an order's count and amount from rollup state ``old`` to ``new`` (either may be ``None``)."""
+    deltas = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if state is not None:
+            key, amount = state
+            count, total = deltas.get(key, (0, Decimal('0')))
+            deltas[key] = (count + sign, total + sign * amount)
+    apply_rollup_deltas(deltas)
+
+
+def apply_rollup_deltas(deltas):
+    """Add ``{(user_id, month, order_status, payment_status): (count, amount)}`` in one statement."""
+    deltas = {key: delta for key, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+    using = router.db_for_write(OrderRollup)
+    connection = connections[using]
+
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        for (user_id, month, order_status, payment_status), (count, amount) in deltas.items():
+            rollups = OrderRollup.objects.filter(user_id=user_id, month=month, order_status=order_status,
+                                                 payment_status=payment_status)
+            if not rollups.update(order_count=F('order_count') + count, total_amount=F('total_amount') + amount):
+                OrderRollup.objects.create(user_id=user_id, month=month, order_status=order_status,
+                                           payment_status=payment_status, order_count=count, total_amount=amount)
+        return
+
+    ops = connection.ops
+    table = ops.quote_name(OrderRollup._meta.db_table)
+    rows = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(deltas))
+    params = []
+    for (user_id, month, order_status, payment_status), (count, amount) in deltas.items():
+        params.extend([user_id, ops.adapt_datefield_value(month), order_status, payment_status, count,
+                       ops.adapt_decimalfield_value(amount, 14, 2)])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, month, order_status, payment_status, order_count, total_amount) '
+            f'VALUES {rows} ON CONFLICT (user_id, month, order_status, payment_status) DO UPDATE SET '
+            f'order_count = {table}.order_count + excluded.order_count, '
+            f'total_amount = {table}.total_amount + excluded.total_amount',
+            params,
+        )
+
+
+def summarize_orders(user_id):
+    """Lifetime and monthly order totals for ``user_id`` from its rollups."""
+    by_status = dict.fromkeys(dict(Order.ORDER_STATUS_CHOICES), 0)
+    by_payment_status = dict.fromkeys(dict(Order.PAYMENT_STATUS_CHOICES), 0)
+    months = {}
+    order_count, spend = 0, Decimal('0')
+    rollups = OrderRollup.objects.filter(user_id=user_id, order_count__gt=0).values_list(
+        'month', 'order_status', 'payment_status', 'order_count', 'total_amount')
+    for month, order_status, payment_status, count, amount in rollups:
+        paid = amount if payment_status == PAID else Decimal('0')
+        order_count += count
+        spend += paid
+        by_status[order_status] = by_status.get(order_status, 0) + count
+        by_payment_status[payment_status] = by_payment_status.get(payment_status, 0) + count
+        totals = months.setdefault(month, [0, Decimal('0'), Decimal('0')])
+        totals[0] += count
+        totals[1] += amount
+        totals[2] += paid
+    return {
+        'order_count': order_count,
+        'lifetime_spend': str(spend.quantize(CENTS)),
+        'orders_by_status': by_status,
+        'orders_by_payment_status': by_payment_status,
+        'monthly': [
+            {'month': f'{month:%Y-%m}', 'order_count': count, 'total_amount': str(total.quantize(CENTS)),
+             'spend': str(paid.quantize(CENTS))}
+            for month, (count, total, paid) in sorted(months.items(), reverse=True)
+        ],
+    }
+
+
+def rebuild_rollups(batch_size=1000):
+    """Recompute every rollup from the orders table; return how many rows were wrong."""
+    total_field = OrderRollup._meta.get_field('total_amount')
+    with transaction.atomic(using=router.db_for_write(OrderRollup)):
+        expected = {
+            (user_id, month, order_status, payment_status): (count, total)
+            for user_id, month, order_status, payment_status, count, total in
+            Order.objects.order_by().annotate(month=TruncMonth('created_at', output_field=DateField()))
+            .values('user_id', 'month', 'order_status', 'payment_status')
+            .annotate(count=Count('pk'), total=Sum('total_amount', output_field=total_field))
+            .values_list('user_id', 'month', 'order_status', 'payment_status', 'count', 'total')
+        }
+        actual = {
+            (user_id, month, order_status, payment_status): (count, total)
+            for user_id, month, order_status, payment_status, count, total in
+            OrderRollup.objects.exclude(order_count=0, total_amount=0).values_list(
+                'user_id', 'month', 'order_status', 'payment_status', 'order_count', 'total_amount')
+        }
+        drifted = {key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key)}
+        if drifted:
+            OrderRollup.objects.all().delete()
+            OrderRollup.objects.bulk_create([
+                OrderRollup(user_id=user_id, month=month, order_status=order_status, payment_status=payment_status,
+                            order_count=count, total_amount=total)
+                for (user_id, month, order_status, payment_status), (count, total) in expected.items()
+            ], batch_size=batch_size)
+        return len(drifted)
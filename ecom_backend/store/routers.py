@@ -0,0 +1,179 @@
+"""Read replica routing with read-your-writes stickiness.
+
+``ReplicaRouter`` sends reads of the catalog and order history
+(``REPLICA_MODELS``) to one of ``REPLICA_DATABASES`` when they happen inside
+a safe-method request, and everything else to ``default``: writes, unsafe
+requests, reads inside a transaction (checkout) and anything outside a
+request (management commands, shells). ``ReplicaMiddleware`` tracks the
+current request; after an authenticated user writes, their reads stay on
+the primary for ``REPLICA_STICKY_SECONDS`` so their cart and orders never
+look stale. The pin is kept in the cache, so it only covers every worker
+when the cache is shared; ``check_replica_cache`` warns when it isn't.
+
+A catalog write also opens a sticky window (``note_catalog_write()``) in
+which requests that fill the response cache read the primary, so a lagging
+replica's copy isn't cached under the new catalog version.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+from .cache import get_cache
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+DEFAULT_REPLICA_MODELS = ('store.category', 'store.item', 'store.order', 'store.orderitem')
+CATALOG_WRITE_KEY = 'store:catalog_written'
+
+_state = ContextVar('store_replica_state', default=None)
+
+
+def replica_databases():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def pin_key(user_id):
+    return f'store:primary_pin:{user_id}'
+
+
+def request_user_id(request):
+    """The authenticated user's id, without triggering authentication."""
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject):
+        # Django's session user; only look at it once something resolved it
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def pin_to_primary(user_id):
+    """Keep ``user_id``'s reads on the primary for the sticky window."""
+    if user_id is not None and sticky_seconds() > 0:
+        get_cache().set(pin_key(user_id), True, sticky_seconds())
+
+
+def note_catalog_write():
+    """Send cache fills to the primary for the sticky window after a catalog write."""
+    if replica_databases() and sticky_seconds() > 0:
+        get_cache().set(CATALOG_WRITE_KEY, True, sticky_seconds())
+
+
+def pin_cache_fill():
+    """Read the rest of this request from the primary if the catalog just changed.
+
+    Called before a response is built for the cache: the catalog version
+    already moved, and a replica that hasn't caught up would have its old
+    rows cached under the new version until they expire.
+    """
+    state = _state.get()
+    if state is not None and not state.pinned and replica_databases() and get_cache().get(CATALOG_WRITE_KEY):
+        state.pinned = True
+
+
+def check_replica_cache(app_configs, **kwargs):
+    """Warn when replicas are configured but the pins live in a per-process cache."""
+    if replica_databases() and isinstance(get_cache(), (LocMemCache, DummyCache)):
+        return [checks.Warning(
+            'REPLICA_DATABASES is set but the store cache is local to each process, so a user pinned to the '
+            'primary after a write is only pinned on the worker that served the write.',
+            hint='Use a shared cache (CACHE_BACKEND, e.g. Redis or Memcached) when running several workers.',
+            id='store.W001',
+        )]
+    return []
+
+
+class RequestState:
+    __slots__ = ('request', 'replica', 'pinned_user', 'pinned')
+
+    def __init__(self, request):
+        self.request = request
+        self.replica = None
+        self.pinned_user = None
+        self.pinned = request.method not in SAFE_METHODS
+
+    def read_alias(self):
+        if self.pinned:
+            return DEFAULT_DB_ALIAS
+        user_id = request_user_id(self.request)
+        if user_id is not None and user_id != self.pinned_user:
+            # Checked once per request, when the user becomes known
+            self.pinned_user = user_id
+            if get_cache().get(pin_key(user_id)):
+                self.pinned = True
+                return DEFAULT_DB_ALIAS
+        if self.replica is None:
+            # One replica per request, so its reads are consistent
+            self.replica = random.choice(replica_databases())
+        return self.replica
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not replica_databases() or model._meta.label_lower not in self.replica_models():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *replica_databases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db not in replica_databases()
+
+    def replica_models(self):
+        return getattr(settings, 'REPLICA_MODELS', DEFAULT_REPLICA_MODELS)
+
+
+class ReplicaMiddleware:
+    """Expose the current request to ``ReplicaRouter`` and pin writers to the primary."""
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _state.set(RequestState(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = _state.set(RequestState(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_databases():
+            pin_to_primary(request_user_id(request))
+        return response
@@ -0,0 +1,158 @@
+"""Full-text item search.
+
+``get_search_backend()`` picks an implementation for the database the items
+live in: an FTS5 inverted index on SQLite, a GIN-indexed ``tsvector`` on
+PostgreSQL and ``icontains`` scans everywhere else. Every backend annotates
+matching rows with ``search_rank`` (higher is more relevant) and matches each
+search word as a prefix.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q, Value, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Item
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_words(text):
+    return WORD_RE.findall(text.lower())
+
+
+class BaseSearchBackend:
+    def __init__(self, using=None):
+        self.using = using
+
+    def search(self, queryset, text):
+        raise NotImplementedError
+
+    def index_item(self, item):
+        pass
+
+    def remove_item(self, item_id):
+        pass
+
+    def index_items(self, queryset):
+        """Reindex the items in ``queryset`` after bulk writes, which skip the signals."""
+        for item in queryset.only('name', 'description'):
+            self.index_item(item)
+
+    def rebuild(self):
+        pass
+
+
+class FallbackSearchBackend(BaseSearchBackend):
+    """Unindexed LIKE scans, equivalent to DRF's SearchFilter."""
+
+    def search(self, queryset, text):
+        for word in search_words(text):
+            queryset = queryset.filter(Q(name__icontains=word) | Q(description__icontains=word))
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """FTS5 table keyed by item id, kept in sync by the Item signals."""
+
+    table = 'store_item_fts'
+
+    def match_expression(self, text):
+        # Quote every word so FTS5 operators in user input are literal
+        return ' '.join(f'"{word}"*' for word in search_words(text))
+
+    def search(self, queryset, text):
+        match = self.match_expression(text)
+        if not match:
+            return queryset
+        item_table = Item._meta.db_table
+        # One join against the index; bm25() reads the same MATCH, so every
+        # row isn't matched again for its rank
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = {item_table}.id', f'{self.table} MATCH %s'],
+            params=[match],
+        ).annotate(
+            # bm25() is lower for better matches
+            search_rank=RawSQL(f'-bm25({self.table})', [], output_field=FloatField()),
+        )
+
+    def index_item(self, item):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [item.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) VALUES (%s, %s, %s)',
+                [item.pk, item.name, item.description],
+            )
+
+    def remove_item(self, item_id):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [item_id])
+
+    def index_items(self, queryset):
+        sql, params = queryset.values_list('id', 'name', 'description').query.sql_with_params()
+        ids_sql, ids_params = queryset.values_list('id').query.sql_with_params()
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({ids_sql})', ids_params)
+            cursor.execute(f'INSERT INTO {self.table} (rowid, name, description) {sql}', params)
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) '
+                f'SELECT id, name, description FROM {Item._meta.db_table}'
+            )
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Queries the expression GIN index created by migration 0003."""
+
+    document = "to_tsvector('english', {table}.name || ' ' || {table}.description)"
+
+    def index_items(self, queryset):
+        # The expression index follows the table
+        pass
+
+    def search(self, queryset, text):
+        words = search_words(text)
+        if not words:
+            return queryset
+        query = ' & '.join(f'{word}:*' for word in words)
+        document = self.document.format(table=Item._meta.db_table)
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT id FROM {Item._meta.db_table} "
+                f"WHERE {document} @@ to_tsquery('english', %s)",
+                [query],
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({document}, to_tsquery('english', %s))",
+                [query],
+                output_field=FloatField(),
+            )
+        )
+
+
+_backends = {}
+
+
+def get_search_backend(using=None):
+    using = using or router.db_for_write(Item)
+    if using not in _backends:
+        backend_path = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+        vendor = connections[using].vendor
+        if backend_path:
+            backend = import_string(backend_path)(using)
+        elif vendor == 'sqlite':
+            backend = SQLiteFTSBackend(using)
+        elif vendor == 'postgresql':
+            backend = PostgresSearchBackend(using)
+        else:
+            backend = FallbackSearchBackend(using)
+        _backends[using] = backend
+    return _backends[using]
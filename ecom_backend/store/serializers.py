@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Category, Item, Cart, CartItem, Wishlist, UserProfile, Order, OrderItem
+from .metrics import TimedSerializerMixin
+from .sparse import SparseFieldsMixin
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
@@ -20,35 +22,47 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined')
         read_only_fields = ('id', 'date_joined')
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     items_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
         fields = ('id', 'name', 'description', 'image', 'items_count', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
+        presets = {'card': ('id', 'name', 'image', 'items_count')}
+        # Annotated by with_items_count()
+        sparse_columns = {'items_count': ()}
 
     def get_items_count(self, obj):
+        # List and detail querysets annotate this; fall back for bare instances
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.items.filter(is_active=True).count()
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    available_quantity = serializers.IntegerField(read_only=True)
     is_in_stock = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Item
-        fields = ('id', 'name', 'description', 'price', 'category', 'category_name', 
-                 'image', 'stock_quantity', 'is_featured', 'is_active', 'is_in_stock',
+        fields = ('id', 'sku', 'name', 'description', 'price', 'category', 'category_name',
+                 'image', 'stock_quantity', 'available_quantity', 'is_featured', 'is_active', 'is_in_stock',
                  'created_at', 'updated_at')
-        read_only_fields = ('id', 'created_at', 'updated_at')
-
-class CartItemSerializer(serializers.ModelSerializer):
+        # The catalog feed key; set by feeds or generated on create
+        read_only_fields = ('id', 'sku', 'created_at', 'updated_at')
+        presets = {'card': ('id', 'name', 'price', 'image', 'is_in_stock')}
+        # reserved_quantity is annotated by ItemQuerySet.with_available_stock()
+        sparse_columns = {'available_quantity': ('stock_quantity', 'reserved_quantity'),
+                          'is_in_stock': ('stock_quantity', 'reserved_quantity')}
+
+class CartItemSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     item_name = serializers.CharField(source='item.name', read_only=True)
     item_price = serializers.DecimalField(source='item.price', max_digits=10, decimal_places=2, read_only=True)
     item_image = serializers.URLField(source='item.image', read_only=True)
@@ -59,8 +73,18 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ('id', 'item', 'item_name', 'item_price', 'item_image', 
                  'quantity', 'total_price', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
+        presets = {'card': ('id', 'item', 'item_name', 'item_price', 'item_image', 'quantity', 'total_price')}
+        sparse_columns = {'total_price': ('quantity', 'item__price')}
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=('add', 'set', 'remove'))
+    item_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(default=1, min_value=0)
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     total_items = serializers.IntegerField(read_only=True)
@@ -69,16 +93,32 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ('id', 'user', 'items', 'total_price', 'total_items', 'created_at', 'updated_at')
         read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+        presets = {'summary': ('id', 'total_price', 'total_items'),
+                   'card': ('id', 'items.card', 'total_price', 'total_items')}
+        # Annotated by CartQuerySet.with_totals()
+        sparse_columns = {'total_price': ('items_total_price',), 'total_items': ('items_total_quantity',)}
 
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     items = ItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Wishlist
         fields = ('id', 'user', 'items', 'created_at', 'updated_at')
         read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+        presets = {'card': ('id', 'items.card')}
+
+class WishlistBatchSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(), max_length=500, default=list)
+    remove = serializers.ListField(child=serializers.IntegerField(), max_length=500, default=list)
+
+    def validate(self, attrs):
+        if not attrs['add'] and not attrs['remove']:
+            raise serializers.ValidationError('Nothing to add or remove')
+        if set(attrs['add']) & set(attrs['remove']):
+            raise serializers.ValidationError('An item cannot be both added and removed')
+        return attrs
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -87,7 +127,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
                  'date_of_birth', 'avatar', 'created_at', 'updated_at')
         read_only_fields = ('id', 'user', 'created_at', 'updated_at')
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     item_name = serializers.CharField(source='item.name', read_only=True)
     item_image = serializers.URLField(source='item.image', read_only=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -96,8 +136,9 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ('id', 'item', 'item_name', 'item_image', 'quantity', 'price', 'total_price')
         read_only_fields = ('id',)
+        sparse_columns = {'total_price': ('quantity', 'price')}
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     order_status_display = serializers.CharField(source='get_order_status_display', read_only=True)
@@ -109,6 +150,9 @@ class OrderSerializer(serializers.ModelSerializer):
                  'order_status', 'order_status_display', 'payment_status', 'payment_status_display',
                  'payment_method', 'shipping_address', 'notes', 'items', 'created_at', 'updated_at')
         read_only_fields = ('id', 'order_number', 'user', 'created_at', 'updated_at')
+        presets = {'summary': ('id', 'order_number', 'total_amount', 'order_status', 'order_status_display',
+                               'payment_status', 'payment_status_display', 'created_at')}
+        sparse_columns = {'user_name': ('user__first_name', 'user__last_name')}
 
 class CreateOrderSerializer(serializers.Serializer):
     shipping_address = serializers.CharField()
@@ -0,0 +1,112 @@
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .cache import bump_catalog_version
+from .models import Cart, Category, Item, Order, UserProfile, Wishlist
+from .rollups import record_order_change, rollup_state
+from .search import get_search_backend
+from .usercache import forget_owned_id, invalidate_user
+from .wishlist import invalidate_wishlist_ids
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, **kwargs):
+    get_search_backend().index_item(instance)
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item(sender, instance, **kwargs):
+    get_search_backend().remove_item(instance.pk)
+
+
+def adjust_items_count(category_id, delta):
+    if category_id is not None:
+        Category.objects.filter(pk=category_id).update(active_items_count=F('active_items_count') + delta)
+
+
+@receiver(post_save, sender=Item)
+def count_item(sender, instance, created, **kwargs):
+    old_category, old_active = (None, False) if created else getattr(instance, '_counted_state', (None, None))
+    if old_active is None or (old_active and old_category is None):
+        # Loaded with deferred fields; the reconcile command repairs any drift
+        instance.remember_counted_state()
+        return
+    new_category, new_active = instance.category_id, instance.is_active
+    if (old_category, bool(old_active)) != (new_category, new_active):
+        if old_active:
+            adjust_items_count(old_category, -1)
+        if new_active:
+            adjust_items_count(new_category, 1)
+    instance.remember_counted_state()
+
+
+@receiver(post_delete, sender=Item)
+def uncount_item(sender, instance, **kwargs):
+    category_id, is_active = getattr(instance, '_counted_state', (instance.category_id, instance.is_active))
+    if is_active:
+        adjust_items_count(category_id, -1)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Wishlist.items.through)
+def invalidate_wishlist_ids_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    # apply_wishlist_changes() writes the join table directly and invalidates
+    # itself; this covers wishlist.items.add() and friends (admin, shell)
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_wishlist_ids(instance.user_id)
+    elif action in ('post_add', 'post_remove'):
+        invalidate_wishlist_ids(*Wishlist.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+    elif action == 'pre_clear':
+        # Afterwards there is no telling whose wishlists held the item
+        invalidate_wishlist_ids(*instance.wishlist_set.values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(getattr(instance, jwt_settings.USER_ID_FIELD))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_user(sender, instance, **kwargs):
+    if jwt_settings.USER_ID_FIELD == 'id':
+        # Don't load the user just for its primary key
+        invalidate_user(instance.user_id)
+    else:
+        invalidate_user(getattr(instance.user, jwt_settings.USER_ID_FIELD))
+
+
+@receiver(post_delete, sender=Cart)
+@receiver(post_delete, sender=Wishlist)
+def forget_owned_ids(sender, instance, **kwargs):
+    forget_owned_id(instance.user_id, sender)
+
+
+@receiver(post_save, sender=Order)
+def roll_up_order(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_rollup_state', None)
+    new = rollup_state(instance)
+    if created or (old is not None and new is not None):
+        record_order_change(old, new)
+    # Otherwise loaded with deferred fields; backfill_order_rollups repairs any drift
+    instance.remember_rollup_state()
+
+
+@receiver(post_delete, sender=Order)
+def unroll_order(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        # The user's rollups are deleted along with their orders
+        return
+    record_order_change(getattr(instance, '_rollup_state', None) or rollup_state(instance), None)
@@ -0,0 +1,244 @@
+"""Sparse fieldsets: ``?fields=`` and ``?exclude=`` on read endpoints.
+
+Both parameters take comma separated field names. A dotted name selects
+inside a nested serializer (``?fields=id,items.name``) and a name listed in
+the serializer's ``Meta.presets`` expands to that preset (``?fields=card``).
+Unknown names are a 400.
+
+The selection trims the serializer's fields and, through
+``SparseQuerysetMixin``, the SQL column list: the queryset is restricted
+with ``only()`` to the columns the remaining fields read. Fields that aren't
+plain columns declare theirs in ``Meta.sparse_columns``; a field that maps
+to no known column leaves the queryset untouched rather than risk a query
+per row for a deferred value.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value):
+    """Turn ``'id,items.name,items.price'`` into ``{'id': {}, 'items': {'name': {}, 'price': {}}}``."""
+    tree = {}
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        node = tree
+        for part in name.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+class Fieldset:
+    """A field selection for one serializer level.
+
+    ``include`` is ``None`` (every field) or a tree of names to keep;
+    ``exclude`` is a tree of names to drop. An empty subtree means the whole
+    field.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        self.include = include
+        self.exclude = exclude or {}
+
+    @classmethod
+    def from_request(cls, request):
+        """The request's selection, or ``None`` if it didn't ask for one."""
+        params = getattr(request, 'query_params', None)
+        if params is None:
+            params = getattr(request, 'GET', {})
+        fields, exclude = params.get('fields'), params.get('exclude')
+        if not fields and not exclude:
+            return None
+        return cls(parse_names(fields) if fields else None, parse_names(exclude or ''))
+
+    @property
+    def key(self):
+        """Hashable and independent of the order names were listed in."""
+        return frozen_tree(self.include), frozen_tree(self.exclude)
+
+    def expand(self, tree, fields, presets, param):
+        expanded = {}
+        for name, subtree in tree.items():
+            if name in fields:
+                merge(expanded, {name: subtree})
+            elif name in presets and not subtree:
+                merge(expanded, self.expand(parse_names(','.join(presets[name])), fields, presets, param))
+            else:
+                raise ValidationError({param: [f'Unknown field "{name}".']})
+        return expanded
+
+    def select(self, fields, presets=None):
+        """Trim a serializer's ``fields`` in place and hand subtrees to nested serializers."""
+        presets = presets or {}
+        include = None if self.include is None else self.expand(self.include, fields, presets, 'fields')
+        exclude = self.expand(self.exclude, fields, presets, 'exclude')
+
+        for name in list(fields):
+            if include is not None and name not in include:
+                del fields[name]
+            elif name in exclude and not exclude[name]:
+                del fields[name]
+            else:
+                nested_include = include.get(name) if include is not None else None
+                nested = Fieldset(nested_include or None, exclude.get(name))
+                if nested.include is not None or nested.exclude:
+                    select_nested(fields[name], name, nested)
+        return fields
+
+
+def frozen_tree(tree):
+    if tree is None:
+        return None
+    return tuple(sorted((name, frozen_tree(subtree)) for name, subtree in tree.items()))
+
+
+def merge(tree, other):
+    for name, subtree in other.items():
+        if name in tree and (not tree[name] or not subtree):
+            # A bare name selects the whole field, which wins over a subtree
+            tree[name] = {}
+        else:
+            merge(tree.setdefault(name, {}), subtree)
+    return tree
+
+
+def select_nested(field, name, fieldset):
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if not isinstance(field, SparseFieldsMixin):
+        raise ValidationError({'fields': [f'"{name}" has no fields to select.']})
+    field.fieldset = fieldset
+
+
+class SparseFieldsMixin:
+    """Serializer mixin that applies a ``Fieldset``.
+
+    The selection comes from the ``fieldset`` argument or, for the top-level
+    serializer, from the request in the context.
+    """
+
+    def __init__(self, *args, fieldset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fieldset = fieldset
+
+    @property
+    def is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fieldset(self):
+        if self.fieldset is None and self.is_top_level and 'request' in self.context:
+            return Fieldset.from_request(self.context['request'])
+        return self.fieldset
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return fields
+        return fieldset.select(fields, getattr(self.Meta, 'presets', {}))
+
+
+def field_column(model, field):
+    """The ``only()``/``values()`` lookup a DRF field reads, or ``None``."""
+    source = field.source
+    if source.startswith('get_') and source.endswith('_display'):
+        source = source[len('get_'):-len('_display')]
+    for part in source.split('.'):
+        try:
+            model = model._meta.get_field(part).related_model
+        except (AttributeError, FieldDoesNotExist):
+            return None
+    return source.replace('.', '__')
+
+
+def selected_columns(serializer):
+    """Columns read by the serializer's (selected) fields, or ``None``.
+
+    Nested many-valued serializers are skipped; they are prefetched
+    separately.
+    """
+    model = serializer.Meta.model
+    declared = getattr(serializer.Meta, 'sparse_columns', {})
+    columns = ['pk']
+    for name, field in serializer.fields.items():
+        if field.write_only or isinstance(field, serializers.ListSerializer):
+            continue
+        if name in declared:
+            lookups = declared[name]
+        else:
+            lookup = field_column(model, field)
+            if lookup is None:
+                return None
+            lookups = [lookup]
+        columns.extend(lookup for lookup in lookups if lookup not in columns)
+    return columns
+
+
+def restrict_queryset(queryset, columns):
+    """``only()`` the given columns, keeping just the joins they need."""
+    if columns is None:
+        return queryset
+    annotations = queryset.query.annotations
+    columns = [column for column in columns if column.split('__')[0] not in annotations]
+    relations = []
+    for column in columns:
+        if '__' in column:
+            relation = column.rsplit('__', 1)[0]
+            if relation not in relations:
+                relations.append(relation)
+    if queryset.query.select_related:
+        # Deferring a foreign key that select_related follows is an error
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+    return queryset.only(*columns, *relations)
+
+
+def restrict_prefetches(queryset, serializer):
+    """Drop prefetches for nested fields that weren't selected and narrow the rest."""
+    lookups = []
+    for lookup in queryset._prefetch_related_lookups:
+        name = getattr(lookup, 'prefetch_to', lookup).split('__')[0]
+        field = serializer.fields.get(name)
+        if field is None:
+            continue
+        child = getattr(field, 'child', field)
+        if isinstance(lookup, Prefetch) and lookup.queryset is not None and getattr(child, 'fieldset', None):
+            columns = selected_columns(child)
+            relation = queryset.model._meta.get_field(name)
+            if columns is not None and relation.one_to_many:
+                # The prefetch matches children to parents on this key
+                columns.append(relation.field.name)
+            lookup = Prefetch(lookup.prefetch_through, restrict_queryset(lookup.queryset, columns), lookup.to_attr)
+        lookups.append(lookup)
+    return queryset.prefetch_related(None).prefetch_related(*lookups)
+
+
+class SparseQuerysetMixin:
+    """View mixin that narrows querysets to the requested fields.
+
+    Applied in ``filter_queryset()`` so list and detail lookups both see it,
+    and after ordering so the ordering columns stay loaded for keyset
+    pagination. Views with their own ``get_object()`` call
+    ``sparse_queryset()`` directly.
+    """
+
+    def filter_queryset(self, queryset):
+        return self.sparse_queryset(super().filter_queryset(queryset))
+
+    def sparse_queryset(self, queryset):
+        if self.request.method != 'GET' or Fieldset.from_request(self.request) is None:
+            return queryset
+        serializer = self.get_serializer()
+        columns = selected_columns(serializer)
+        if columns is not None:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+            columns += [name.lstrip('-') for name in ordering
+                        if isinstance(name, str) and name.lstrip('-') not in columns]
+        return restrict_prefetches(restrict_queryset(queryset, columns), serializer)
@@ -1,3 +1,1619 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import (
+    Category, Item, Cart, CartItem, Wishlist, UserProfile, Order, OrderItem, OrderRollup, PaymentJob
+)
+from .gateway import GatewayError, PaymentDeclined
+from .orderexport import export_orders, filter_orders
+from .payments import PaymentWorker, claim_jobs, finish_job
+from .querybudget import QueryBudgetTestMixin
+
+
+class StoreTestCase(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='testpass123')
+        self.category = Category.objects.create(name='Electronics')
+
+    def authenticate(self, user=None):
+        token = RefreshToken.for_user(user or self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def create_items(self, count, category=None, **kwargs):
+        defaults = {'description': 'Test item', 'price': Decimal('10.00'),
+                    'image': 'https://example.com/item.png', 'stock_quantity': 100}
+        defaults.update(kwargs)
+        return [
+            Item.objects.create(name=f'Item {i}', category=category or self.category, **defaults)
+            for i in range(count)
+        ]
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(StoreTestCase):
+    def test_item_list_query_count_is_constant(self):
+        for category in [Category.objects.create(name=f'Category {i}') for i in range(5)]:
+            self.create_items(4, category=category)
+        with self.assertMaxQueries(2):
+            response = self.client.get('/api/items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_order_history_query_count_is_constant(self):
+        items = self.create_items(5)
+        for _ in range(20):
+            order = Order.objects.create(user=self.user, total_amount=Decimal('50.00'),
+                                         shipping_address='1 Test Street')
+            for item in items:
+                OrderItem.objects.create(order=order, item=item, quantity=1, price=item.price)
+        self.authenticate()
+        with self.assertMaxQueries(4):
+            response = self.client.get('/api/orders/')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(response.data['results'][0]['items']), 5)
+
+    def test_cart_and_wishlist_query_count_is_constant(self):
+        items = self.create_items(10)
+        cart = Cart.objects.create(user=self.user)
+        wishlist = Wishlist.objects.create(user=self.user)
+        for item in items:
+            CartItem.objects.create(cart=cart, item=item, quantity=2)
+        wishlist.items.add(*items)
+        self.authenticate()
+        # The user and the cart id are looked up once, then cached
+        with self.assertMaxQueries(4):
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.data['total_items'], 20)
+        with self.assertMaxQueries(2):
+            self.client.get('/api/cart/')
+        with self.assertMaxQueries(3):
+            response = self.client.get('/api/wishlist/')
+        self.assertEqual(len(response.data['items']), 10)
+        with self.assertMaxQueries(2):
+            self.client.get('/api/wishlist/')
+
+    def test_budget_violation_raises_in_strict_mode(self):
+        from .querybudget import QueryBudgetExceeded
+        from .views import FeaturedItemsView
+
+        self.create_items(3, is_featured=True)
+        original = FeaturedItemsView.query_budget
+        FeaturedItemsView.query_budget = 0
+        try:
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/items/featured/')
+        finally:
+            FeaturedItemsView.query_budget = original
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_budgets_can_differ_by_method(self):
+        self.create_items(3)
+        self.authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'testpass123'))
+        self.assertEqual(self.client.get('/api/items/').status_code, 200)
+        response = self.client.post('/api/items/', {
+            'name': 'Fan', 'description': 'Fan', 'price': '15.00', 'category': self.category.pk,
+            'image': 'https://example.com/fan.png',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+class ItemSearchTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_items(3)
+        self.laptop = Item.objects.create(
+            name='MacBook Air', description='Apple laptop with M2 chip', price=Decimal('999.00'),
+            category=self.category, image='https://example.com/mac.png', stock_quantity=5)
+        self.case = Item.objects.create(
+            name='Laptop sleeve', description='Protective case', price=Decimal('19.00'),
+            category=self.category, image='https://example.com/sleeve.png', stock_quantity=5)
+
+    def search(self, term, **params):
+        response = self.client.get('/api/items/', {'search': term, **params})
+        return [row['name'] for row in response.data['results']]
+
+    def test_prefix_matching(self):
+        self.assertCountEqual(self.search('lapt'), ['MacBook Air', 'Laptop sleeve'])
+        self.assertEqual(self.search('mac lap'), ['MacBook Air'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.case.name = 'Tablet sleeve'
+        self.case.description = 'Protective cover'
+        self.case.save()
+        self.assertEqual(self.search('laptop'), ['MacBook Air'])
+        self.laptop.delete()
+        self.assertEqual(self.search('laptop'), [])
+
+    def test_explicit_ordering_overrides_relevance(self):
+        self.assertEqual(self.search('laptop', ordering='price'), ['Laptop sleeve', 'MacBook Air'])
+
+    def test_ranks_with_one_match(self):
+        with CaptureQueriesContext(connection) as queries:
+            names = self.search('laptop sleeve')
+        self.assertEqual(names, ['Laptop sleeve'])
+        self.assertTrue(all(query['sql'].count('MATCH') <= 1 for query in queries))
+        Item.objects.filter(pk=self.laptop.pk).update(description='Laptop laptop laptop')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('laptop'), ['MacBook Air', 'Laptop sleeve'])
+
+    def test_rebuild_command(self):
+        Item.objects.filter(pk=self.case.pk).update(name='Phone sleeve')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('phone'), ['Phone sleeve'])
+
+
+class KeysetPaginationTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.create_items(45)
+        # Ties on created_at must still page deterministically via id
+        Item.objects.filter(pk__in=[item.pk for item in self.items[10:30]]).update(
+            created_at=self.items[10].created_at)
+        for index, item in enumerate(self.items):
+            Item.objects.filter(pk=item.pk).update(price=Decimal(index % 7))
+
+    def walk(self, url, params):
+        ids, response = [], self.client.get(url, params)
+        pages = [response]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(response)
+        for page in pages:
+            ids.extend(row['id'] for row in page.data['results'])
+        return ids, pages
+
+    def test_cursor_pages_match_offset_ordering(self):
+        for ordering in ['-created_at', 'price', '-price', 'name']:
+            expected = list(Item.objects.order_by(ordering, 'id').values_list('id', flat=True))
+            ids, pages = self.walk('/api/items/', {'pagination': 'cursor', 'ordering': ordering})
+            self.assertEqual(ids, expected, ordering)
+            self.assertEqual(len(pages), 3)
+
+    def test_previous_link_walks_back(self):
+        ids, pages = self.walk('/api/items/', {'pagination': 'cursor'})
+        response = self.client.get(pages[-1].data['previous'])
+        self.assertEqual([row['id'] for row in response.data['results']], ids[20:40])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([row['id'] for row in response.data['results']], ids[:20])
+        self.assertIsNone(response.data['previous'])
+
+    def test_cursor_mode_skips_count_unless_requested(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get('/api/items/', {'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        response = self.client.get('/api/items/', {'pagination': 'cursor', 'count': 'exact'})
+        self.assertEqual((response.data['count'], response.data['count_is_estimate']), (45, False))
+        with self.settings(PAGINATION_COUNT_THRESHOLD=10):
+            response = self.client.get('/api/items/', {'pagination': 'cursor', 'count': 'approx'})
+        self.assertEqual((response.data['count'], response.data['count_is_estimate']), (10, True))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/items/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_mode_unchanged(self):
+        response = self.client.get('/api/items/', {'page': 2})
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 20)
+
+
+class CatalogCacheTests(StoreTestCase):
+    def test_reads_are_served_from_cache_until_catalog_changes(self):
+        item = self.create_items(1)[0]
+        response = self.client.get(f'/api/items/{item.pk}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        # Only availability is read on a hit
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/items/{item.pk}/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        item.name = 'Renamed'
+        item.save()
+        response = self.client.get(f'/api/items/{item.pk}/')
+        self.assertEqual((response['X-Cache'], response.data['name']), ('MISS', 'Renamed'))
+
+    def test_hits_show_current_availability(self):
+        item = self.create_items(1)[0]
+        stock = item.stock_quantity
+        self.assertEqual(self.client.get(f'/api/items/{item.pk}/')['X-Cache'], 'MISS')
+        self.client.get('/api/items/')
+        self.authenticate()
+        self.client.post('/api/cart/add/', {'item_id': item.pk, 'quantity': 2}, format='json')
+        self.client.credentials()
+
+        response = self.client.get(f'/api/items/{item.pk}/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual((response.data['stock_quantity'], response.data['available_quantity']), (stock, stock - 2))
+        response = self.client.get('/api/items/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['available_quantity'], stock - 2)
+
+        Item.objects.filter(pk=item.pk).update(stock_quantity=2)
+        response = self.client.get(f'/api/items/{item.pk}/')
+        self.assertEqual((response.data['available_quantity'], response.data['is_in_stock']), (0, False))
+
+    def test_query_params_are_part_of_the_key(self):
+        self.create_items(25)
+        first = self.client.get('/api/items/')
+        second = self.client.get('/api/items/', {'page': 2})
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertNotEqual(first.data['results'], second.data['results'])
+
+    def test_authenticated_item_list_bypasses_cache(self):
+        self.create_items(1)
+        self.client.get('/api/items/')
+        self.authenticate()
+        response = self.client.get('/api/items/')
+        self.assertFalse(response.has_header('X-Cache'))
+
+    def test_category_write_invalidates(self):
+        self.client.get('/api/categories/')
+        Category.objects.create(name='Books')
+        response = self.client.get('/api/categories/')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_warm_up_command(self):
+        self.create_items(3)
+        call_command('warm_catalog_cache', stdout=StringIO())
+        response = self.client.get('/api/categories/', HTTP_HOST='localhost')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+
+class CartTotalsTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cart = Cart.objects.create(user=self.user)
+        first, second = self.create_items(2)
+        Item.objects.filter(pk=second.pk).update(price=Decimal('2.55'))
+        CartItem.objects.create(cart=self.cart, item=first, quantity=3)
+        CartItem.objects.create(cart=self.cart, item=second, quantity=2)
+
+    def test_totals_come_from_one_aggregate(self):
+        cart = Cart.objects.get(pk=self.cart.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(cart.total_price, Decimal('35.10'))
+            self.assertEqual(cart.total_items, 5)
+        cart = Cart.objects.with_totals().get(pk=self.cart.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual((cart.total_price, cart.total_items), (Decimal('35.10'), 5))
+
+    def test_cart_api_output(self):
+        self.authenticate()
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.data['total_price'], '35.10')
+        self.assertEqual(response.data['total_items'], 5)
+
+        CartItem.objects.all().delete()
+        response = self.client.get('/api/cart/')
+        self.assertEqual((response.data['total_price'], response.data['total_items']), ('0.00', 0))
+
+    def test_admin_changelist_uses_annotated_totals(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+        for index in range(5):
+            cart = Cart.objects.create(user=User.objects.create_user(f'shopper{index}'))
+            CartItem.objects.create(cart=cart, item=Item.objects.first(), quantity=index + 1)
+        self.client.force_login(admin_user)
+        with self.assertMaxQueries(8):
+            response = self.client.get('/admin/store/cart/')
+        self.assertContains(response, '35.10')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class CheckoutTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.create_items(10, stock_quantity=5)
+        self.cart = Cart.objects.create(user=self.user)
+        for item in self.items:
+            CartItem.objects.create(cart=self.cart, item=item, quantity=2)
+        self.authenticate()
+
+    def checkout(self):
+        return self.client.post('/api/orders/create/', {'shipping_address': '1 Test Street'}, format='json')
+
+    def test_checkout_decrements_stock_and_clears_cart(self):
+        with self.assertMaxQueries(15):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_amount'], '200.00')
+        self.assertEqual(len(response.data['items']), 10)
+        self.assertEqual(set(Item.objects.values_list('stock_quantity', flat=True)), {3})
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_shortages_are_reported_without_partial_writes(self):
+        Item.objects.filter(pk=self.items[0].pk).update(stock_quantity=1)
+        Item.objects.filter(pk=self.items[1].pk).update(is_active=False)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            sorted((row['item_id'], row['available']) for row in response.data['shortages']),
+            [(self.items[0].pk, 1), (self.items[1].pk, 0)])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 10)
+        self.assertEqual(Item.objects.get(pk=self.items[2].pk).stock_quantity, 5)
+
+    def test_conditional_update_catches_concurrent_sale(self):
+        from .checkout import decrement_stock
+
+        self.assertTrue(decrement_stock({self.items[0].pk: 5}))
+        self.assertFalse(decrement_stock({self.items[0].pk: 1, self.items[1].pk: 1}))
+
+    def test_stock_moving_mid_checkout_rolls_back_without_false_shortages(self):
+        from .checkout import decrement_stock
+
+        def sold_elsewhere(quantities, reserved=None):
+            # The first row decrements, then another sale empties the second
+            Item.objects.filter(pk=self.items[1].pk).update(stock_quantity=0)
+            return decrement_stock(quantities, reserved)
+
+        with mock.patch('store.checkout.decrement_stock', sold_elsewhere):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 409)
+        self.assertNotIn('shortages', response.data)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Item.objects.get(pk=self.items[0].pk).stock_quantity, 5)
+
+    def test_empty_and_missing_cart(self):
+        CartItem.objects.all().delete()
+        self.assertEqual(self.checkout().data, {'error': 'Cart is empty'})
+        self.cart.delete()
+        self.assertEqual(self.checkout().status_code, 404)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class OrderRollupTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate()
+
+    def order(self, amount, **kwargs):
+        return Order.objects.create(user=self.user, total_amount=Decimal(amount), shipping_address='1 Road', **kwargs)
+
+    def summary(self):
+        with self.assertMaxQueries(2):
+            return self.client.get('/api/orders/summary/').data
+
+    def test_summary_follows_order_changes(self):
+        first = self.order('30.00')
+        self.order('12.50', order_status='cancelled', payment_status='refunded')
+        self.client.post(f'/api/orders/{first.pk}/payment/')
+        Order.objects.filter(pk=first.pk).get().delete()
+        self.order('20.00', order_status='delivered', payment_status='completed')
+
+        summary = self.summary()
+        self.assertEqual(summary['order_count'], 2)
+        self.assertEqual(summary['lifetime_spend'], '20.00')
+        self.assertEqual(summary['orders_by_status']['cancelled'], 1)
+        self.assertEqual(summary['orders_by_status']['processing'], 0)
+        self.assertEqual(summary['orders_by_payment_status']['completed'], 1)
+        self.assertEqual(len(summary['monthly']), 1)
+        self.assertEqual(summary['monthly'][0]['total_amount'], '32.50')
+
+        # The rollups go with the user
+        self.user.delete()
+        self.assertFalse(OrderRollup.objects.exists())
+
+    def test_backfill_repairs_drift(self):
+        self.order('10.00')
+        # update() skips the signals
+        Order.objects.update(payment_status='completed')
+        self.assertEqual(self.summary()['lifetime_spend'], '0.00')
+
+        out = StringIO()
+        call_command('backfill_order_rollups', stdout=out)
+        self.assertIn('2 row(s) had drifted', out.getvalue())
+        self.assertEqual(self.summary()['lifetime_spend'], '10.00')
+        call_command('backfill_order_rollups', stdout=out)
+        self.assertIn('0 row(s) had drifted', out.getvalue())
+
+
+class FlakyGateway:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.keys = []
+
+    def charge(self, amount, reference, idempotency_key):
+        self.keys.append(idempotency_key)
+        if self.errors:
+            raise self.errors.pop(0)
+        return f'ref-{idempotency_key}'
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, PAYMENT_STUB_LATENCY=0, PAYMENT_RETRY_DELAY=0, PAYMENT_MAX_ATTEMPTS=3)
+class PaymentQueueTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate()
+        self.order = Order.objects.create(user=self.user, total_amount=Decimal('40.00'), shipping_address='1 Road')
+
+    def pay(self):
+        return self.client.post(f'/api/orders/{self.order.pk}/payment/')
+
+    def poll(self):
+        with self.assertMaxQueries(2):
+            return self.client.get(f'/api/orders/{self.order.pk}/payment/status/')
+
+    def process(self, gateway=None):
+        worker = PaymentWorker(concurrency=1, gateway=gateway)
+        worker.run(once=True)
+        return worker.outcomes
+
+    def test_payment_is_queued_then_charged(self):
+        response = self.pay()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Location'], f'/api/orders/{self.order.pk}/payment/status/')
+        self.assertEqual(self.pay().data['job']['id'], response.data['job']['id'])
+        polled = self.poll()
+        self.assertEqual((polled.data['payment_status'], polled.data['job']['status']), ('pending', 'queued'))
+        self.assertEqual(polled['Retry-After'], '1')
+
+        self.assertEqual(self.process()['succeeded'], 1)
+        polled = self.poll()
+        self.assertEqual((polled.data['payment_status'], polled.data['order_status']), ('completed', 'processing'))
+        self.assertEqual(polled.data['job'], {'id': response.data['job']['id'], 'status': 'succeeded',
+                                              'attempts': 1, 'last_error': ''})
+        self.assertFalse(polled.has_header('Retry-After'))
+        self.assertEqual(self.pay().status_code, 200)
+        self.assertEqual(self.client.get('/api/orders/summary/').data['lifetime_spend'], '40.00')
+
+    def test_gateway_errors_are_retried_with_the_same_key(self):
+        self.pay()
+        gateway = FlakyGateway([GatewayError('timeout'), GatewayError('timeout')])
+        self.assertEqual(self.process(gateway), {'succeeded': 1, 'failed': 0, 'retried': 2})
+        self.assertEqual(len(set(gateway.keys)), 1)
+        job = PaymentJob.objects.get()
+        self.assertEqual((job.attempts, job.gateway_reference), (3, f'ref-{gateway.keys[0]}'))
+
+    def test_declines_and_exhausted_retries_fail_the_payment(self):
+        self.pay()
+        self.assertEqual(self.process(FlakyGateway([PaymentDeclined('Card declined')]))['failed'], 1)
+        self.assertEqual(self.poll().data['job']['last_error'], 'Card declined')
+        self.assertEqual(self.pay().status_code, 202)
+        self.assertEqual(self.process(FlakyGateway([GatewayError('timeout')] * 3))['retried'], 2)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'failed')
+        self.assertEqual(list(PaymentJob.objects.values_list('status', 'attempts')), [('failed', 1), ('failed', 3)])
+
+    def test_expired_lease_is_claimed_again(self):
+        self.pay()
+        [stalled] = claim_jobs('stalled', 1)
+        self.assertEqual(claim_jobs('other', 1), [])
+        PaymentJob.objects.update(run_after=timezone.now())
+        [job] = claim_jobs('other', 1)
+        self.assertEqual(job.attempts, 2)
+        self.assertFalse(finish_job(stalled, 'succeeded', 'completed'))
+        self.assertTrue(finish_job(job, 'succeeded', 'completed'))
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_queue_depth_and_latency_are_reported(self):
+        self.pay()
+        self.process()
+        other = Order.objects.create(user=self.user, total_amount=Decimal('5.00'), shipping_address='1 Road')
+        self.client.post(f'/api/orders/{other.pk}/payment/')
+        self.client.credentials()
+        text = self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        self.assertIn('store_payment_jobs{status="queued"} 1', text)
+        self.assertIn('store_payment_jobs_due 1', text)
+        self.assertIn('store_payment_jobs_finished{status="succeeded"} 1', text)
+        self.assertIn('store_payment_latency_seconds{quantile="0.95"}', text)
+        out = StringIO()
+        call_command('process_payments', stats=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['depth'], {'queued': 1, 'processing': 0})
+
+    def test_other_users_orders_are_not_found(self):
+        self.authenticate(User.objects.create_user(username='someone', password='testpass123'))
+        self.assertEqual(self.pay().status_code, 404)
+        self.assertEqual(self.client.get(f'/api/orders/{self.order.pk}/payment/status/').status_code, 404)
+
+
+class AdminChangelistTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'testpass123'))
+        items = self.create_items(3)
+        for index in range(5):
+            user = User.objects.create_user(f'shopper{index}')
+            order = Order.objects.create(user=user, total_amount=Decimal('30.00'), shipping_address='1 Road')
+            cart = Cart.objects.create(user=user)
+            for item in items:
+                OrderItem.objects.create(order=order, item=item, quantity=1, price=item.price)
+                CartItem.objects.create(cart=cart, item=item, quantity=index + 1)
+
+    def test_changelist_runs_one_bounded_count(self):
+        for url in ('/admin/store/order/', '/admin/store/orderitem/', '/admin/store/cartitem/'):
+            with self.assertMaxQueries(4), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertContains(response, 'shopper4')
+            counts = [query['sql'] for query in queries if 'COUNT(' in query['sql']]
+            self.assertEqual(len(counts), 1)
+            self.assertIn('LIMIT', counts[0])
+
+    @override_settings(PAGINATION_COUNT_THRESHOLD=10)
+    def test_large_tables_are_counted_up_to_the_threshold(self):
+        response = self.client.get('/admin/store/orderitem/')
+        self.assertEqual(response.context['cl'].result_count, 10)
+        response = self.client.get('/admin/store/orderitem/', {'q': Order.objects.first().order_number})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get('/admin/store/order/', {'q': 'shopper2'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_item_search_uses_the_sku_and_full_text_indexes(self):
+        item = Item.objects.first()
+        Item.objects.filter(pk=item.pk).update(sku='LAMP-1')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/store/item/', {'q': 'LAMP-1'})
+        self.assertEqual(list(response.context['cl'].result_list), [item])
+        self.assertFalse(any('LIKE' in query['sql'] for query in queries))
+        response = self.client.get('/admin/store/item/', {'q': 'ite'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertNotIn('created_at', [spec.field_path for spec in response.context['cl'].filter_specs])
+
+
+class CatalogFeedTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+        self.item = Item.objects.create(name='Lamp', sku='LAMP-1', description='Desk lamp', price=Decimal('20.00'),
+                                        category=self.category, image='https://example.com/lamp.png',
+                                        stock_quantity=5)
+
+    def upload(self, content, name='feed.csv', **data):
+        self.authenticate(self.admin)
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post('/api/items/import/', {'file': upload, **data}, format='multipart')
+
+    def test_csv_upserts_by_sku_and_reports_bad_rows(self):
+        response = self.upload(
+            'sku,name,price,category,stock_quantity\n'
+            'LAMP-1,Lamp,25.00,Electronics,9\n'
+            'FAN-1,Fan,15.50,Electronics,3\n'
+            'FAN-2,Fan,not a price,Electronics,3\n'
+            'FAN-3,Fan,15.50,Garden,3\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual([(error['line'], list(error['errors'])) for error in response.data['errors']],
+                         [(4, ['price']), (5, ['category'])])
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.price, self.item.stock_quantity, self.item.description),
+                         (Decimal('25.00'), 9, 'Desk lamp'))
+        fan = Item.objects.get(sku='FAN-1')
+        self.assertEqual((fan.name, fan.category, fan.stock_quantity), ('Fan', self.category, 3))
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.active_items_count, 2)
+
+    def test_partial_rows_only_write_their_columns(self):
+        response = self.upload('{"sku": "LAMP-1", "stock_quantity": 0}\n'
+                               'not json\n'
+                               '{"sku": "NEW-1", "price": "1.00"}\n', name='feed.jsonl')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3])
+        self.assertEqual(response.data['errors'][1]['errors'], {'name': ['Required for new items.'],
+                                                              'category': ['Required for new items.']})
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.stock_quantity, self.item.price), (0, Decimal('20.00')))
+
+    def test_blank_flags_leave_items_unchanged(self):
+        Item.objects.filter(pk=self.item.pk).update(is_featured=True)
+        response = self.upload('sku,name,price,category,is_featured,is_active\n'
+                               'LAMP-1,Lamp,20.00,Electronics,,\n'
+                               'FAN-1,Fan,15.50,Electronics,,no\n')
+        self.assertEqual((response.data['updated'], response.data['created']), (1, 1))
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.is_featured, self.item.is_active), (True, True))
+        fan = Item.objects.get(sku='FAN-1')
+        self.assertEqual((fan.is_featured, fan.is_active), (False, False))
+
+    def test_api_exposes_the_sku_read_only(self):
+        self.assertEqual(self.client.get(f'/api/items/{self.item.pk}/').data['sku'], 'LAMP-1')
+        self.authenticate(self.admin)
+        response = self.client.post('/api/items/', {
+            'sku': 'MINE-1', 'name': 'Fan', 'description': 'Fan', 'price': '15.00', 'category': self.category.pk,
+            'image': 'https://example.com/fan.png',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertRegex(response.data['sku'], r'^SKU-[0-9A-F]{10}$')
+
+    def test_new_categories_need_opting_in(self):
+        feed = 'sku,name,price,category\nSEED-1,Seeds,2.00,Garden\n'
+        self.assertEqual(self.upload(feed).data['error_count'], 1)
+        response = self.upload(feed, create_categories='true')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(Item.objects.get(sku='SEED-1').category.name, 'Garden')
+
+    def test_rejects_unreadable_feeds(self):
+        self.assertEqual(self.upload('name,colour\nLamp,red\n').status_code, 400)
+        self.assertEqual(self.upload('{}', name='feed.xml').status_code, 400)
+
+    def test_export_round_trips(self):
+        self.create_items(3)
+        self.authenticate(self.admin)
+        response = self.client.get('/api/items/export/', {'format': 'jsonl'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], {'sku': 'LAMP-1', 'name': 'Lamp', 'description': 'Desk lamp', 'price': '20.00',
+                                   'category': 'Electronics', 'image': 'https://example.com/lamp.png',
+                                   'stock_quantity': 5, 'is_featured': False, 'is_active': True})
+        response = self.client.get('/api/items/export/')
+        self.assertIn('catalog.csv', response['Content-Disposition'])
+        feed = b''.join(response.streaming_content).decode()
+        self.assertTrue(feed.startswith('sku,name,description,price,category'))
+        self.assertEqual(self.upload(feed).data, {'created': 0, 'updated': 4, 'error_count': 0, 'errors': []})
+
+    def test_staff_only(self):
+        self.authenticate()
+        self.assertEqual(self.client.get('/api/items/export/').status_code, 403)
+        self.assertEqual(self.client.post('/api/items/import/').status_code, 403)
+
+    def test_commands(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'catalog.jsonl')
+        call_command('export_catalog', output=path, stdout=StringIO())
+        with open(path) as feed:
+            self.assertEqual(json.loads(feed.readline())['sku'], 'LAMP-1')
+        Item.objects.all().delete()
+        out = StringIO()
+        call_command('import_catalog', path, stdout=out, stderr=StringIO())
+        self.assertIn('Created 1, updated 0', out.getvalue())
+        self.assertTrue(Item.objects.filter(sku='LAMP-1', name='Lamp').exists())
+
+
+class OrderExportTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'testpass123'))
+        self.items = self.create_items(2)
+        for day, order_status in ((17, 'processing'), (18, 'processing'), (18, 'cancelled'), (19, 'processing')):
+            order = Order.objects.create(user=self.user, total_amount=Decimal('30.00'), shipping_address='1 Road',
+                                         order_status=order_status)
+            for item in self.items:
+                OrderItem.objects.create(order=order, item=item, quantity=day - 16, price=item.price)
+            Order.objects.filter(pk=order.pk).update(
+                created_at=timezone.make_aware(datetime.datetime(2026, 10, day, 12)))
+
+    def export(self, **params):
+        response = self.client.get('/api/orders/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_streams_a_days_orders_with_their_lines(self):
+        with CaptureQueriesContext(connection) as queries:
+            orders = [json.loads(line) for line in
+                      self.export(since='2026-10-18', until='2026-10-18', status='processing').splitlines()]
+        self.assertEqual(len(orders), 1)
+        self.assertEqual(orders[0]['username'], 'buyer')
+        self.assertEqual(orders[0]['items'], [
+            {'sku': item.sku, 'name': item.name, 'quantity': 2, 'price': '10.00'} for item in self.items
+        ])
+        # Authentication, the orders and one line item query
+        self.assertLessEqual(len(queries), 3)
+
+    def test_csv_has_a_row_per_line_item(self):
+        rows = list(csv.DictReader(StringIO(self.export(format='csv', since='2026-10-18T00:00:00'))))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual([row['order_status'] for row in rows[::2]], ['processing', 'cancelled', 'processing'])
+        self.assertEqual(rows[1]['item_sku'], self.items[1].sku)
+
+    def test_csv_keeps_orders_without_lines(self):
+        empty = Order.objects.create(user=self.user, total_amount=Decimal('0.00'), shipping_address='1 Road')
+        Order.objects.filter(pk=empty.pk).update(created_at=timezone.make_aware(datetime.datetime(2026, 10, 19, 13)))
+        rows = list(csv.DictReader(StringIO(self.export(format='csv', since='2026-10-19'))))
+        self.assertEqual(len(rows), 3)
+        [row] = [row for row in rows if row['order_number'] == empty.order_number]
+        self.assertEqual({row[f'item_{field}'] for field in ('sku', 'name', 'quantity', 'price')}, {''})
+
+    def test_line_items_load_per_chunk(self):
+        with CaptureQueriesContext(connection) as queries:
+            chunks = export_orders('jsonl', filter_orders(), chunk_size=3)
+            self.assertEqual(sum(chunk.count('\n') for chunk in chunks), 4)
+        self.assertEqual(len([query for query in queries if 'store_orderitem' in query['sql']]), 2)
+
+    def test_rejects_bad_filters_and_non_staff(self):
+        self.assertEqual(self.client.get('/api/orders/export/', {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/orders/export/', {'status': 'lost'}).status_code, 400)
+        self.authenticate()
+        self.assertEqual(self.client.get('/api/orders/export/').status_code, 403)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_orders', status=['processing'], format='csv', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 7)
+        with self.assertRaises(CommandError):
+            call_command('export_orders', payment_status=['lost'], stdout=StringIO())
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class CartBatchTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.create_items(4, stock_quantity=10)
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, item=self.items[0], quantity=2)
+        CartItem.objects.create(cart=self.cart, item=self.items[1], quantity=2)
+        self.authenticate()
+
+    def batch(self, *operations):
+        return self.client.post('/api/cart/batch/', {'operations': list(operations)}, format='json')
+
+    def quantities(self):
+        return dict(CartItem.objects.values_list('item_id', 'quantity'))
+
+    def test_operations_apply_in_one_request(self):
+        first, second, third, fourth = [item.pk for item in self.items]
+        response = self.batch(
+            {'op': 'add', 'item_id': first, 'quantity': 3},
+            {'op': 'remove', 'item_id': second},
+            {'op': 'set', 'item_id': third, 'quantity': 4},
+            {'op': 'add', 'item_id': third},
+            {'op': 'add', 'item_id': fourth, 'quantity': 2},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {first: 5, third: 5, fourth: 2})
+        self.assertEqual(response.data['total_items'], 12)
+
+    def test_increments_are_computed_by_the_database(self):
+        from .cart import upsert_quantities
+
+        stale = CartItem.objects.get(item=self.items[0])
+        CartItem.objects.filter(pk=stale.pk).update(quantity=7)
+        upsert_quantities(self.cart, {self.items[0].pk: 1}, increment=True)
+        self.assertEqual(self.quantities()[self.items[0].pk], 8)
+
+    def test_invalid_batch_is_rejected_as_a_whole(self):
+        response = self.batch(
+            {'op': 'set', 'item_id': self.items[2].pk, 'quantity': 1},
+            {'op': 'add', 'item_id': self.items[0].pk, 'quantity': 9},
+            {'op': 'add', 'item_id': 999},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertEqual(self.quantities(), {self.items[0].pk: 2, self.items[1].pk: 2})
+
+
+@override_settings(STORE_CACHE_ENABLED=False)
+class StockHoldTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.item = self.create_items(1, stock_quantity=5)[0]
+        self.other = User.objects.create_user(username='other', password='testpass123')
+
+    def add(self, user, quantity):
+        self.authenticate(user)
+        return self.client.post('/api/cart/add/', {'item_id': self.item.pk, 'quantity': quantity}, format='json')
+
+    def test_cart_lines_hold_stock_from_other_carts(self):
+        self.assertEqual(self.add(self.user, 3).status_code, 201)
+        self.assertEqual(self.add(self.other, 3).status_code, 400)
+        self.assertEqual(self.add(self.other, 2).status_code, 201)
+        # A cart's own hold doesn't count against it
+        self.assertEqual(self.client.put(f'/api/cart/update/{self.item.pk}/', {'quantity': 2},
+                                         format='json').status_code, 200)
+
+        response = self.client.get(f'/api/items/{self.item.pk}/')
+        self.assertEqual((response.data['available_quantity'], response.data['is_in_stock']), (0, False))
+        self.assertEqual(self.client.get('/api/items/').data['results'][0]['is_in_stock'], False)
+
+        self.authenticate()
+        self.assertEqual(self.client.delete(f'/api/cart/remove/{self.item.pk}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/items/{self.item.pk}/').data['available_quantity'], 3)
+
+    def test_checkout_respects_other_holds_and_releases_its_own(self):
+        from .models import ReservedStock, StockHold
+
+        self.add(self.other, 2)
+        Cart.objects.create(user=self.user)
+        # A line added before holds existed still can't take held stock
+        CartItem.objects.create(cart=Cart.objects.get(user=self.user), item=self.item, quantity=4)
+        self.authenticate()
+        response = self.client.post('/api/orders/create/', {'shipping_address': '1 Test Street'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['shortages'][0]['available'], 3)
+
+        self.authenticate(self.other)
+        response = self.client.post('/api/orders/create/', {'shipping_address': '1 Test Street'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(StockHold.objects.exists())
+        self.assertEqual(sum(ReservedStock.objects.values_list('quantity', flat=True)), 0)
+        self.assertEqual(Item.objects.get(pk=self.item.pk).available_quantity, 3)
+
+    def test_expired_holds_stop_counting_before_the_sweep(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import StockHold
+
+        self.add(self.user, 3)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.client.get(f'/api/items/{self.item.pk}/')
+        self.assertEqual((response.data['available_quantity'], response.data['is_in_stock']), (5, True))
+        self.assertEqual(Item.objects.get(pk=self.item.pk).available_quantity, 5)
+
+        # Other carts can take the stock, and the lapsed cart can't take it back
+        self.assertEqual(self.add(self.other, 5).status_code, 201)
+        self.assertEqual(self.add(self.user, 1).status_code, 400)
+        self.authenticate(self.other)
+        response = self.client.post('/api/orders/create/', {'shipping_address': '1 Test Street'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_sweeper_releases_expired_holds_and_repairs_drift(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ReservedStock, StockHold
+
+        self.add(self.user, 2)
+        self.add(self.other, 1)
+        StockHold.objects.filter(cart__user=self.user).update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+        call_command('sweep_stock_holds', stdout=out)
+        self.assertIn('Released 1 expired hold(s)', out.getvalue())
+        self.assertEqual(Item.objects.get(pk=self.item.pk).available_quantity, 4)
+
+        ReservedStock.objects.update(quantity=5)
+        call_command('sweep_stock_holds', '--reconcile', stdout=out)
+        self.assertIn('Reconciled reserved stock of 1 drifted item(s)', out.getvalue())
+        self.assertEqual(Item.objects.get(pk=self.item.pk).available_quantity, 4)
+
+
+class WishlistTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.create_items(5)
+        self.authenticate()
+
+    def test_batch_changes_skip_duplicates_and_unknown_ids(self):
+        first, second, third = [item.pk for item in self.items[:3]]
+        response = self.client.post('/api/wishlist/batch/', {'add': [first, second, second, 999]}, format='json')
+        self.assertEqual(response.data, {'added': [first, second], 'removed': [], 'not_found': [999]})
+        response = self.client.post('/api/wishlist/batch/', {'add': [first, third], 'remove': [second, 998]},
+                                    format='json')
+        self.assertEqual(response.data, {'added': [third], 'removed': [second], 'not_found': []})
+        self.assertEqual(self.client.post('/api/wishlist/add/', {'item_id': first}, format='json').status_code, 200)
+        self.assertEqual(self.client.post('/api/wishlist/batch/', {'add': [first], 'remove': [first]},
+                                          format='json').status_code, 400)
+
+    def test_ids_are_cached_until_the_wishlist_changes(self):
+        self.client.post('/api/wishlist/batch/', {'add': [self.items[0].pk]}, format='json')
+        response = self.client.get('/api/wishlist/ids/')
+        self.assertEqual(response.data['item_ids'], [self.items[0].pk])
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):  # the user comes from the cache too
+            response = self.client.get('/api/wishlist/ids/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Changes through the related manager invalidate too
+        Wishlist.objects.get(user=self.user).items.add(self.items[1])
+        response = self.client.get('/api/wishlist/ids/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['item_ids'], [self.items[0].pk, self.items[1].pk])
+
+    def test_cached_ids_are_dropped_on_commit(self):
+        from .wishlist import apply_wishlist_changes, wishlist_item_ids
+
+        wishlist = Wishlist.objects.create(user=self.user)
+        self.items[1].is_active = False
+        self.items[1].save()
+        self.assertEqual(wishlist_item_ids(self.user.pk)[0], [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertNumQueries(3):  # the INSERT and its savepoint
+                changes = apply_wishlist_changes(wishlist, add=[self.items[0].pk])
+        self.assertEqual(changes, {'added': [self.items[0].pk], 'removed': [], 'not_found': []})
+        self.assertEqual(wishlist_item_ids(self.user.pk)[0], [])
+        callbacks[0]()
+        self.assertEqual(wishlist_item_ids(self.user.pk)[0], [self.items[0].pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            changes = apply_wishlist_changes(wishlist, add=[self.items[0].pk, self.items[1].pk],
+                                             remove=[self.items[0].pk, self.items[2].pk])
+        self.assertEqual(changes, {'added': [], 'removed': [self.items[0].pk], 'not_found': [self.items[1].pk]})
+        self.assertEqual(wishlist_item_ids(self.user.pk)[0], [])
+
+    def test_items_are_paginated(self):
+        items = self.items + self.create_items(20)
+        self.client.post('/api/wishlist/batch/', {'add': [item.pk for item in items]}, format='json')
+        response = self.client.get('/api/wishlist/items/?fields=card')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'price', 'image', 'is_in_stock'})
+
+
+class UserCacheTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.item = self.create_items(1)[0]
+        self.authenticate()
+
+    def test_user_is_read_from_the_cache(self):
+        self.assertEqual(self.client.get('/api/wishlist/ids/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/wishlist/ids/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_and_profile_changes_invalidate_the_cache(self):
+        self.client.get('/api/wishlist/ids/')
+        UserProfile.objects.create(user=self.user, phone='555-0100')
+        with self.assertNumQueries(1):
+            self.client.get('/api/wishlist/ids/')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/wishlist/ids/').status_code, 401)
+
+    def test_cart_id_is_looked_up_once(self):
+        self.client.post('/api/cart/add/', {'item_id': self.item.pk}, format='json')
+        with self.assertNumQueries(9):  # none for the user or the cart
+            response = self.client.post('/api/cart/add/', {'item_id': self.item.pk}, format='json')
+        self.assertEqual(response.data['quantity'], 2)
+
+        # A deleted cart's id is forgotten
+        Cart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.delete(f'/api/cart/remove/{self.item.pk}/').status_code, 404)
+        response = self.client.post('/api/cart/add/', {'item_id': self.item.pk}, format='json')
+        self.assertEqual(response.data['quantity'], 1)
+
+    def test_reads_recover_from_an_id_cached_elsewhere(self):
+        # Another worker's cache still has the ids after the rows are deleted
+        self.client.get('/api/cart/')
+        self.client.get('/api/wishlist/')
+        stale = {key: cache.get(key) for key in (f'store:cart_id:{self.user.pk}', f'store:wishlist_id:{self.user.pk}')}
+        Cart.objects.filter(user=self.user).delete()
+        Wishlist.objects.filter(user=self.user).delete()
+        cache.set_many(stale)
+
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(FAST_SERIALIZERS=fast):
+                response = self.client.get('/api/cart/')
+                self.assertEqual((response.status_code, response.data['total_items']), (200, 0))
+                cache.set_many(stale)
+        response = self.client.get('/api/wishlist/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['id'], stale[f'store:wishlist_id:{self.user.pk}'])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class StaleOwnedIdWriteTests(APITransactionTestCase):
+    """Cart requests by the id of a cart deleted since, as another worker's cache may still have it.
+
+    Writes by that id fail their foreign keys, on SQLite only at commit.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='testpass123')
+        self.item = Item.objects.create(name='Atlas', price=Decimal('12.00'), stock_quantity=10,
+                                        category=Category.objects.create(name='Books'),
+                                        image='https://example.com/a.png')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.client.post('/api/cart/add/', {'item_id': self.item.pk}, format='json')
+        self.key = f'store:cart_id:{self.user.pk}'
+        self.stale = cache.get(self.key)
+
+    def replace_cart(self, quantity=None):
+        """Delete the cart (and recreate it holding ``quantity``), then put the old id back in the cache."""
+        Cart.objects.filter(user=self.user).delete()
+        if quantity is not None:
+            CartItem.objects.create(cart=Cart.objects.create(user=self.user), item=self.item, quantity=quantity)
+        cache.set(self.key, self.stale)
+
+    def test_cart_writes_recover_from_an_id_cached_elsewhere(self):
+        for url, data in (('/api/cart/add/', {'item_id': self.item.pk}),
+                          ('/api/cart/batch/', {'operations': [{'op': 'add', 'item_id': self.item.pk, 'quantity': 1}]})):
+            with self.subTest(url=url):
+                self.replace_cart()
+                response = self.client.post(url, data, format='json')
+                self.assertIn(response.status_code, (200, 201))
+                self.assertNotEqual(cache.get(self.key), self.stale)
+                self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 1)
+
+    def test_cart_lookups_recover_from_an_id_cached_elsewhere(self):
+        self.replace_cart(quantity=1)
+        response = self.client.put(f'/api/cart/update/{self.item.pk}/', {'quantity': 3}, format='json')
+        self.assertEqual((response.status_code, response.data['quantity']), (200, 3))
+
+        self.replace_cart(quantity=1)
+        self.assertEqual(self.client.delete(f'/api/cart/remove/{self.item.pk}/').status_code, 200)
+        self.assertFalse(CartItem.objects.exists())
+
+        self.replace_cart(quantity=1)
+        self.assertEqual(self.client.delete('/api/cart/clear/').data['message'], 'Cart cleared')
+        self.assertFalse(CartItem.objects.exists())
+
+        self.replace_cart(quantity=2)
+        response = self.client.post('/api/orders/create/', {'shipping_address': '1 Test Street'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Item.objects.get(pk=self.item.pk).stock_quantity, 8)
+
+        # Gone for good: the usual answers
+        self.replace_cart()
+        self.assertEqual(self.client.delete(f'/api/cart/remove/{self.item.pk}/').status_code, 404)
+        self.replace_cart()
+        self.assertEqual(self.client.delete('/api/cart/clear/').data['message'], 'Cart is already empty')
+        self.replace_cart()
+        response = self.client.post('/api/orders/create/', {'shipping_address': '1 Test Street'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class BenchmarkReportTests(StoreTestCase):
+    def test_summary_percentiles(self):
+        from .benchmarks.runner import Recorder
+
+        recorder = Recorder()
+        for millis in range(1, 101):
+            recorder.record('item_list', millis / 1000, 200, 2)
+        recorder.record('item_list', 0.0, 0, None)
+        stats = recorder.report(elapsed=10)['scenarios']['item_list']
+        self.assertEqual((stats['requests'], stats['errors']), (101, 1))
+        # The failed request doesn't drag the latencies down
+        self.assertEqual(stats['latency_ms']['mean'], 50.5)
+        self.assertEqual(stats['latency_ms']['p50'], 51.0)
+        self.assertEqual(stats['latency_ms']['p99'], 99.0)
+        self.assertEqual(stats['queries_per_request'], 2.0)
+
+    def test_compare_flags_regressions(self):
+        from .benchmarks.runner import compare_reports
+
+        def report(p95, rps):
+            latency = {'p50': 10.0, 'p95': p95, 'p99': 40.0}
+            return {'scenarios': {'cart_view': {'latency_ms': latency, 'throughput_rps': rps,
+                                                'queries_per_request': 3.0}}}
+
+        rows = {metric: regressed for name, metric, old, new, change, regressed
+                in compare_reports(report(20.0, 100.0), report(30.0, 95.0), threshold=15)}
+        self.assertEqual(rows, {'p50': False, 'p95': True, 'p99': False, 'rps': False, 'queries': False})
+
+    def test_every_route_has_a_scenario(self):
+        from rest_framework.permissions import IsAdminUser
+        from .benchmarks.scenarios import SCENARIOS
+        from .urls import urlpatterns
+
+        def staff_only(pattern):
+            return IsAdminUser in getattr(getattr(pattern.callback, 'cls', None), 'permission_classes', ())
+
+        covered = {scenario.route for scenario in SCENARIOS}
+        routes = {pattern.name for pattern in urlpatterns
+                  if pattern.name and pattern.name != 'api-root' and not staff_only(pattern)}
+        self.assertEqual(routes - covered, set())
+        # Benchmark users aren't staff
+        self.assertEqual({pattern.name for pattern in urlpatterns if staff_only(pattern)} & covered, set())
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, STORE_CACHE_ENABLED=False)
+class CategoryCountTests(StoreTestCase):
+    def counts(self):
+        response = self.client.get('/api/categories/')
+        return {row['name']: row['items_count'] for row in response.data['results']}
+
+    def test_list_counts_in_one_aggregate(self):
+        books = Category.objects.create(name='Books')
+        for index in range(5):
+            Category.objects.create(name=f'Empty {index}')
+        self.create_items(3)
+        self.create_items(2, category=books, is_active=False)
+        with self.assertMaxQueries(2):
+            counts = self.counts()
+        self.assertEqual((counts['Electronics'], counts['Books'], counts['Empty 0']), (3, 0, 0))
+
+    def test_materialized_counter_follows_item_changes(self):
+        books = Category.objects.create(name='Books')
+        first, second, third = self.create_items(3)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.active_items_count, 3)
+
+        item = Item.objects.get(pk=first.pk)
+        item.is_active = False
+        item.save()
+        item.save()
+        item = Item.objects.get(pk=second.pk)
+        item.category = books
+        item.save()
+        Item.objects.get(pk=third.pk).delete()
+        Item.objects.get(pk=first.pk).delete()
+
+        with self.settings(CATEGORY_ITEMS_COUNT='materialized'):
+            self.assertEqual(self.counts(), {'Books': 1, 'Electronics': 0})
+            # Served from the column, not counted from the items table
+            Category.objects.filter(pk=books.pk).update(active_items_count=7)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.counts(), {'Books': 7, 'Electronics': 0})
+                self.assertEqual(self.client.get(f'/api/categories/{books.pk}/').data['items_count'], 7)
+            self.assertFalse(any('store_item' in query['sql'] for query in queries))
+        self.assertEqual(self.counts()['Books'], 1)
+
+    def test_reconcile_repairs_drift(self):
+        self.create_items(4)
+        Item.objects.filter(name='Item 0').update(is_active=False)
+        Category.objects.filter(pk=self.category.pk).update(active_items_count=99)
+        out = StringIO()
+        call_command('reconcile_category_counts', stdout=out)
+        self.assertIn('Reconciled 1', out.getvalue())
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.active_items_count, 3)
+
+
+@override_settings(STORE_CACHE_ENABLED=False)
+class FastSerializerTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.create_items(30, price=Decimal('12.50'))
+        Item.objects.filter(pk=self.items[0].pk).update(stock_quantity=0, is_featured=True)
+        self.user.first_name = 'Asha'
+        self.user.save()
+        order = Order.objects.create(user=self.user, total_amount=Decimal('37.50'), shipping_address='1 Road',
+                                     order_status='shipped')
+        OrderItem.objects.create(order=order, item=self.items[1], quantity=3, price=Decimal('12.50'))
+        Order.objects.create(user=self.user, total_amount=Decimal('0.00'), shipping_address='2 Road')
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, item=self.items[2], quantity=2)
+        self.authenticate()
+
+    def assertSameOutput(self, path):
+        with self.settings(FAST_SERIALIZERS=False):
+            expected = self.client.get(path)
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+        return response
+
+    def test_reads_match_drf_serializers(self):
+        for path in ['/api/items/', '/api/items/?page=2', '/api/items/?ordering=-price',
+                     '/api/items/?search=Item', '/api/items/featured/', '/api/orders/', '/api/cart/']:
+            with self.subTest(path=path):
+                self.assertSameOutput(path)
+
+    def test_keyset_pages_match(self):
+        response = self.assertSameOutput('/api/items/?pagination=cursor')
+        self.assertSameOutput(response.json()['next'])
+
+    def test_empty_cart_is_created(self):
+        CartItem.objects.all().delete()
+        Cart.objects.all().delete()
+        # Within the view's budget, created cart and all
+        with self.settings(QUERY_BUDGET_STRICT=True):
+            self.assertEqual(self.client.get('/api/cart/').json()['total_items'], 0)
+        self.assertTrue(Cart.objects.filter(user=self.user).exists())
+
+    def test_writes_use_drf_serializers(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin', password='adminpass123'))
+        response = self.client.post('/api/items/', {
+            'name': 'Lamp', 'description': 'Desk lamp', 'price': '19.99', 'category': self.category.pk,
+            'image': 'https://example.com/lamp.png', 'stock_quantity': 3,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['price'], '19.99')
+
+    def test_non_column_fields_must_be_declared(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from .fastserializers import FastSerializer
+        from .serializers import ItemSerializer
+
+        class Incomplete(FastSerializer):
+            serializer_class = ItemSerializer
+
+        with self.assertRaises(ImproperlyConfigured):
+            Incomplete()
+
+    def test_compiled_selections_are_bounded(self):
+        from .fastserializers import FastItemSerializer
+        from .sparse import Fieldset, parse_names
+
+        self.client.get('/api/items/?fields=name,id')
+        self.client.get('/api/items/?fields=id,name')
+        self.assertIn(Fieldset(parse_names('id,name')).key, FastItemSerializer._compiled)
+        with mock.patch('store.fastserializers.COMPILED_CACHE_SIZE', 3):
+            for fields in ['id', 'name', 'price', 'image', 'id,name']:
+                self.client.get(f'/api/items/?fields={fields}')
+            self.assertEqual(len(FastItemSerializer._compiled), 3)
+            self.assertEqual(list(FastItemSerializer._compiled)[-1], Fieldset(parse_names('name,id')).key)
+
+
+@override_settings(STORE_CACHE_ENABLED=False)
+class SparseFieldsetTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.create_items(5)
+        order = Order.objects.create(user=self.user, total_amount=Decimal('10.00'), shipping_address='1 Road')
+        OrderItem.objects.create(order=order, item=self.items[0], quantity=1, price=Decimal('10.00'))
+        Wishlist.objects.create(user=self.user).items.add(*self.items)
+        self.authenticate()
+
+    def select_sql(self, path):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+
+    def test_card_preset_trims_payload_and_columns(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), self.settings(FAST_SERIALIZERS=fast):
+                data, queries = self.select_sql('/api/items/?fields=card')
+                self.assertEqual(set(data['results'][0]), {'id', 'name', 'price', 'image', 'is_in_stock'})
+                self.assertTrue(data['results'][0]['is_in_stock'])
+                self.assertNotIn('"description"', queries[-1])
+                self.assertNotIn('store_category', queries[-1])
+
+    def test_fields_and_exclude_match_full_output(self):
+        full = self.client.get('/api/orders/').json()['results'][0]
+        for fast in (True, False):
+            with self.subTest(fast=fast), self.settings(FAST_SERIALIZERS=fast):
+                data = self.client.get('/api/orders/?fields=id,user_name,items.item_name').json()['results'][0]
+                self.assertEqual(data, {'id': full['id'], 'user_name': full['user_name'],
+                                        'items': [{'item_name': full['items'][0]['item_name']}]})
+                data, queries = self.select_sql('/api/orders/?exclude=items,notes')
+                self.assertEqual(data['results'][0], {k: v for k, v in full.items() if k not in ('items', 'notes')})
+                self.assertFalse(any('store_orderitem' in query for query in queries))
+
+    def test_fields_with_keyset_pages_on_meta_ordering(self):
+        for _ in range(24):
+            Order.objects.create(user=self.user, total_amount=Decimal('10.00'), shipping_address='1 Road')
+        expected = list(Order.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+        for fast in (True, False):
+            with self.subTest(fast=fast), self.settings(FAST_SERIALIZERS=fast):
+                first = self.client.get('/api/orders/?pagination=cursor&fields=id,order_number')
+                self.assertEqual(first.status_code, 200)
+                self.assertEqual(set(first.data['results'][0]), {'id', 'order_number'})
+                second = self.client.get(first.data['next'])
+                self.assertEqual([row['id'] for row in first.data['results'] + second.data['results']], expected)
+
+    def test_nested_selection_narrows_prefetch(self):
+        data, queries = self.select_sql('/api/wishlist/?fields=card')
+        self.assertEqual(set(data), {'id', 'items'})
+        self.assertEqual(set(data['items'][0]), {'id', 'name', 'price', 'image', 'is_in_stock'})
+        self.assertNotIn('"description"', queries[-1])
+        data = self.client.get('/api/categories/?fields=card').json()['results'][0]
+        self.assertEqual(data, {'id': self.category.pk, 'name': 'Electronics', 'image': '', 'items_count': 5})
+        data = self.client.get('/api/cart/?fields=summary').json()
+        self.assertEqual(set(data), {'id', 'total_price', 'total_items'})
+
+    def test_unknown_fields_are_rejected(self):
+        for path in ['/api/items/?fields=id,secret', '/api/items/?exclude=nope', '/api/orders/?fields=id.name']:
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 400)
+
+
+@override_settings(STORE_CACHE_ENABLED=False, METRICS_TOKEN='scrape-me')
+class RequestMetricsTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        from .metrics import registry
+
+        registry.reset()
+        self.create_items(3)
+
+    def test_server_timing_header(self):
+        self.authenticate()
+        response = self.client.get('/api/items/')
+        timing = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'auth', 'serialize', 'total'})
+        self.assertRegex(timing['db'], r'^dur=[\d.]+;desc="3 queries"$')
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/items/')
+        self.client.get('/api/items/')
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 403)
+        self.assertEqual(self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        response = self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('store_requests_total{view="item_list",method="GET",status="200"} 2', text)
+        self.assertIn('store_request_duration_seconds_count{view="item_list",method="GET"} 2', text)
+        self.assertIn('store_db_queries_bucket{view="item_list",method="GET",le="2"} 2', text)
+        self.assertIn('store_serialize_duration_seconds_bucket{view="item_list",method="GET",le="+Inf"} 2', text)
+
+
+class IndexAdvisorTests(StoreTestCase):
+    def test_explain_finds_scans_and_indexes(self):
+        from .indexadvisor import explain
+
+        self.create_items(3)
+        query = Item.objects.filter(stock_quantity=5).query
+        self.assertEqual(explain(*query.sql_with_params()).scans, ['store_item'])
+        query = Item.objects.filter(is_active=True).order_by('-created_at', '-id')[:20].query
+        plan = explain(*query.sql_with_params())
+        self.assertEqual(plan.scans, [])
+        self.assertIn('item_active_recent', plan.indexes)
+
+    def test_command_replays_read_paths(self):
+        self.create_items(3)
+        Order.objects.create(user=self.user, total_amount=Decimal('10.00'), shipping_address='1 Road')
+        out = StringIO()
+        call_command('index_advisor', '--allow-scan', 'store_category', stdout=out)
+        self.assertRegex(out.getvalue(), r'Explained \d+ distinct queries')
+        self.assertIn('order_user_recent', out.getvalue())
+        # The replay runs in a rolled back transaction
+        self.assertFalse(Cart.objects.exists())
+
+
+@override_settings(REPLICA_DATABASES=['replica_1', 'replica_2'])
+class ReplicaRoutingTests(StoreTestCase):
+    def read_alias(self, model, method='GET', user=None):
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import RequestFactory
+        from .routers import ReplicaRouter, RequestState, _state
+
+        request = getattr(RequestFactory(), method.lower())('/api/')
+        request.user = user or AnonymousUser()
+        token = _state.set(RequestState(request))
+        try:
+            # TestCase wraps every test in a transaction, which pins reads
+            with mock.patch.object(connection, 'in_atomic_block', False):
+                return ReplicaRouter().db_for_read(model)
+        finally:
+            _state.reset(token)
+
+    def test_safe_catalog_reads_go_to_replicas(self):
+        from .routers import ReplicaRouter
+
+        self.assertIn(self.read_alias(Item), ('replica_1', 'replica_2'))
+        self.assertIn(self.read_alias(Order, user=self.user), ('replica_1', 'replica_2'))
+        self.assertEqual(self.read_alias(Cart, user=self.user), 'default')
+        self.assertEqual(self.read_alias(Item, method='POST'), 'default')
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(ReplicaRouter().db_for_read(Item), 'default')
+
+    def test_writers_stick_to_the_primary(self):
+        from .routers import pin_key
+
+        self.authenticate()
+        response = self.client.post('/api/cart/add/', {'item_id': self.create_items(1)[0].pk, 'quantity': 1},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(cache.get(pin_key(self.user.pk)))
+        self.assertEqual(self.read_alias(Order, user=self.user), 'default')
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.assertIn(self.read_alias(Order, user=other), ('replica_1', 'replica_2'))
+
+    def test_cache_fills_read_the_primary_after_a_catalog_write(self):
+        from .routers import ReplicaRouter, RequestState, _state, pin_cache_fill
+
+        def fill_alias():
+            from django.test import RequestFactory
+
+            token = _state.set(RequestState(RequestFactory().get('/api/items/')))
+            try:
+                pin_cache_fill()
+                with mock.patch.object(connection, 'in_atomic_block', False):
+                    return ReplicaRouter().db_for_read(Item)
+            finally:
+                _state.reset(token)
+
+        # Forget setUp's category write
+        cache.clear()
+        self.assertIn(fill_alias(), ('replica_1', 'replica_2'))
+        self.create_items(1)
+        self.assertEqual(fill_alias(), 'default')
+        cache.clear()
+        self.assertIn(fill_alias(), ('replica_1', 'replica_2'))
+
+    def test_per_process_cache_is_flagged(self):
+        from .routers import check_replica_cache
+
+        self.assertEqual([warning.id for warning in check_replica_cache(None)], ['store.W001'])
+        with self.settings(REPLICA_DATABASES=[]):
+            self.assertEqual(check_replica_cache(None), [])
+
+
+class ReplicaSyncTests(TransactionTestCase):
+    def test_reads_through_a_synced_replica(self):
+        import sqlite3
+        from django.db import connections
+        from django.test import RequestFactory
+        from .management.commands.sync_replicas import copy_database
+        from .routers import RequestState, _state
+
+        category = Category.objects.create(name='Books')
+        Item.objects.create(name='Atlas', price=Decimal('12.00'), category=category,
+                            image='https://example.com/a.png')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        primary, replica = (os.path.join(directory.name, name) for name in ('primary.sqlite3', 'replica.sqlite3'))
+
+        def sync():
+            # The test database lives in memory; snapshot it to a file primary
+            snapshot = sqlite3.connect(primary)
+            connection.connection.backup(snapshot)
+            snapshot.close()
+            copy_database(primary, replica)
+            # Like a new request's connection, which opens the new file
+            connections['replica_1'].close()
+
+        connections.settings['replica_1'] = {**connection.settings_dict, 'NAME': f'file:{replica}?mode=ro',
+                                             'TEST': {}}
+        self.addCleanup(connections.settings.pop, 'replica_1')
+        self.addCleanup(connections.__delitem__, 'replica_1')
+        self.addCleanup(lambda: connections['replica_1'].close())
+        token = _state.set(RequestState(RequestFactory().get('/api/items/')))
+        self.addCleanup(_state.reset, token)
+        with self.settings(REPLICA_DATABASES=['replica_1']):
+            sync()
+            items = Item.objects.select_related('category')
+            self.assertEqual(items.db, 'replica_1')
+            self.assertEqual([(item.name, item.category.name) for item in items], [('Atlas', 'Books')])
+            # Writes reach the replica with the next sync
+            Item.objects.update(name='Atlas 2')
+            self.assertEqual(list(items.values_list('name', flat=True)), ['Atlas'])
+            sync()
+            self.assertEqual(list(items.values_list('name', flat=True)), ['Atlas 2'])
+
+
+class SQLiteBackendTests(StoreTestCase):
+    def file_connection(self):
+        import os
+        import tempfile
+        from .backends.sqlite3.base import DatabaseWrapper
+
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(lambda: [os.remove(name) for name in (path, f'{path}-wal', f'{path}-shm')
+                                 if os.path.exists(name)])
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': path, 'TEST': {}}, alias='tuned')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_connections_use_wal_and_pragmas(self):
+        wrapper = self.file_connection()
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_transactions_begin_immediate_and_hold_the_write_lock(self):
+        from .backends.sqlite3.base import write_lock
+
+        wrapper = self.file_connection()
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with wrapper.execute_wrapper(record):
+            # What transaction.atomic() does on entry
+            wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+            self.assertIn('BEGIN IMMEDIATE', statements)
+            self.assertTrue(write_lock(wrapper.settings_dict['NAME']).locked())
+            wrapper.commit()
+            wrapper.set_autocommit(True)
+        self.assertFalse(write_lock(wrapper.settings_dict['NAME']).locked())
+
+
+@override_settings(STORE_CACHE_ENABLED=False)
+class AsyncViewTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        from .async_views import select_async_views
+        from .urls import urlpatterns
+
+        self.views = {pattern.name: pattern.callback for pattern in select_async_views(urlpatterns, names=['*'])
+                      if pattern.name}
+        self.items = self.create_items(25, is_featured=True)
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def call_async(self, name, path, **kwargs):
+        from django.test import AsyncRequestFactory
+
+        request = AsyncRequestFactory().get(path, headers={'Authorization': f'Bearer {self.token}'})
+        response = await self.views[name](request, **kwargs)
+        if hasattr(response, 'render'):
+            # DRF responses from the sync fallback are rendered by the handler
+            response.render()
+        return response
+
+    async def test_async_responses_match_sync(self):
+        from asgiref.sync import sync_to_async
+
+        order = await sync_to_async(Order.objects.create)(user=self.user, total_amount=Decimal('10.00'),
+                                                          shipping_address='1 Road')
+        cases = [
+            ('category_list', '/api/categories/', {}),
+            ('item_list', '/api/items/?page=2', {}),
+            ('item_list', f'/api/items/?category={self.category.pk}&is_featured=true', {}),
+            ('item_list', '/api/items/?search=Item', {}),
+            ('item_detail', f'/api/items/{self.items[0].pk}/', {'pk': self.items[0].pk}),
+            ('featured_items', '/api/items/featured/', {}),
+            ('cart', '/api/cart/', {}),
+            ('order_list', '/api/orders/', {}),
+            ('order_detail', f'/api/orders/{order.pk}/', {'pk': order.pk}),
+            ('order_detail', '/api/orders/999/', {'pk': 999}),
+        ]
+        for name, path, kwargs in cases:
+            with self.subTest(path=path):
+                response = await self.call_async(name, path, **kwargs)
+                expected = await sync_to_async(self.client.get)(path, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_shares_the_catalog_cache(self):
+        with self.settings(STORE_CACHE_ENABLED=True):
+            path = f'/api/items/{self.items[0].pk}/'
+            first = await self.call_async('item_detail', path, pk=self.items[0].pk)
+            second = await self.call_async('item_detail', path, pk=self.items[0].pk)
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(json.loads(first.content), json.loads(second.content))
+
+    async def test_cart_requires_authentication(self):
+        from django.test import AsyncRequestFactory
+
+        response = await self.views['cart'](AsyncRequestFactory().get('/api/cart/'))
+        self.assertEqual(response.status_code, 401)
+        response = await self.views['cart'](AsyncRequestFactory().get('/api/cart/', headers={'Authorization': 'Bearer x'}))
+        self.assertEqual(response.status_code, 401)
+
+    def test_routes_are_selected_individually(self):
+        from .async_views import select_async_views
+        from .urls import urlpatterns
+        from .views import ItemListView
+
+        patterns = {pattern.name: pattern.callback for pattern in select_async_views(urlpatterns, names=['item_list'])
+                    if pattern.name}
+        self.assertTrue(asyncio.iscoroutinefunction(patterns['item_list']))
+        self.assertFalse(asyncio.iscoroutinefunction(patterns['item_detail']))
+        self.assertEqual(patterns['item_list'].query_budget, ItemListView.query_budget)
+
+
+class DataGeneratorTests(StoreTestCase):
+    def generate(self, seed, prefix='gen_'):
+        call_command('generate_store_data', categories=5, items=300, users=20, orders=40, seed=seed,
+                     chunk_size=64, user_prefix=prefix, stdout=StringIO())
+        return list(Item.objects.filter(name__regex=r' \d+$').order_by('id').values_list('name', 'price'))
+
+    def test_generates_requested_volumes(self):
+        self.generate(seed=7)
+        self.assertEqual(Item.objects.count(), 300)
+        self.assertEqual(User.objects.filter(username__startswith='gen_').count(), 20)
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertFalse(Order.objects.filter(items__isnull=True).exists())
+        # Every user has at least one order to view
+        self.assertFalse(User.objects.filter(username__startswith='gen_', orders__isnull=True).exists())
+        self.assertTrue(self.client.login(username='gen_0', password='password123'))
+        # Category sizes are long-tailed: the first category is the biggest
+        sizes = [category.items.count() for category in Category.objects.filter(name__endswith=' 1').order_by('id')]
+        self.assertEqual(max(sizes), sizes[0])
+
+    def test_backends_without_returned_ids(self):
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.generate(seed=5)
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertFalse(Order.objects.filter(items__isnull=True).exists())
+
+    def test_same_seed_same_data(self):
+        first = self.generate(seed=3)
+        Order.objects.all().delete()
+        Item.objects.all().delete()
+        Category.objects.exclude(name='Electronics').delete()
+        self.assertEqual(self.generate(seed=3, prefix='again_'), first)
+
+    def test_refuses_existing_users(self):
+        User.objects.create_user(username='shopper_0', password='password123')
+        with self.assertRaises(CommandError):
+            call_command('generate_store_data', items=10, stdout=StringIO())
+
+    def test_demo_catalog_is_idempotent(self):
+        call_command('generate_store_data', demo=True, stdout=StringIO())
+        count = Item.objects.count()
+        call_command('generate_store_data', demo=True, stdout=StringIO())
+        self.assertEqual(Item.objects.count(), count)
+        self.assertEqual(count, 13)
@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 
 from . import views
+from .async_views import select_async_views
 
 # Create router for viewsets (if needed in future)
 router = DefaultRouter()
@@ -22,6 +23,8 @@ urlpatterns = [
     path('items/', views.ItemListView.as_view(), name='item_list'),
     path('items/<int:pk>/', views.ItemDetailView.as_view(), name='item_detail'),
     path('items/featured/', views.FeaturedItemsView.as_view(), name='featured_items'),
+    path('items/import/', views.import_catalog, name='import_catalog'),
+    path('items/export/', views.export_catalog, name='export_catalog'),
     
     # Cart URLs
     path('cart/', views.CartView.as_view(), name='cart'),
@@ -29,11 +32,15 @@ urlpatterns = [
     path('cart/update/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('cart/clear/', views.clear_cart, name='clear_cart'),
+    path('cart/batch/', views.batch_update_cart, name='batch_update_cart'),
     
     # Wishlist URLs
     path('wishlist/', views.WishlistView.as_view(), name='wishlist'),
     path('wishlist/add/', views.add_to_wishlist, name='add_to_wishlist'),
     path('wishlist/remove/<int:item_id>/', views.remove_from_wishlist, name='remove_from_wishlist'),
+    path('wishlist/ids/', views.wishlist_ids, name='wishlist_ids'),
+    path('wishlist/items/', views.WishlistItemsView.as_view(), name='wishlist_items'),
+    path('wishlist/batch/', views.batch_update_wishlist, name='batch_update_wishlist'),
     
     # User Profile URLs
     path('profile/', views.UserProfileDetailView.as_view(), name='user_profile_detail'),
@@ -42,8 +49,14 @@ urlpatterns = [
     path('orders/', views.OrderListView.as_view(), name='order_list'),
     path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order_detail'),
     path('orders/create/', views.create_order, name='create_order'),
+    path('orders/summary/', views.order_summary, name='order_summary'),
+    path('orders/export/', views.export_order_feed, name='export_orders'),
     path('orders/<int:order_id>/payment/', views.simulate_payment, name='simulate_payment'),
+    path('orders/<int:order_id>/payment/status/', views.payment_status, name='payment_status'),
 ]
 
 # Include router URLs
 urlpatterns += router.urls
+
+# Serve the routes named in ASYNC_VIEWS from their async implementations
+urlpatterns = select_async_views(urlpatterns)
@@ -0,0 +1,127 @@
+"""Per-user lookups kept in the store cache.
+
+``CachedJWTAuthentication`` reads the authenticated ``User`` from here
+instead of the database. Entries are keyed by the user id and a per-user
+generation; changes to the user or their profile bump the generation (see
+``signals.py``), so a request that read the user just before the change
+can't put the stale copy back. Entries expire after
+``AUTH_USER_CACHE_TIMEOUT`` seconds regardless, which bounds staleness when
+each worker has its own local-memory cache.
+
+The ids of a user's cart and wishlist never change once created, so
+``cart_id_for()`` and ``wishlist_id_for()`` cache them too, and memoize them
+on the user object for the rest of the request. The rows can still be
+deleted (in the admin, say) while another worker's cache holds their id, so
+the ids expire after ``OWNED_ID_TIMEOUT`` and ``with_owned_id()`` retries
+once with a fresh id when the cached one turns out to be gone.
+"""
+import time
+
+from django.conf import settings
+from django.db import IntegrityError
+
+from .cache import get_cache
+from .models import Cart, Wishlist
+
+# Bounds how long a worker that missed a delete keeps the old id
+OWNED_ID_TIMEOUT = 5 * 60
+
+
+def user_cache_timeout():
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+
+
+def generation_key(user_id):
+    return f'store:auth_generation:{user_id}'
+
+
+def user_generation(user_id):
+    cache = get_cache()
+    generation = cache.get(generation_key(user_id))
+    if generation is None:
+        # Seeded from the clock so an evicted counter never reuses old keys
+        cache.add(generation_key(user_id), time.time_ns() // 1000, None)
+        generation = cache.get(generation_key(user_id))
+    return generation
+
+
+def user_key(user_id, generation):
+    return f'store:auth_user:{user_id}:{generation}'
+
+
+def cached_user(user_id):
+    """``(cached user or None, generation)``; pass the generation to ``cache_user()`` on a miss."""
+    if user_cache_timeout() <= 0:
+        return None, None
+    generation = user_generation(user_id)
+    return get_cache().get(user_key(user_id, generation)), generation
+
+
+def cache_user(user_id, user, generation):
+    if generation is not None:
+        get_cache().set(user_key(user_id, generation), user, user_cache_timeout())
+
+
+def invalidate_user(user_id):
+    cache = get_cache()
+    try:
+        cache.incr(generation_key(user_id))
+    except ValueError:
+        cache.add(generation_key(user_id), time.time_ns() // 1000, None)
+
+
+def owned_id(user, model, create):
+    """The id of ``user``'s ``model`` row (one-to-one), cached; ``None`` if missing."""
+    attribute = f'_store_{model._meta.model_name}_id'
+    if attribute in user.__dict__:
+        return user.__dict__[attribute]
+    cache = get_cache()
+    key = f'store:{model._meta.model_name}_id:{user.pk}'
+    object_id = cache.get(key)
+    if object_id is None:
+        if create:
+            object_id = model.objects.get_or_create(user=user)[0].pk
+        else:
+            object_id = model.objects.filter(user=user).values_list('pk', flat=True).first()
+        if object_id is None:
+            return None
+        cache.set(key, object_id, OWNED_ID_TIMEOUT)
+    user.__dict__[attribute] = object_id
+    return object_id
+
+
+def forget_owned_id(user_id, model):
+    get_cache().delete(f'store:{model._meta.model_name}_id:{user_id}')
+
+
+def with_owned_id(user, model, use, create=True):
+    """``use(id of user's model row)``, run again with a fresh id if the cached one is of a deleted row.
+
+    Reads by a stale id raise ``model.DoesNotExist``, and writes referencing
+    it an ``IntegrityError``; ``use`` must leave nothing behind when it
+    raises either (an atomic block).
+    """
+    try:
+        return use(owned_id(user, model, create))
+    except (model.DoesNotExist, IntegrityError):
+        forget_owned_id(user.pk, model)
+        user.__dict__.pop(f'_store_{model._meta.model_name}_id', None)
+        return use(owned_id(user, model, create))
+
+
+def check_owned_id(model, object_id):
+    """Raise ``model.DoesNotExist`` if ``object_id`` names no row, for ``with_owned_id()`` to retry.
+
+    For lookups that find nothing by the id, where a stale id and an empty
+    result look the same; costs a query only then.
+    """
+    if object_id is not None and not model.objects.filter(pk=object_id).exists():
+        raise model.DoesNotExist
+
+
+def cart_id_for(user, create=True):
+    return owned_id(user, Cart, create)
+
+
+def wishlist_id_for(user, create=True):
+    return owned_id(user, Wishlist, create)
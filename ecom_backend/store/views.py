@@ -1,18 +1,64 @@
+import io
+
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes, renderer_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
 
-from .models import Category, Item, Cart, CartItem, Wishlist, UserProfile, Order, OrderItem
+from .models import Category, Item, Cart, CartItem, Wishlist, UserProfile, Order, OrderItem, PaymentJob
 from .serializers import (
     UserRegistrationSerializer, UserSerializer, CategorySerializer,
-    ItemSerializer, CartSerializer, CartItemSerializer, WishlistSerializer,
+    ItemSerializer, CartSerializer, CartItemSerializer, CartBatchSerializer, WishlistSerializer, WishlistBatchSerializer,
     UserProfileSerializer, OrderSerializer, CreateOrderSerializer, OrderItemSerializer
 )
+from .cache import CachedResponseMixin
+from .cart import CartOperationError, apply_cart_operations
+from .catalogfeed import FeedError, FeedImporter, export_feed, feed_format_for, read_feed
+from .checkout import CheckoutError, checkout
+from .fastserializers import (
+    FastCartSerializer, FastItemSerializer, FastListMixin, FastOrderSerializer, fast_serializers_enabled
+)
+from .filters import ItemSearchFilter, ItemOrderingFilter
+from .orderexport import export_orders, filter_orders, parse_bound
+from .pagination import StorePagination
+from .payments import PAYMENT_JOB_FIELDS, enqueue_payment
+from .querybudget import query_budget
+from .renderers import CSVRenderer, JSONLinesRenderer, streaming_response
+from .reservations import AVAILABILITY_FIELDS, available_quantities, hold, refresh_availability, release
+from .rollups import summarize_orders
+from .sparse import Fieldset, SparseQuerysetMixin
+from .usercache import check_owned_id, wishlist_id_for, with_owned_id
+from .wishlist import apply_wishlist_changes, wishlist_item_ids
+
+
+def item_queryset():
+    return Item.objects.with_available_stock().filter(is_active=True).select_related('category')
+
+
+def cart_queryset():
+    return Cart.objects.with_totals().prefetch_related(
+        Prefetch('items', queryset=CartItem.objects.select_related('item'))
+    )
+
+
+def wishlist_queryset():
+    return Wishlist.objects.prefetch_related(
+        Prefetch('items', queryset=Item.objects.with_available_stock().select_related('category'))
+    )
+
+
+def order_queryset():
+    return Order.objects.select_related('user').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('item'))
+    )
 
 # Authentication Views
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -31,45 +77,106 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 # Category Views
-class CategoryListView(generics.ListCreateAPIView):
+class CategoryListView(CachedResponseMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    query_budget = 2
+
+    def get_queryset(self):
+        # Built per request so CATEGORY_ITEMS_COUNT is read at request time;
+        # Meta.ordering doesn't apply to grouped queries, so order explicitly
+        return super().get_queryset().with_items_count().order_by('name')
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        return super().get_queryset().with_items_count()
+
 # Item Views
-class ItemListView(generics.ListCreateAPIView):
-    queryset = Item.objects.filter(is_active=True)
+class ItemListView(CachedResponseMixin, SparseQuerysetMixin, FastListMixin, generics.ListCreateAPIView):
+    queryset = item_queryset()
     serializer_class = ItemSerializer
+    fast_serializer_class = FastItemSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ItemSearchFilter, ItemOrderingFilter]
     filterset_fields = ['category', 'is_featured']
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'created_at', 'name']
     ordering = ['-created_at']
-
-class ItemDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Item.objects.filter(is_active=True)
+    pagination_class = StorePagination
+    cache_anonymous_only = True
+    volatile = (AVAILABILITY_FIELDS, refresh_availability)
+    # Creating an item also writes its search index row and category count
+    query_budget = {'GET': 4, 'HEAD': 4, 'POST': 6}
+
+class ItemDetailView(CachedResponseMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = item_queryset()
     serializer_class = ItemSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    volatile = (AVAILABILITY_FIELDS, refresh_availability)
 
-class FeaturedItemsView(generics.ListAPIView):
-    queryset = Item.objects.filter(is_active=True, is_featured=True)
+class FeaturedItemsView(CachedResponseMixin, SparseQuerysetMixin, FastListMixin, generics.ListAPIView):
+    queryset = item_queryset().filter(is_featured=True)
     serializer_class = ItemSerializer
+    fast_serializer_class = FastItemSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = StorePagination
+    volatile = (AVAILABILITY_FIELDS, refresh_availability)
+    query_budget = 3
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+@parser_classes([MultiPartParser])
+def import_catalog(request):
+    """Upsert items by sku from an uploaded CSV or JSON Lines feed.
+
+    The file is read as a stream and written in chunks; rows that fail
+    validation are listed in the report instead of failing the upload.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload the feed as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+    feed_format = request.data.get('format') or feed_format_for(upload.name)
+    create_categories = str(request.data.get('create_categories', '')).lower() in ('1', 'true', 'yes')
+    try:
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = FeedImporter(create_categories=create_categories).run(read_feed(stream, feed_format))
+    except (FeedError, UnicodeDecodeError) as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@renderer_classes([CSVRenderer, JSONLinesRenderer])
+def export_catalog(request):
+    """Stream every item as a CSV (default) or ``?format=jsonl`` feed."""
+    renderer = request.accepted_renderer
+    return streaming_response(export_feed(renderer.format), renderer, 'catalog')
 
 # Cart Views
-class CartView(generics.RetrieveAPIView):
+class CartView(SparseQuerysetMixin, generics.RetrieveAPIView):
     serializer_class = CartSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # The cart and its items; a first visit also reads the user and creates
+    # the cart (a lookup and three statements for the insert's transaction)
+    query_budget = 7
 
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
-        return cart
+        # The cart id lookup creates a missing cart, so the cart is read once
+        queryset = self.sparse_queryset(cart_queryset())
+        return with_owned_id(self.request.user, Cart, lambda cart_id: queryset.get(pk=cart_id))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not fast_serializers_enabled():
+            return super().retrieve(request, *args, **kwargs)
+        fast = FastCartSerializer(Fieldset.from_request(request))
+        cart = with_owned_id(request.user, Cart,
+                             lambda cart_id: fast.values(Cart.objects.with_totals().filter(pk=cart_id)).get())
+        return Response(fast.serialize([cart])[0])
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -82,21 +189,26 @@ def add_to_cart(request):
     except Item.DoesNotExist:
         return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    if quantity > item.stock_quantity:
+    def add(cart_id):
+        with transaction.atomic():
+            available = available_quantities(cart_id, {item.pk: item})[item.pk]
+            cart_item = CartItem.objects.filter(cart_id=cart_id, item=item).first()
+            current = cart_item.quantity if cart_item is not None else 0
+            if current + quantity > available:
+                return None
+
+            if cart_item is None:
+                cart_item = CartItem(cart_id=cart_id)
+            cart_item.item = item
+            cart_item.quantity = current + quantity
+            cart_item.save()
+            hold(cart_id, {item.pk: cart_item.quantity})
+        return cart_item
+
+    cart_item = with_owned_id(request.user, Cart, add)
+    if cart_item is None:
         return Response({'error': 'Not enough stock'}, status=status.HTTP_400_BAD_REQUEST)
 
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_item, created = CartItem.objects.get_or_create(cart=cart, item=item)
-
-    if not created:
-        if cart_item.quantity + quantity > item.stock_quantity:
-            return Response({'error': 'Not enough stock'}, status=status.HTTP_400_BAD_REQUEST)
-        cart_item.quantity += quantity
-    else:
-        cart_item.quantity = quantity
-
-    cart_item.save()
-
     serializer = CartItemSerializer(cart_item)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -105,21 +217,29 @@ def add_to_cart(request):
 def update_cart_item(request, item_id):
     quantity = request.data.get('quantity', 1)
 
-    try:
-        cart = Cart.objects.get(user=request.user)
-        cart_item = CartItem.objects.get(cart=cart, item_id=item_id)
-    except (Cart.DoesNotExist, CartItem.DoesNotExist):
+    def find(cart_id):
+        try:
+            return cart_id, CartItem.objects.select_related('item').get(cart_id=cart_id, item_id=item_id)
+        except CartItem.DoesNotExist:
+            check_owned_id(Cart, cart_id)
+            return cart_id, None
+
+    cart_id, cart_item = with_owned_id(request.user, Cart, find, create=False)
+    if cart_item is None:
         return Response({'error': 'Cart item not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    if quantity <= 0:
-        cart_item.delete()
-        return Response({'message': 'Item removed from cart'}, status=status.HTTP_200_OK)
+    with transaction.atomic():
+        if quantity <= 0:
+            cart_item.delete()
+            release(cart_id, [item_id])
+            return Response({'message': 'Item removed from cart'}, status=status.HTTP_200_OK)
 
-    if quantity > cart_item.item.stock_quantity:
-        return Response({'error': 'Not enough stock'}, status=status.HTTP_400_BAD_REQUEST)
+        if quantity > available_quantities(cart_id, {cart_item.item_id: cart_item.item})[cart_item.item_id]:
+            return Response({'error': 'Not enough stock'}, status=status.HTTP_400_BAD_REQUEST)
 
-    cart_item.quantity = quantity
-    cart_item.save()
+        cart_item.quantity = quantity
+        cart_item.save()
+        hold(cart_id, {cart_item.item_id: quantity})
 
     serializer = CartItemSerializer(cart_item)
     return Response(serializer.data)
@@ -127,32 +247,70 @@ def update_cart_item(request, item_id):
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def remove_from_cart(request, item_id):
-    try:
-        cart = Cart.objects.get(user=request.user)
-        cart_item = CartItem.objects.get(cart=cart, item_id=item_id)
-        cart_item.delete()
-        return Response({'message': 'Item removed from cart'}, status=status.HTTP_200_OK)
-    except (Cart.DoesNotExist, CartItem.DoesNotExist):
+    def remove(cart_id):
+        with transaction.atomic():
+            deleted, _ = CartItem.objects.filter(cart_id=cart_id, item_id=item_id).delete()
+            if not deleted:
+                check_owned_id(Cart, cart_id)
+                return False
+            release(cart_id, [item_id])
+        return True
+
+    if not with_owned_id(request.user, Cart, remove, create=False):
         return Response({'error': 'Cart item not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Item removed from cart'}, status=status.HTTP_200_OK)
+
+# Up to 16 for the batch; a stale cart id adds the failed check and the new
+# cart's lookup and insert, before the batch runs once
+@query_budget(22)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_update_cart(request):
+    serializer = CartBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def apply(cart_id):
+        # Fail a stale id before writing, instead of at commit (SQLite)
+        check_owned_id(Cart, cart_id)
+        # apply_cart_operations only needs the cart's id
+        apply_cart_operations(Cart(pk=cart_id, user=request.user), serializer.validated_data['operations'])
+        return cart_queryset().get(pk=cart_id)
+
+    try:
+        cart = with_owned_id(request.user, Cart, apply)
+    except CartOperationError as error:
+        return Response({'error': str(error), 'errors': error.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(CartSerializer(cart).data)
 
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def clear_cart(request):
-    try:
-        cart = Cart.objects.get(user=request.user)
-        cart.items.all().delete()
-        return Response({'message': 'Cart cleared'}, status=status.HTTP_200_OK)
-    except Cart.DoesNotExist:
+    def clear(cart_id):
+        if cart_id is None:
+            return False
+        with transaction.atomic():
+            deleted, _ = CartItem.objects.filter(cart_id=cart_id).delete()
+            if not deleted:
+                check_owned_id(Cart, cart_id)
+            release(cart_id)
+        return True
+
+    if not with_owned_id(request.user, Cart, clear, create=False):
         return Response({'message': 'Cart is already empty'}, status=status.HTTP_200_OK)
+    return Response({'message': 'Cart cleared'}, status=status.HTTP_200_OK)
 
 # Wishlist Views
-class WishlistView(generics.RetrieveAPIView):
+class WishlistView(SparseQuerysetMixin, generics.RetrieveAPIView):
     serializer_class = WishlistSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # As CartView: two reads, and five more when the wishlist is created
+    query_budget = 7
 
     def get_object(self):
-        wishlist, created = Wishlist.objects.get_or_create(user=self.request.user)
-        return wishlist
+        queryset = self.sparse_queryset(wishlist_queryset())
+        return with_owned_id(self.request.user, Wishlist, lambda wishlist_id: queryset.get(pk=wishlist_id))
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -164,24 +322,58 @@ def add_to_wishlist(request):
     except Item.DoesNotExist:
         return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    
-    if item in wishlist.items.all():
+    changes = with_owned_id(request.user, Wishlist, lambda wishlist_id: apply_wishlist_changes(
+        Wishlist(pk=wishlist_id, user=request.user), add=[item.pk]))
+    if not changes['added']:
         return Response({'message': 'Item already in wishlist'}, status=status.HTTP_200_OK)
-
-    wishlist.items.add(item)
     return Response({'message': 'Item added to wishlist'}, status=status.HTTP_201_CREATED)
 
+class WishlistItemsView(SparseQuerysetMixin, FastListMixin, generics.ListAPIView):
+    """The wishlist's items one page at a time, for wishlists too big for ``WishlistView``."""
+    serializer_class = ItemSerializer
+    fast_serializer_class = FastItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StorePagination
+    query_budget = 4
+
+    def get_queryset(self):
+        return Item.objects.with_available_stock().select_related('category') \
+            .filter(wishlist__user=self.request.user).order_by('-created_at')
+
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def wishlist_ids(request):
+    """Ids of the items on the wishlist, for marking them in product grids.
+
+    Served from the cache until the wishlist changes, with an ETag so
+    clients can revalidate for a 304.
+    """
+    item_ids, etag = wishlist_item_ids(request.user.pk)
+    response = Response({'item_ids': item_ids, 'count': len(item_ids)})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response) or response
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_update_wishlist(request):
+    serializer = WishlistBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    changes = with_owned_id(request.user, Wishlist, lambda wishlist_id: apply_wishlist_changes(
+        Wishlist(pk=wishlist_id, user=request.user), **serializer.validated_data))
+    return Response(changes)
+
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def remove_from_wishlist(request, item_id):
-    try:
-        wishlist = Wishlist.objects.get(user=request.user)
-        item = Item.objects.get(id=item_id)
-        wishlist.items.remove(item)
-        return Response({'message': 'Item removed from wishlist'}, status=status.HTTP_200_OK)
-    except (Wishlist.DoesNotExist, Item.DoesNotExist):
+    wishlist_id = wishlist_id_for(request.user, create=False)
+    if wishlist_id is None or not Item.objects.filter(id=item_id).exists():
         return Response({'error': 'Item not found in wishlist'}, status=status.HTTP_404_NOT_FOUND)
+    apply_wishlist_changes(Wishlist(pk=wishlist_id, user=request.user), remove=[item_id])
+    return Response({'message': 'Item removed from wishlist'}, status=status.HTTP_200_OK)
 
 # User Profile Views
 class UserProfileDetailView(generics.RetrieveUpdateAPIView):
@@ -196,20 +388,59 @@ class UserProfileDetailView(generics.RetrieveUpdateAPIView):
         serializer.save(user=self.request.user)
 
 # Order Views
-class OrderListView(generics.ListAPIView):
+class OrderListView(SparseQuerysetMixin, FastListMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
+    fast_serializer_class = FastOrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StorePagination
+    query_budget = 4
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return order_queryset().filter(user=self.request.user)
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(SparseQuerysetMixin, generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return order_queryset().filter(user=self.request.user)
 
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def order_summary(request):
+    """Lifetime spend, order counts by status and monthly totals.
+
+    Read from the user's order rollups, so the cost doesn't grow with the
+    order history.
+    """
+    return Response(summarize_orders(request.user.pk))
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@renderer_classes([JSONLinesRenderer, CSVRenderer])
+def export_order_feed(request):
+    """Stream orders with their line items for fulfilment.
+
+    ``?since=`` and ``?until=`` take ISO dates or datetimes (a date ``until``
+    includes that day), ``?status=`` and ``?payment_status=`` comma separated
+    values. JSON Lines by default, ``?format=csv`` for a row per line item.
+    """
+    params = request.query_params
+    try:
+        orders = filter_orders(
+            since=parse_bound(params['since']) if params.get('since') else None,
+            until=parse_bound(params['until'], end=True) if params.get('until') else None,
+            statuses=[value for value in params.get('status', '').split(',') if value],
+            payment_statuses=[value for value in params.get('payment_status', '').split(',') if value],
+        )
+    except ValueError as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    return streaming_response(export_orders(request.accepted_renderer.format, orders), request.accepted_renderer,
+                              'orders')
+
+@query_budget(16)
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def create_order(request):
@@ -219,66 +450,57 @@ def create_order(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        cart = Cart.objects.get(user=request.user)
-        cart_items = cart.items.all()
-        
-        if not cart_items:
-            return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            total_amount=cart.total_price,
-            shipping_address=serializer.validated_data['shipping_address'],
-            payment_method=serializer.validated_data.get('payment_method', 'online'),
-            notes=serializer.validated_data.get('notes', '')
-        )
+        order = checkout(request.user, **serializer.validated_data)
+    except CheckoutError as error:
+        return Response(error.as_data(), status=error.status_code)
 
-        # Create order items
-        for cart_item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                item=cart_item.item,
-                quantity=cart_item.quantity,
-                price=cart_item.item.price
-            )
-
-        # Clear cart after order creation
-        cart_items.delete()
-
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-    except Cart.DoesNotExist:
-        return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
+    order = order_queryset().get(pk=order.pk)
+    serializer = OrderSerializer(order)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+@query_budget(6)
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def simulate_payment(request, order_id):
-    """Simulate payment processing"""
-    try:
-        order = Order.objects.get(id=order_id, user=request.user)
-        
-        # Simulate payment success (you can add logic to randomly succeed/fail)
-        payment_success = True  # In real app, this would be from payment gateway
-        
-        if payment_success:
-            order.payment_status = 'completed'
-            order.order_status = 'processing'
-            order.save()
-            
-            return Response({
-                'message': 'Payment successful',
-                'order_number': order.order_number,
-                'payment_status': order.payment_status
-            }, status=status.HTTP_200_OK)
-        else:
-            order.payment_status = 'failed'
-            order.save()
-            return Response({
-                'error': 'Payment failed',
-                'order_number': order.order_number
-            }, status=status.HTTP_400_BAD_REQUEST)
-            
-    except Order.DoesNotExist:
+    """Queue the order's payment for the payment workers and answer 202.
+
+    Poll ``payment_status`` for the outcome. Posting again while the
+    payment is queued returns the same job.
+    """
+    order = Order.objects.filter(id=order_id, user=request.user).first()
+    if order is None:
+        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    if order.payment_status == 'completed':
+        return Response({
+            'message': 'Payment already completed',
+            'order_number': order.order_number,
+            'payment_status': order.payment_status
+        }, status=status.HTTP_200_OK)
+
+    job, created = enqueue_payment(order)
+    status_url = reverse('payment_status', args=[order.pk])
+    return Response({
+        'message': 'Payment queued',
+        'order_number': order.order_number,
+        'payment_status': order.payment_status,
+        'job': {field: getattr(job, field) for field in PAYMENT_JOB_FIELDS},
+        'status_url': request.build_absolute_uri(status_url),
+    }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def payment_status(request, order_id):
+    """The order's payment status and its latest payment job, in one query."""
+    jobs = PaymentJob.objects.filter(order=OuterRef('pk')).order_by('-id')
+    order = Order.objects.filter(id=order_id, user=request.user).values(
+        'order_number', 'order_status', 'payment_status',
+        **{f'job_{field}': Subquery(jobs.values(field)[:1]) for field in PAYMENT_JOB_FIELDS},
+    ).first()
+    if order is None:
         return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    job = {field: order.pop(f'job_{field}') for field in PAYMENT_JOB_FIELDS}
+    response = Response(dict(order, job=job if job['id'] else None))
+    if job['status'] in PaymentJob.ACTIVE_STATUSES:
+        response['Retry-After'] = '1'
+    return response
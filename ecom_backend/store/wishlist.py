@@ -0,0 +1,110 @@
+"""Wishlist membership and bulk changes.
+
+Product grids only need to know which items are on the user's wishlist.
+``wishlist_item_ids`` reads just the item ids from the join table and keeps
+them in the cache per user until the wishlist changes; with a per-process
+cache (the LocMem default) other workers keep serving their copy for up to
+``STORE_CACHE_TIMEOUT``, so run several workers against a shared cache.
+``apply_wishlist_changes`` adds and removes many ids with one
+``INSERT ... SELECT ... ON CONFLICT DO NOTHING`` and one ``DELETE``, and
+reports what changed from their ``RETURNING`` rows; the join table's unique
+constraint, not Python, drops duplicates.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .cache import get_cache
+from .models import Item, Wishlist
+
+WishlistItem = Wishlist.items.through
+
+
+def ids_cache_key(user_id):
+    return f'store:wishlist_ids:{user_id}'
+
+
+def invalidate_wishlist_ids(*user_ids):
+    get_cache().delete_many([ids_cache_key(user_id) for user_id in user_ids])
+
+
+def wishlist_item_ids(user_id):
+    """``(item ids in the order they were added, ETag)`` for the user's wishlist."""
+    cache = get_cache()
+    key = ids_cache_key(user_id)
+    cached = cache.get(key)
+    if cached is None:
+        item_ids = list(
+            WishlistItem.objects.filter(wishlist__user_id=user_id).order_by('pk').values_list('item_id', flat=True)
+        )
+        etag = '"%s"' % hashlib.md5(','.join(map(str, item_ids)).encode()).hexdigest()
+        cached = (item_ids, etag)
+        cache.set(key, cached, getattr(settings, 'STORE_CACHE_TIMEOUT', 300))
+    return cached
+
+
+def insert_returning(connection, wishlist, item_ids):
+    """Put the active ones of ``item_ids`` on ``wishlist``; return the ids that weren't on it yet."""
+    table = connection.ops.quote_name(WishlistItem._meta.db_table)
+    items = connection.ops.quote_name(Item._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(item_ids))
+    with connection.cursor() as cursor:
+        # The WHERE keeps SQLite from reading ON CONFLICT as a join constraint
+        cursor.execute(
+            f'INSERT INTO {table} (wishlist_id, item_id) '
+            f'SELECT %s, id FROM {items} WHERE id IN ({placeholders}) AND is_active = %s ORDER BY id '
+            f'ON CONFLICT (wishlist_id, item_id) DO NOTHING RETURNING item_id',
+            [wishlist.pk, *item_ids, True],
+        )
+        return {item_id for item_id, in cursor.fetchall()}
+
+
+def delete_returning(connection, wishlist, item_ids):
+    """Take ``item_ids`` off ``wishlist``; return the ids that were on it."""
+    table = connection.ops.quote_name(WishlistItem._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(item_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE wishlist_id = %s AND item_id IN ({placeholders}) RETURNING item_id',
+            [wishlist.pk, *item_ids],
+        )
+        return {item_id for item_id, in cursor.fetchall()}
+
+
+def apply_wishlist_changes(wishlist, add=(), remove=()):
+    """Add and remove item ids; return ``{'added', 'removed', 'not_found'}`` id lists.
+
+    Only active items can be added. Ids already on the wishlist are left
+    alone, as are removals of ids that aren't on it. The cached ids are
+    dropped once the changes commit.
+    """
+    add, remove = set(add), set(remove)
+    using = router.db_for_write(WishlistItem)
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor in ('sqlite', 'postgresql') and connection.features.can_return_rows_from_bulk_insert:
+            added = insert_returning(connection, wishlist, sorted(add)) if add else set()
+            # Only ids that weren't added need looking up: already there, or not found
+            skipped = add - added
+            found = added | set(
+                WishlistItem.objects.filter(wishlist=wishlist, item_id__in=skipped, item__is_active=True)
+                .values_list('item_id', flat=True)
+            ) if skipped else added
+            removed = delete_returning(connection, wishlist, sorted(remove)) if remove else set()
+        else:
+            found = set(Item.objects.filter(pk__in=add, is_active=True).values_list('pk', flat=True)) if add else set()
+            present = set(
+                WishlistItem.objects.filter(wishlist=wishlist, item_id__in=add | remove).values_list('item_id', flat=True)
+            )
+            added, removed = found - present, remove & present
+            if added:
+                WishlistItem.objects.bulk_create(
+                    [WishlistItem(wishlist=wishlist, item_id=item_id) for item_id in added], ignore_conflicts=True
+                )
+            if removed:
+                WishlistItem.objects.filter(wishlist=wishlist, item_id__in=removed).delete()
+        if added or removed:
+            # Not before the commit, or a concurrent read could cache the old ids again
+            transaction.on_commit(lambda: invalidate_wishlist_ids(wishlist.user_id), using=using)
+    return {'added': sorted(added), 'removed': sorted(removed), 'not_found': sorted(add - found)}